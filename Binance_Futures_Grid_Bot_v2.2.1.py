@@ -8,23 +8,3775 @@ VERSION: 2.2.1 COMPLETE - FIXED POSITION TAKE PROFIT & STOP LOSS
 ✅ Optimized for small capital (10-100 USD)
 """
 
-import tkinter as tk
-from tkinter import ttk, messagebox
 import threading
 import time
 import json
 import os
+import sys
+import contextlib
 import math
+import argparse
+import signal
+import socketserver
+import ipaddress
+import random
+import itertools
+import tempfile
+import multiprocessing
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
 from binance.client import Client
+from binance import AsyncClient
 from binance.exceptions import BinanceAPIException
 import pandas as pd
 import numpy as np
 import requests
 import atexit
+import sqlite3
+import zlib
+import queue
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+try:
+    from websockets.sync.client import connect as ws_connect
+    from websockets.sync.server import serve as ws_serve
+except ImportError:
+    ws_connect = None
+    ws_serve = None
+
+class WebSocketStream:
+    """Base for futures WebSocket readers: background thread, reconnect with backoff"""
+    
+    MAINNET_URL = "wss://fstream.binance.com"
+    TESTNET_URL = "wss://fstream.binancefuture.com"
+    
+    def __init__(self, name, use_testnet=True, base_url=None):
+        self.name = name
+        self.base_url = (base_url or (self.TESTNET_URL if use_testnet else self.MAINNET_URL)).rstrip('/')
+        
+        # Connection state
+        self.connected = False
+        self.connect_count = 0
+        self.reconnect_count = 0
+        self.reconnect_delay = 1
+        self.max_reconnect_delay = 30
+        self.recv_timeout = 1
+        self.last_update = 0
+        
+        self.stop_event = threading.Event()
+        self.stream_thread = None
+    
+    @property
+    def url(self):
+        raise NotImplementedError
+    
+    def start(self):
+        if ws_connect is None:
+            print(f"⚠️ [{self.name}] websockets not installed - stream disabled (REST only)")
+            return False
+        
+        if self.stream_thread and self.stream_thread.is_alive():
+            return True
+        
+        self.stop_event.clear()
+        self.stream_thread = threading.Thread(
+            target=self.run_stream,
+            daemon=True,
+            name=f"{type(self).__name__}-{self.name}"
+        )
+        self.stream_thread.start()
+        return True
+    
+    def stop(self):
+        self.stop_event.set()
+        if self.stream_thread and self.stream_thread.is_alive() and self.stream_thread is not threading.current_thread():
+            self.stream_thread.join(timeout=self.recv_timeout + 2)
+        self.connected = False
+    
+    def before_connect(self):
+        """Hook run before every (re)connect"""
+        pass
+    
+    def on_idle(self):
+        """Hook run whenever recv times out"""
+        pass
+    
+    def handle_message(self, raw):
+        raise NotImplementedError
+    
+    def run_stream(self):
+        """Connect, read messages and reconnect with backoff until stopped"""
+        delay = self.reconnect_delay
+        
+        while not self.stop_event.is_set():
+            try:
+                self.before_connect()
+                with ws_connect(self.url, open_timeout=10) as ws:
+                    self.connected = True
+                    self.connect_count += 1
+                    delay = self.reconnect_delay
+                    print(f"📡 [{self.name}] {type(self).__name__} connected")
+                    
+                    while not self.stop_event.is_set():
+                        try:
+                            raw = ws.recv(timeout=self.recv_timeout)
+                        except TimeoutError:
+                            self.on_idle()
+                            continue
+                        self.handle_message(raw)
+                        self.on_idle()
+            except Exception as e:
+                if not self.stop_event.is_set():
+                    print(f"⚠️ [{self.name}] {type(self).__name__} error: {e} - reconnecting in {delay}s")
+            
+            self.connected = False
+            if self.stop_event.wait(delay):
+                break
+            self.reconnect_count += 1
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+
+class MarkPriceStream(WebSocketStream):
+    """Keep the latest price of one symbol in memory from the futures WebSocket streams"""
+    
+    def __init__(self, symbol, use_testnet=True, base_url=None, on_price=None, bot_id=None,
+                 kline_intervals=(), kline_cache=None):
+        super().__init__(bot_id or symbol.upper(), use_testnet, base_url)
+        self.symbol = symbol.upper()
+        self.on_price = on_price
+        
+        # Optional candle feed into a KlineCache
+        self.kline_intervals = tuple(kline_intervals) if kline_cache else ()
+        self.kline_cache = kline_cache
+        
+        # Latest values
+        self.price = 0
+        self.mark_price = 0
+        self.bid_price = 0
+        self.ask_price = 0
+        self.funding_rate = 0
+    
+    @property
+    def url(self):
+        stream = self.symbol.lower()
+        streams = [f"{stream}@markPrice@1s", f"{stream}@bookTicker"]
+        streams += [f"{stream}@kline_{interval}" for interval in self.kline_intervals]
+        return f"{self.base_url}/stream?streams={'/'.join(streams)}"
+    
+    def is_fresh(self, max_age=5):
+        """True if a price arrived within max_age seconds"""
+        return self.price > 0 and (time.time() - self.last_update) <= max_age
+    
+    def handle_message(self, raw):
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        
+        data = message.get('data', message)
+        event = data.get('e')
+        
+        if event == 'kline':
+            self.kline_cache.apply_stream_kline(self.symbol, data['k'])
+            return
+        
+        if event == 'markPriceUpdate':
+            self.mark_price = float(data['p'])
+            self.funding_rate = float(data.get('r') or 0)
+            if not self.bid_price:
+                self.price = self.mark_price
+        elif event == 'bookTicker' or ('b' in data and 'a' in data):
+            self.bid_price = float(data['b'])
+            self.ask_price = float(data['a'])
+            self.price = (self.bid_price + self.ask_price) / 2
+        else:
+            return
+        
+        self.last_update = time.time()
+        
+        if self.on_price:
+            try:
+                self.on_price(self.price)
+            except Exception as e:
+                print(f"[{self.name}] Price callback error: {e}")
+
+
+class UserDataStream(WebSocketStream):
+    """Futures user data stream (listenKey) shared by every bot on one API key"""
+    
+    KEEPALIVE_INTERVAL = 30 * 60
+    
+    _streams = {}
+    _streams_lock = threading.Lock()
+    
+    @classmethod
+    def for_client(cls, client, use_testnet=True, base_url=None):
+        """Return the shared stream for this client's API key"""
+        key = (client.API_KEY, use_testnet, base_url)
+        with cls._streams_lock:
+            stream = cls._streams.get(key)
+            if stream is None:
+                stream = cls(client, use_testnet, base_url)
+                cls._streams[key] = stream
+            return stream
+    
+    def __init__(self, client, use_testnet=True, base_url=None):
+        super().__init__("UserData", use_testnet, base_url)
+        self.client = client
+        self.listen_key = None
+        self.last_keepalive = 0
+        self.listeners = []
+        self.listeners_lock = threading.Lock()
+    
+    @property
+    def url(self):
+        return f"{self.base_url}/ws/{self.listen_key}"
+    
+    def add_listener(self, callback, symbol=None):
+        """Register callback(event); symbol=None receives every event"""
+        with self.listeners_lock:
+            self.listeners = self.listeners + [(symbol, callback)]
+        self.start()
+    
+    def remove_listener(self, callback):
+        with self.listeners_lock:
+            self.listeners = [(s, c) for s, c in self.listeners if c != callback]
+            empty = not self.listeners
+        if empty:
+            self.stop()
+    
+    def before_connect(self):
+        response = self.client.futures_stream_get_listen_key()
+        self.listen_key = response['listenKey'] if isinstance(response, dict) else response
+        self.last_keepalive = time.time()
+    
+    def on_idle(self):
+        if self.listen_key and time.time() - self.last_keepalive >= self.KEEPALIVE_INTERVAL:
+            try:
+                self.client.futures_stream_keepalive(listenKey=self.listen_key)
+                self.last_keepalive = time.time()
+            except Exception as e:
+                print(f"⚠️ [{self.name}] listenKey keep-alive failed: {e}")
+    
+    def handle_message(self, raw):
+        try:
+            event = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        
+        self.last_update = time.time()
+        event_type = event.get('e')
+        
+        if event_type == 'listenKeyExpired':
+            raise ConnectionError("listenKey expired")
+        
+        symbol = event['o'].get('s') if event_type == 'ORDER_TRADE_UPDATE' else None
+        
+        for listener_symbol, callback in self.listeners:
+            if listener_symbol is None or symbol is None or listener_symbol == symbol:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"[{self.name}] User stream callback error: {e}")
+
+
+# Request priorities (lower = more urgent)
+PRIORITY_CRITICAL = 0   # TP/SL closes, emergency stop
+PRIORITY_ORDER = 1      # grid placement, refills, cancels
+PRIORITY_NORMAL = 2     # bot state reads, GUI summary
+PRIORITY_SCAN = 3       # scanner traffic
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `capacity` tokens refilled evenly over `period` seconds"""
+    
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / self.period)
+        self.updated = now
+    
+    def try_acquire(self, tokens=1, reserve=0):
+        """Take tokens if `reserve` tokens stay left afterwards; otherwise return seconds to wait"""
+        with self.lock:
+            self.refill(time.monotonic())
+            if self.tokens - tokens >= reserve:
+                self.tokens -= tokens
+                return 0
+            return (tokens + reserve - self.tokens) * self.period / self.capacity
+    
+    def acquire(self, tokens=1, reserve=0):
+        tokens = min(tokens, self.capacity)
+        while True:
+            wait = self.try_acquire(tokens, reserve)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1))
+    
+    def sync_used(self, used):
+        """Align with the server's count of tokens used in the current window"""
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used)
+
+
+class RateGovernor:
+    """Process-wide REST budget per exchange, synced from X-MBX-USED-WEIGHT / X-MBX-ORDER-COUNT headers
+    
+    Request weight is per IP, so every bot and the scanner share one weight bucket.
+    Order counts are per account and get one pair of buckets per API key.
+    Lower priorities must leave a reserve in each bucket for more urgent callers.
+    """
+    
+    WEIGHT_LIMIT_1M = 2400
+    ORDER_LIMIT_10S = 300
+    ORDER_LIMIT_1M = 1200
+    
+    # Fraction of each bucket a priority must leave untouched
+    PRIORITY_RESERVE = {
+        PRIORITY_CRITICAL: 0.0,
+        PRIORITY_ORDER: 0.05,
+        PRIORITY_NORMAL: 0.2,
+        PRIORITY_SCAN: 0.4
+    }
+    
+    _governors = {}
+    _governors_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls, use_testnet=True):
+        with cls._governors_lock:
+            governor = cls._governors.get(use_testnet)
+            if governor is None:
+                governor = cls()
+                cls._governors[use_testnet] = governor
+            return governor
+    
+    def __init__(self):
+        self.weight = TokenBucket(self.WEIGHT_LIMIT_1M, 60)
+        self.order_buckets = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.banned_until = 0
+        
+        # Stats
+        self.total_requests = 0
+        self.total_weight = 0
+        self.total_orders = 0
+        self.server_used_weight = 0
+        self.throttle_events = 0
+    
+    def account_orders(self, api_key):
+        with self.lock:
+            buckets = self.order_buckets.get(api_key)
+            if buckets is None:
+                buckets = (TokenBucket(self.ORDER_LIMIT_10S, 10), TokenBucket(self.ORDER_LIMIT_1M, 60))
+                self.order_buckets[api_key] = buckets
+            return buckets
+    
+    def current_priority(self, default=PRIORITY_NORMAL):
+        stack = getattr(self.local, 'priorities', None)
+        return stack[-1] if stack else default
+    
+    def priority(self, level):
+        """Context manager: `with governor.priority(PRIORITY_CRITICAL): ...`"""
+        governor = self
+        
+        class PriorityContext:
+            def __enter__(self):
+                if not hasattr(governor.local, 'priorities'):
+                    governor.local.priorities = []
+                governor.local.priorities.append(level)
+            
+            def __exit__(self, *exc):
+                governor.local.priorities.pop()
+        
+        return PriorityContext()
+    
+    def acquire(self, weight=1, orders=0, api_key=None, priority=PRIORITY_NORMAL):
+        wait = self.banned_until - time.time()
+        if wait > 0:
+            print(f"⛔ Rate limited by Binance - waiting {wait:.0f}s")
+            time.sleep(wait)
+        
+        reserve = self.PRIORITY_RESERVE.get(priority, 0)
+        self.weight.acquire(weight, reserve * self.weight.capacity)
+        
+        if orders:
+            for bucket in self.account_orders(api_key):
+                bucket.acquire(orders, reserve * bucket.capacity)
+        
+        self.count_request(weight, orders)
+    
+    async def acquire_async(self, weight=1, orders=0, api_key=None, priority=PRIORITY_NORMAL):
+        """Same as acquire() but waits with asyncio.sleep instead of blocking the loop"""
+        wait = self.banned_until - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        
+        reserve = self.PRIORITY_RESERVE.get(priority, 0)
+        buckets = [(self.weight, weight)]
+        if orders:
+            buckets += [(bucket, orders) for bucket in self.account_orders(api_key)]
+        
+        for bucket, tokens in buckets:
+            tokens = min(tokens, bucket.capacity)
+            while True:
+                wait = bucket.try_acquire(tokens, reserve * bucket.capacity)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, 1))
+        
+        self.count_request(weight, orders)
+    
+    def count_request(self, weight, orders):
+        with self.lock:
+            self.total_requests += 1
+            self.total_weight += weight
+            self.total_orders += orders
+    
+    def record_response(self, response, api_key=None):
+        """Read used-weight / order-count headers from a requests response"""
+        if response is None:
+            return
+        
+        headers = response.headers
+        used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('X-MBX-USED-WEIGHT-1m')
+        if used:
+            self.server_used_weight = int(used)
+            self.weight.sync_used(int(used))
+        
+        orders_10s = headers.get('X-MBX-ORDER-COUNT-10S') or headers.get('X-MBX-ORDER-COUNT-10s')
+        orders_1m = headers.get('X-MBX-ORDER-COUNT-1M') or headers.get('X-MBX-ORDER-COUNT-1m')
+        if api_key and (orders_10s or orders_1m):
+            bucket_10s, bucket_1m = self.account_orders(api_key)
+            if orders_10s:
+                bucket_10s.sync_used(int(orders_10s))
+            if orders_1m:
+                bucket_1m.sync_used(int(orders_1m))
+    
+    def record_rate_limit(self, status_code, response=None):
+        """429 = slow down, 418 = IP banned; both carry Retry-After"""
+        retry_after = 60
+        if response is not None:
+            try:
+                retry_after = int(response.headers.get('Retry-After', retry_after))
+            except (TypeError, ValueError):
+                pass
+        
+        with self.lock:
+            self.banned_until = max(self.banned_until, time.time() + retry_after)
+            self.throttle_events += 1
+        print(f"⛔ Binance returned {status_code} - all requests paused for {retry_after}s")
+
+
+# The HTTP response of the REST call running in this thread / asyncio task. client.response
+# is one attribute shared by every caller of the client, so another thread can overwrite it
+# before the rate headers are read.
+CALL_RESPONSE = contextvars.ContextVar('call_response', default=None)
+
+
+class GovernedClient:
+    """Client proxy: every REST call is paced by the RateGovernor"""
+    
+    # Request weights of the endpoints the bot uses (unlisted methods count as 1)
+    WEIGHTS = {
+        'futures_account': 5,
+        'futures_position_information': 5,
+        'futures_account_trades': 5,
+        'futures_place_batch_order': 5,
+        'futures_get_position_mode': 30,
+        'futures_exchange_info': 1,
+        'futures_symbol_ticker': 1,
+        'futures_funding_rate': 1,
+        'futures_get_open_orders': 1,
+        'futures_create_order': 1,
+        'futures_cancel_all_open_orders': 1,
+    }
+    
+    ORDER_METHODS = {'futures_create_order', 'futures_place_batch_order', 'futures_modify_order'}
+    
+    WRITE_METHODS = {
+        'futures_create_order', 'futures_place_batch_order', 'futures_modify_order',
+        'futures_cancel_order', 'futures_cancel_orders', 'futures_cancel_all_open_orders'
+    }
+    
+    def __init__(self, client, governor, default_priority=PRIORITY_NORMAL):
+        self.__dict__['client'] = client
+        self.__dict__['governor'] = governor
+        self.__dict__['default_priority'] = default_priority
+        self.__dict__['wrapped'] = {}
+        self.capture_responses(client)
+    
+    @staticmethod
+    def capture_responses(client):
+        """Hook the client so each call's own response lands in CALL_RESPONSE"""
+        if getattr(client, 'response_captured', False):
+            return
+        
+        hooks = getattr(getattr(client, 'session', None), 'hooks', None)
+        handle = getattr(client, '_handle_response', None)
+        if isinstance(hooks, dict) and 'response' in hooks:
+            # requests runs response hooks in the calling thread
+            hooks['response'].append(lambda response, *args, **kwargs: CALL_RESPONSE.set(response))
+        elif handle is not None and asyncio.iscoroutinefunction(handle):
+            # AsyncClient awaits _handle_response inside the calling task
+            async def handle_response(response):
+                CALL_RESPONSE.set(response)
+                return await handle(response)
+            client._handle_response = handle_response
+        else:
+            return
+        client.response_captured = True
+    
+    def __setattr__(self, name, value):
+        setattr(self.client, name, value)
+    
+    def priority(self, level):
+        return self.governor.priority(level)
+    
+    @staticmethod
+    def request_weight(name, params):
+        if name == 'futures_klines':
+            limit = params.get('limit', 500)
+            return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+        if name == 'futures_get_open_orders' and 'symbol' not in params:
+            return 40
+        if name == 'futures_symbol_ticker' and 'symbol' not in params:
+            return 2
+        return GovernedClient.WEIGHTS.get(name, 1)
+    
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr) or not (name.startswith('futures_') or name == 'get_server_time'):
+            return attr
+        
+        wrapped = self.wrapped.get(name)
+        if wrapped is not None:
+            return wrapped
+        
+        client = self.client
+        governor = self.governor
+        default = PRIORITY_ORDER if name in self.WRITE_METHODS else self.default_priority
+        
+        def order_count(params):
+            if name in self.ORDER_METHODS:
+                return len(params.get('batchOrders', [])) or 1
+            return 0
+        
+        def call(*args, **params):
+            CALL_RESPONSE.set(None)
+            governor.acquire(
+                weight=self.request_weight(name, params),
+                orders=order_count(params),
+                api_key=client.API_KEY,
+                priority=governor.current_priority(default)
+            )
+            
+            try:
+                result = attr(*args, **params)
+            except BinanceAPIException as e:
+                if e.status_code in (418, 429):
+                    governor.record_rate_limit(e.status_code, getattr(e, 'response', None))
+                raise
+            
+            governor.record_response(CALL_RESPONSE.get(), client.API_KEY)
+            return result
+        
+        async def call_async(*args, **params):
+            CALL_RESPONSE.set(None)
+            await governor.acquire_async(
+                weight=self.request_weight(name, params),
+                orders=order_count(params),
+                api_key=client.API_KEY,
+                priority=params.pop('priority', default)
+            )
+            
+            try:
+                result = await attr(*args, **params)
+            except BinanceAPIException as e:
+                if e.status_code in (418, 429):
+                    governor.record_rate_limit(e.status_code, getattr(e, 'response', None))
+                raise
+            
+            governor.record_response(CALL_RESPONSE.get(), client.API_KEY)
+            return result
+        
+        wrapped = call_async if asyncio.iscoroutinefunction(attr) else call
+        self.wrapped[name] = wrapped
+        return wrapped
+
+
+class ExchangeInfoCache:
+    """Process-wide symbol metadata cache (one per exchange), refreshed in the background"""
+    
+    DEFAULT_TTL = 3600
+    
+    _caches = {}
+    _caches_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls, use_testnet=True):
+        """Return the cache shared by every bot and scanner on this exchange"""
+        with cls._caches_lock:
+            cache = cls._caches.get(use_testnet)
+            if cache is None:
+                cache = cls(use_testnet)
+                cls._caches[use_testnet] = cache
+            return cache
+    
+    @classmethod
+    def reset_shared(cls):
+        """Drop every shared cache and stop its refresh thread (the next shared() starts clean)"""
+        with cls._caches_lock:
+            for cache in cls._caches.values():
+                cache.stop()
+            cls._caches = {}
+    
+    def __init__(self, use_testnet=True, ttl=None):
+        self.use_testnet = use_testnet
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.symbols = {}
+        self.last_refresh = 0
+        self.client = None
+        self.refresh_lock = threading.RLock()
+        self.refresh_thread = None
+        self.stop_event = threading.Event()
+    
+    @staticmethod
+    def parse_symbol(s):
+        info = {
+            'symbol': s['symbol'],
+            'status': s.get('status'),
+            'contract_type': s.get('contractType'),
+            'base_asset': s.get('baseAsset'),
+            'quote_asset': s.get('quoteAsset'),
+            'price_precision': s['pricePrecision'],
+            'quantity_precision': s['quantityPrecision'],
+            'tick_size': 0.01,
+            'step_size': 0.001,
+            'min_qty': 0.001,
+            'max_qty': 10000,
+            'min_notional': 0
+        }
+        
+        for f in s['filters']:
+            if f['filterType'] == 'PRICE_FILTER':
+                info['tick_size'] = float(f['tickSize'])
+            elif f['filterType'] == 'LOT_SIZE':
+                info['step_size'] = float(f['stepSize'])
+                info['min_qty'] = float(f['minQty'])
+                info['max_qty'] = float(f['maxQty'])
+            elif f['filterType'] == 'MIN_NOTIONAL':
+                info['min_notional'] = float(f.get('notional', 0))
+        
+        return info
+    
+    def is_stale(self):
+        return not self.symbols or (time.time() - self.last_refresh) >= self.ttl
+    
+    def refresh(self, client=None):
+        """Download exchange info once and swap in the new symbol map"""
+        client = client or self.client
+        if client is None:
+            return False
+        
+        with self.refresh_lock:
+            info = client.futures_exchange_info()
+            self.symbols = {s['symbol']: self.parse_symbol(s) for s in info['symbols']}
+            self.last_refresh = time.time()
+            self.client = client
+        
+        print(f"📚 Exchange info cached: {len(self.symbols)} symbols ({'TESTNET' if self.use_testnet else 'REAL'})")
+        self.start_background_refresh()
+        return True
+    
+    def ensure(self, client=None):
+        """Load on first use; afterwards the background thread keeps it fresh"""
+        if client is not None and self.client is None:
+            self.client = client
+        
+        if not self.symbols:
+            # Concurrent first callers wait for a single download
+            with self.refresh_lock:
+                if not self.symbols:
+                    self.refresh(client)
+    
+    def start_background_refresh(self):
+        if self.refresh_thread and self.refresh_thread.is_alive():
+            return
+        
+        def refresh_loop():
+            while not self.stop_event.wait(self.ttl):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Exchange info refresh failed: {e}")
+        
+        self.refresh_thread = threading.Thread(target=refresh_loop, daemon=True, name="ExchangeInfoRefresh")
+        self.refresh_thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def get(self, symbol, client=None):
+        """O(1) metadata lookup, None if the symbol does not exist"""
+        self.ensure(client)
+        return self.symbols.get(symbol)
+    
+    def tradable_symbols(self, quote_asset='USDT', client=None):
+        self.ensure(client)
+        return [symbol for symbol, info in self.symbols.items()
+                if symbol.endswith(quote_asset) and info['status'] == 'TRADING']
+
+
+# Columns of a cached kline row
+KLINE_OPEN_TIME, KLINE_OPEN, KLINE_HIGH, KLINE_LOW, KLINE_CLOSE, KLINE_VOLUME, KLINE_CLOSE_TIME = range(7)
+
+
+# Indicator core: plain float64 NumPy arrays in, floats out (no DataFrame per call)
+def true_range(high, low, close):
+    """Per-candle true range, same formula as the old row-wise apply (uses the candle's own close)"""
+    return np.maximum(high - low, np.maximum(np.abs(high - close), np.abs(low - close)))
+
+
+def average_true_range(high, low, close, period):
+    """Mean true range of the last `period` candles"""
+    return float(true_range(high[-period:], low[-period:], close[-period:]).mean())
+
+
+def sma(values, period):
+    """Mean of the last `period` values"""
+    return float(values[-period:].mean())
+
+
+def range_volatility(high, low, close):
+    """Window high-low range as a percent of the mean close"""
+    return float((high.max() - low.min()) / close.mean() * 100)
+
+
+def sma_trend(close, short_period=6, long_period=24):
+    """Short SMA vs long SMA, in percent"""
+    sma_long = sma(close, long_period)
+    return (sma(close, short_period) - sma_long) / sma_long * 100
+
+
+def hourly_market_indicators(klines, hours=24, short_hours=6):
+    """analyze_market's volatility and SMA trend as of every candle of `klines`
+    
+    Uses the last `hours` 1h candles with the current one still forming, like the live
+    1h klines request. NaN until `hours - 1` full hours of history exist.
+    """
+    high, low, close = klines[:, KLINE_HIGH], klines[:, KLINE_LOW], klines[:, KLINE_CLOSE]
+    hour = (klines[:, KLINE_OPEN_TIME] // 3600000).astype(np.int64)
+    bounds = np.append(np.flatnonzero(np.diff(hour, prepend=hour[0] - 1)), len(hour))
+    group = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    
+    # Forming-hour high/low up to each candle
+    part_high = np.empty_like(high)
+    part_low = np.empty_like(low)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        part_high[start:end] = np.maximum.accumulate(high[start:end])
+        part_low[start:end] = np.minimum.accumulate(low[start:end])
+    
+    last = bounds[1:] - 1
+    hourly_high, hourly_low, hourly_close = part_high[last], part_low[last], close[last]
+    hour_count = len(last)
+    full = hours - 1
+    
+    prev_high = np.full(hour_count, np.nan)
+    prev_low = np.full(hour_count, np.nan)
+    if hour_count > full:
+        window = np.lib.stride_tricks.sliding_window_view
+        prev_high[full:] = window(hourly_high, full).max(axis=1)[:hour_count - full]
+        prev_low[full:] = window(hourly_low, full).min(axis=1)[:hour_count - full]
+    
+    sums = np.concatenate(([0.0], np.cumsum(hourly_close)))
+    
+    def previous_sum(count):
+        """Sum of the `count` full hourly closes before each hour"""
+        result = np.full(hour_count, np.nan)
+        result[count:] = sums[count:hour_count] - sums[:hour_count - count]
+        return result
+    
+    sma_long = (previous_sum(full)[group] + close) / hours
+    sma_short = (previous_sum(short_hours - 1)[group] + close) / short_hours
+    
+    volatility = ((np.maximum(prev_high[group], part_high) - np.minimum(prev_low[group], part_low))
+                  / sma_long * 100)
+    trend = (sma_short - sma_long) / sma_long * 100
+    trend[np.isnan(volatility)] = np.nan
+    return volatility, trend
+
+
+def benchmark_indicators(rounds=2000):
+    """Time the indicator core against the former pandas code on the same synthetic klines"""
+    rng = np.random.default_rng(7)
+    
+    def synthetic_klines(count):
+        close = 100 + np.cumsum(rng.normal(0, 0.3, count))
+        high = close + rng.uniform(0, 0.5, count)
+        low = close - rng.uniform(0, 0.5, count)
+        return [[i * 60000, f"{c:.4f}", f"{h:.4f}", f"{l:.4f}", f"{c:.4f}", "10", i * 60000 + 59999,
+                 "0", 0, "0", "0", "0"] for i, (c, h, l) in enumerate(zip(close, high, low))]
+    
+    def pandas_market(klines):
+        df = pd.DataFrame(klines, columns=['time', 'open', 'high', 'low', 'close', 'volume', 
+                                           'close_time', 'quote_volume', 'trades', 
+                                           'taker_buy_base', 'taker_buy_quote', 'ignore'])
+        df['close'] = df['close'].astype(float)
+        df['high'] = df['high'].astype(float)
+        df['low'] = df['low'].astype(float)
+        volatility = (df['high'].max() - df['low'].min()) / df['close'].mean() * 100
+        sma_short = df['close'].tail(6).mean()
+        sma_long = df['close'].tail(24).mean()
+        return volatility, ((sma_short - sma_long) / sma_long) * 100
+    
+    def pandas_atr(klines):
+        df = pd.DataFrame(klines, columns=['time', 'open', 'high', 'low', 'close', 'volume', 
+                                           'close_time', 'quote_volume', 'trades', 
+                                           'taker_buy_base', 'taker_buy_quote', 'ignore'])
+        df['close'] = df['close'].astype(float)
+        df['high'] = df['high'].astype(float)
+        df['low'] = df['low'].astype(float)
+        df['tr'] = df[['high', 'low', 'close']].apply(
+            lambda x: max(x['high'] - x['low'], 
+                         abs(x['high'] - x['close']), 
+                         abs(x['low'] - x['close'])), axis=1)
+        return df['tr'].tail(24).mean()
+    
+    def numpy_market(klines):
+        return (range_volatility(klines[:, KLINE_HIGH], klines[:, KLINE_LOW], klines[:, KLINE_CLOSE]),
+                sma_trend(klines[:, KLINE_CLOSE]))
+    
+    def numpy_atr(klines):
+        return average_true_range(klines[:, KLINE_HIGH], klines[:, KLINE_LOW], klines[:, KLINE_CLOSE], 24)
+    
+    def timed(func, data):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            result = func(data)
+        return (time.perf_counter() - started) / rounds * 1e6, result
+    
+    cases = [
+        ("analyze_market / analyze_symbol (1h x 24)", 24, pandas_market, numpy_market),
+        ("calculate_optimal_grid_spacing (15m x 96)", 96, pandas_atr, numpy_atr)
+    ]
+    
+    print(f"Indicator benchmark ({rounds} calls each)")
+    for name, count, pandas_func, numpy_func in cases:
+        raw = synthetic_klines(count)
+        cached = np.array([k[:7] for k in raw], dtype=float)  # what KlineCache returns
+        
+        pandas_us, expected = timed(pandas_func, raw)
+        numpy_us, result = timed(numpy_func, cached)
+        
+        if not np.allclose(expected, result):
+            raise AssertionError(f"{name}: results differ ({expected} vs {result})")
+        print(f"   {name}: pandas {pandas_us:.1f} us | numpy {numpy_us:.1f} us | "
+              f"{pandas_us / numpy_us:.0f}x faster")
+
+
+class KlineBuffer:
+    """Preallocated float64 ring buffer of candles for one (symbol, interval), oldest first"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, 7))
+        self.start = 0
+        self.count = 0
+        self.updated = 0
+        self.lock = threading.Lock()
+    
+    def reset(self):
+        self.start = 0
+        self.count = 0
+    
+    def last_open_time(self):
+        if not self.count:
+            return 0
+        return self.data[(self.start + self.count - 1) % self.capacity, KLINE_OPEN_TIME]
+    
+    def push(self, row):
+        """Append a candle, or overwrite the newest one if it has the same open time"""
+        last_open = self.last_open_time()
+        if self.count and row[KLINE_OPEN_TIME] < last_open:
+            return
+        
+        if self.count and row[KLINE_OPEN_TIME] == last_open:
+            self.data[(self.start + self.count - 1) % self.capacity] = row
+        elif self.count < self.capacity:
+            self.data[(self.start + self.count) % self.capacity] = row
+            self.count += 1
+        else:
+            self.data[self.start] = row
+            self.start = (self.start + 1) % self.capacity
+    
+    def window(self, n):
+        """Copy of the newest n candles, oldest first"""
+        n = min(n, self.count)
+        indexes = (self.start + self.count - n + np.arange(n)) % self.capacity
+        return self.data[indexes]
+
+
+class KlineCache:
+    """Process-wide kline cache (one per exchange) shared by bots, scanner and analytics
+    
+    A refresh only downloads candles from the newest one held onwards, so a warm key costs
+    one small request instead of the whole window. Price streams can also push kline
+    events in, which keeps subscribed keys fresh with no REST traffic at all.
+    """
+    
+    INTERVAL_MS = {
+        '1m': 60000, '3m': 180000, '5m': 300000, '15m': 900000, '30m': 1800000,
+        '1h': 3600000, '2h': 7200000, '4h': 14400000, '6h': 21600000,
+        '8h': 28800000, '12h': 43200000, '1d': 86400000
+    }
+    DEFAULT_CAPACITY = 200
+    DEFAULT_MAX_AGE = 10
+    
+    _caches = {}
+    _caches_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls, use_testnet=True):
+        """Return the cache shared by every bot and scanner on this exchange"""
+        with cls._caches_lock:
+            cache = cls._caches.get(use_testnet)
+            if cache is None:
+                cache = cls(use_testnet)
+                cls._caches[use_testnet] = cache
+            return cache
+    
+    @classmethod
+    def reset_shared(cls):
+        with cls._caches_lock:
+            cls._caches = {}
+    
+    def __init__(self, use_testnet=True, capacity=None, max_age=None):
+        self.use_testnet = use_testnet
+        self.capacity = capacity or self.DEFAULT_CAPACITY
+        self.max_age = self.DEFAULT_MAX_AGE if max_age is None else max_age
+        self.buffers = {}
+        self.lock = threading.Lock()
+        
+        # Stats
+        self.requests = 0
+        self.rows_fetched = 0
+        self.hits = 0
+        self.stream_updates = 0
+    
+    def buffer(self, symbol, interval, size=0):
+        key = (symbol.upper(), interval)
+        with self.lock:
+            buf = self.buffers.get(key)
+            if buf is None or buf.capacity < size:
+                buf = KlineBuffer(max(self.capacity, size))
+                self.buffers[key] = buf
+            return buf
+    
+    def get(self, symbol, interval, limit, client, max_age=None):
+        """Newest `limit` candles as a float64 array (rows oldest first, KLINE_* columns)"""
+        max_age = self.max_age if max_age is None else max_age
+        buf = self.buffer(symbol, interval, limit)
+        
+        with buf.lock:
+            if buf.count >= limit and time.time() - buf.updated <= max_age:
+                self.hits += 1
+            else:
+                self.refresh(buf, symbol, interval, limit, client)
+            return buf.window(limit)
+    
+    def refresh(self, buf, symbol, interval, limit, client):
+        """Fetch only candles newer than the last one held (full window when cold or gapped)"""
+        interval_ms = self.INTERVAL_MS[interval]
+        last_open = buf.last_open_time()
+        missing = int((time.time() * 1000 - last_open) // interval_ms) + 1
+        
+        if buf.count < limit or missing >= limit:
+            klines = client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+            buf.reset()
+        else:
+            klines = client.futures_klines(symbol=symbol, interval=interval,
+                                           startTime=int(last_open), limit=missing + 1)
+        
+        for row in np.array([k[:7] for k in klines], dtype=float):
+            buf.push(row)
+        buf.updated = time.time()
+        
+        self.requests += 1
+        self.rows_fetched += len(klines)
+    
+    def apply_stream_kline(self, symbol, k):
+        """Apply a <symbol>@kline_<interval> event payload to a warm buffer"""
+        interval = k.get('i')
+        buf = self.buffers.get((symbol.upper(), interval))
+        if buf is None or interval not in self.INTERVAL_MS:
+            return
+        
+        with buf.lock:
+            # Only extend contiguous data; after a gap the next get() refetches over REST
+            if not buf.count or k['t'] - buf.last_open_time() > self.INTERVAL_MS[interval]:
+                return
+            
+            buf.push(np.array([k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T']], dtype=float))
+            buf.updated = time.time()
+            self.stream_updates += 1
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    """Immutable USDT account state; replaced as a whole, never mutated"""
+    balance: float
+    available_balance: float
+    unrealized_pnl: float
+    updated: float
+    source: str  # 'rest' or 'stream'
+
+
+class AccountStateService:
+    """One account-state poller per API key, shared by every bot and the GUI
+    
+    A background thread refreshes futures_account every `refresh_interval` seconds and
+    ACCOUNT_UPDATE events from the user data stream are applied in between. Readers take
+    `snapshot` (or get()) and never touch the network while it is fresh.
+    """
+    
+    DEFAULT_INTERVAL = 10
+    
+    _services = {}
+    _services_lock = threading.Lock()
+    
+    @classmethod
+    def for_client(cls, client, use_testnet=True):
+        """Return the shared service for this client's API key"""
+        key = (client.API_KEY, use_testnet)
+        with cls._services_lock:
+            service = cls._services.get(key)
+            if service is None:
+                service = cls(client, use_testnet)
+                cls._services[key] = service
+            return service
+    
+    def __init__(self, client, use_testnet=True, refresh_interval=None):
+        self.client = client
+        self.use_testnet = use_testnet
+        self.refresh_interval = refresh_interval or self.DEFAULT_INTERVAL
+        self.snapshot = None
+        self.position_pnl = {}
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        
+        self.users = set()
+        self.user_stream = None
+        self.stop_event = threading.Event()
+        self.refresh_thread = None
+        
+        # Stats
+        self.requests = 0
+        self.stream_updates = 0
+    
+    def start(self, user, user_stream=None):
+        """Register a user (a running bot); the first one starts the poller"""
+        with self.lock:
+            self.users.add(user)
+            if user_stream and self.user_stream is None:
+                self.user_stream = user_stream
+                user_stream.add_listener(self.handle_user_event)
+            
+            self.stop_event.clear()
+            if self.refresh_thread and self.refresh_thread.is_alive():
+                return
+            self.refresh_thread = threading.Thread(target=self.run, daemon=True, name="AccountState")
+            self.refresh_thread.start()
+    
+    def stop(self, user):
+        """Unregister a user; the poller stops with the last one"""
+        with self.lock:
+            self.users.discard(user)
+            if self.users or self.stop_event.is_set():
+                return
+            self.stop_event.set()
+            user_stream, self.user_stream = self.user_stream, None
+        
+        if user_stream:
+            user_stream.remove_listener(self.handle_user_event)
+    
+    def run(self):
+        while not self.stop_event.is_set():
+            self.refresh()
+            self.stop_event.wait(self.refresh_interval)
+    
+    def is_fresh(self, max_age=None):
+        max_age = self.refresh_interval * 2 if max_age is None else max_age
+        snapshot = self.snapshot
+        return snapshot is not None and time.time() - snapshot.updated <= max_age
+    
+    def get(self, max_age=None):
+        """Latest snapshot, fetching synchronously only if it is older than max_age"""
+        if not self.is_fresh(max_age):
+            with self.refresh_lock:
+                # Another caller may have refreshed while we waited
+                if not self.is_fresh(max_age):
+                    self.refresh()
+        return self.snapshot
+    
+    def refresh(self):
+        try:
+            account = self.client.futures_account()
+            self.requests += 1
+            self.publish_account(account)
+        except Exception as e:
+            print(f"[AccountState] Error updating account: {e}")
+    
+    def publish_account(self, account):
+        """Publish a snapshot from a futures_account payload"""
+        balance = available = 0
+        for asset in account['assets']:
+            if asset['asset'] == 'USDT':
+                balance = float(asset['walletBalance'])
+                available = float(asset['availableBalance'])
+                break
+        
+        with self.lock:
+            self.position_pnl = {
+                (pos['symbol'], pos.get('positionSide', 'BOTH')): float(pos.get('unrealizedProfit', 0))
+                for pos in account.get('positions', [])
+            }
+            self.snapshot = AccountSnapshot(
+                balance=balance,
+                available_balance=available,
+                unrealized_pnl=float(account['totalUnrealizedProfit']),
+                updated=time.time(),
+                source='rest'
+            )
+    
+    def handle_user_event(self, event):
+        """Apply ACCOUNT_UPDATE on top of the last REST snapshot"""
+        if event.get('e') != 'ACCOUNT_UPDATE':
+            return
+        
+        update = event.get('a', {})
+        with self.lock:
+            current = self.snapshot
+            if current is None:
+                return
+            
+            balance = current.balance
+            available = current.available_balance
+            for asset in update.get('B', []):
+                if asset['a'] == 'USDT':
+                    new_balance = float(asset['wb'])
+                    # Not in the event; shift by the wallet change until the next REST refresh
+                    available += new_balance - balance
+                    balance = new_balance
+            
+            for pos in update.get('P', []):
+                self.position_pnl[(pos['s'], pos.get('ps', 'BOTH'))] = float(pos.get('up', 0))
+            
+            self.snapshot = AccountSnapshot(
+                balance=balance,
+                available_balance=available,
+                unrealized_pnl=sum(self.position_pnl.values()) if update.get('P') else current.unrealized_pnl,
+                updated=time.time(),
+                source='stream'
+            )
+            self.stream_updates += 1
+
+
+@dataclass(frozen=True)
+class SummarySnapshot:
+    """Immutable GUI summary totals; replaced as a whole by SummaryWorker"""
+    balance: float
+    available_balance: float
+    unrealized_pnl: float
+    active_bots: int
+    total_bots: int
+    accounts: int
+    updated: float  # time of the oldest account snapshot in the totals
+    built: float
+
+
+class SummaryWorker:
+    """Background thread that keeps the GUI summary totals fresh
+    
+    Every `interval` seconds it refreshes any stale account snapshot (network I/O happens
+    here, never on the Tk thread), sums every distinct account and publishes one
+    SummarySnapshot. The GUI only reads `snapshot` and its age.
+    """
+    
+    DEFAULT_INTERVAL = 2
+    
+    def __init__(self, get_bots, interval=None, stale_after=None):
+        self.get_bots = get_bots
+        self.interval = interval or self.DEFAULT_INTERVAL
+        self.stale_after = stale_after or AccountStateService.DEFAULT_INTERVAL * 3
+        self.snapshot = None
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True, name="SummaryWorker")
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[Summary] Error updating summary: {e}")
+            self.stop_event.wait(self.interval)
+    
+    def refresh(self):
+        bots = [bot for bot in self.get_bots() if bot]
+        
+        services = []
+        for bot in bots:
+            if all(service is not bot.account_state for service in services):
+                services.append(bot.account_state)
+        
+        balance = available = unrealized = 0
+        updated = time.time()
+        accounts = 0
+        for service in services:
+            # Services of stopped bots have no poller; refresh them here
+            snapshot = service.get(max_age=self.stale_after / 2)
+            if snapshot is None:
+                continue
+            accounts += 1
+            balance += snapshot.balance
+            available += snapshot.available_balance
+            unrealized += snapshot.unrealized_pnl
+            updated = min(updated, snapshot.updated)
+        
+        previous = self.snapshot
+        self.snapshot = SummarySnapshot(
+            balance=balance,
+            available_balance=available,
+            unrealized_pnl=unrealized,
+            active_bots=len([bot for bot in bots if bot.snapshot and bot.snapshot.is_running]),
+            total_bots=len(bots),
+            accounts=accounts,
+            updated=updated if accounts else (previous.updated if previous else 0),
+            built=time.time()
+        )
+    
+    def age(self):
+        """Seconds since the summary's account data was fetched (None before the first fetch)"""
+        snapshot = self.snapshot
+        if snapshot is None or not snapshot.updated:
+            return None
+        return time.time() - snapshot.updated
+    
+    def is_stale(self):
+        age = self.age()
+        return age is not None and age > self.stale_after
+
+
+class StateStore:
+    """Local SQLite (WAL) store for trades, order events, grid snapshots and peak PnL
+    
+    Writes are queued and committed in batches by one writer thread, so bot threads never
+    wait on disk. Reads use a per-thread connection; WAL lets them run alongside the writer.
+    """
+    
+    DEFAULT_PATH = "gridbot_state.db"
+    BATCH_SIZE = 500
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS trades (
+            network TEXT, symbol TEXT, trade_id INTEGER, order_id INTEGER,
+            side TEXT, position_side TEXT, price REAL, qty REAL,
+            commission REAL, realized_pnl REAL, time INTEGER,
+            PRIMARY KEY (network, symbol, trade_id)
+        );
+        CREATE INDEX IF NOT EXISTS trades_by_time ON trades (network, symbol, time);
+        
+        CREATE TABLE IF NOT EXISTS order_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            network TEXT, symbol TEXT, order_id INTEGER, event TEXT,
+            side TEXT, position_side TEXT, price REAL, qty REAL, filled REAL, time INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS order_events_by_order ON order_events (network, symbol, order_id);
+        CREATE INDEX IF NOT EXISTS order_events_by_time ON order_events (network, symbol, time);
+        
+        CREATE TABLE IF NOT EXISTS grid_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            network TEXT, symbol TEXT, base_price REAL, levels TEXT,
+            quantity REAL, state TEXT, active INTEGER, time REAL
+        );
+        CREATE INDEX IF NOT EXISTS grid_snapshots_by_symbol ON grid_snapshots (network, symbol, id);
+        
+        CREATE TABLE IF NOT EXISTS position_peaks (
+            network TEXT, symbol TEXT, position_key TEXT, peak_pnl REAL, updated REAL,
+            PRIMARY KEY (network, symbol, position_key)
+        );
+    """
+    
+    _stores = {}
+    _stores_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls, path=None):
+        """Return the store for this database file (one writer per file per process)"""
+        path = os.path.abspath(path or cls.DEFAULT_PATH)
+        with cls._stores_lock:
+            store = cls._stores.get(path)
+            if store is None:
+                store = cls(path)
+                cls._stores[path] = store
+            return store
+    
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.queue = queue.Queue()
+        self.writes = 0
+        self.batches = 0
+        self.failed_rows = 0
+        
+        conn = self.connect()
+        conn.executescript(self.SCHEMA)
+        conn.close()
+        
+        self.writer_thread = threading.Thread(target=self.run_writer, daemon=True, name="StateStore")
+        self.writer_thread.start()
+    
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def reader(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+    
+    def run_writer(self):
+        conn = self.connect()
+        
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                with conn:
+                    for sql, rows in batch:
+                        conn.executemany(sql, rows)
+                self.writes += len(batch)
+                self.batches += 1
+            except Exception as e:
+                # One bad row rolled back the whole batch: redo it piecewise so only that row is lost
+                print(f"⚠️ [StateStore] Batch write error: {e} - retrying writes one by one")
+                for sql, rows in batch:
+                    self.apply_write(conn, sql, rows)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+    
+    def apply_write(self, conn, sql, rows):
+        """Commit one queued write on its own, falling back to row by row"""
+        try:
+            with conn:
+                conn.executemany(sql, rows)
+            self.writes += 1
+            return
+        except Exception:
+            pass
+        
+        for row in rows:
+            try:
+                with conn:
+                    conn.execute(sql, row)
+            except Exception as e:
+                self.failed_rows += 1
+                print(f"⚠️ [StateStore] Dropped row {row!r}: {e}")
+        self.writes += 1
+    
+    def write(self, sql, rows):
+        """Queue a write (never blocks on disk)"""
+        if rows:
+            self.queue.put((sql, rows))
+    
+    def flush(self):
+        """Wait until every queued write is committed"""
+        self.queue.join()
+    
+    # Writes
+    
+    def record_trades(self, network, symbol, trades):
+        """trades: futures_account_trades rows (duplicates are ignored)"""
+        self.write(
+            "INSERT OR IGNORE INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(network, symbol, t['id'], t.get('orderId'), t['side'], t.get('positionSide', 'BOTH'),
+              float(t['price']), float(t['qty']), float(t.get('commission', 0)),
+              float(t.get('realizedPnl', 0)), t['time'])
+             for t in trades]
+        )
+    
+    def record_order_event(self, network, symbol, order_id, event, side, position_side,
+                           price, qty, filled=0, event_time=None):
+        self.write(
+            "INSERT INTO order_events (network, symbol, order_id, event, side, position_side, "
+            "price, qty, filled, time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(network, symbol, order_id, event, side, position_side, price, qty, filled,
+              event_time or int(time.time() * 1000))]
+        )
+    
+    def save_grid_snapshot(self, network, symbol, state):
+        self.write(
+            "UPDATE grid_snapshots SET active = 0 WHERE network = ? AND symbol = ?",
+            [(network, symbol)]
+        )
+        self.write(
+            "INSERT INTO grid_snapshots (network, symbol, base_price, levels, quantity, state, active, time) "
+            "VALUES (?, ?, ?, ?, ?, ?, 1, ?)",
+            [(network, symbol, state['grid_base_price'], json.dumps(state['locked_grid_levels']),
+              state.get('quantity', 0), json.dumps(state), state.get('saved_at', time.time()))]
+        )
+    
+    def clear_grid_snapshot(self, network, symbol):
+        """Keep the history but mark no grid as resumable"""
+        self.write(
+            "UPDATE grid_snapshots SET active = 0 WHERE network = ? AND symbol = ?",
+            [(network, symbol)]
+        )
+    
+    def save_position_peak(self, network, symbol, position_key, peak_pnl):
+        self.write(
+            "INSERT OR REPLACE INTO position_peaks VALUES (?, ?, ?, ?, ?)",
+            [(network, symbol, position_key, peak_pnl, time.time())]
+        )
+    
+    def delete_position_peak(self, network, symbol, position_key):
+        self.write(
+            "DELETE FROM position_peaks WHERE network = ? AND symbol = ? AND position_key = ?",
+            [(network, symbol, position_key)]
+        )
+    
+    # Reads
+    
+    def trades_page(self, network, symbol, page=0, page_size=50):
+        """Newest-first page of trades (page 0 = most recent)"""
+        rows = self.reader().execute(
+            "SELECT * FROM trades WHERE network = ? AND symbol = ? "
+            "ORDER BY time DESC, trade_id DESC LIMIT ? OFFSET ?",
+            (network, symbol, page_size, page * page_size)
+        ).fetchall()
+        
+        return [{
+            'id': row['trade_id'],
+            'order_id': row['order_id'],
+            'symbol': symbol,
+            'side': row['side'],
+            'price': row['price'],
+            'quantity': row['qty'],
+            'commission': row['commission'],
+            'realized_pnl': row['realized_pnl'],
+            'time_ms': row['time'],
+            'time': datetime.fromtimestamp(row['time'] / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+            'position_side': row['position_side']
+        } for row in rows]
+    
+    def trade_count(self, network, symbol):
+        return self.reader().execute(
+            "SELECT COUNT(*) FROM trades WHERE network = ? AND symbol = ?", (network, symbol)
+        ).fetchone()[0]
+    
+    def order_events(self, network, symbol, order_id=None, limit=100):
+        if order_id is None:
+            rows = self.reader().execute(
+                "SELECT * FROM order_events WHERE network = ? AND symbol = ? ORDER BY time DESC LIMIT ?",
+                (network, symbol, limit)
+            ).fetchall()
+        else:
+            rows = self.reader().execute(
+                "SELECT * FROM order_events WHERE network = ? AND symbol = ? AND order_id = ? ORDER BY id",
+                (network, symbol, order_id)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def load_grid_snapshot(self, network, symbol):
+        """Latest resumable grid state dict, or None"""
+        self.flush()
+        row = self.reader().execute(
+            "SELECT state FROM grid_snapshots WHERE network = ? AND symbol = ? AND active = 1 "
+            "ORDER BY id DESC LIMIT 1",
+            (network, symbol)
+        ).fetchone()
+        return json.loads(row['state']) if row else None
+    
+    def load_position_peaks(self, network, symbol):
+        self.flush()
+        rows = self.reader().execute(
+            "SELECT position_key, peak_pnl FROM position_peaks WHERE network = ? AND symbol = ?",
+            (network, symbol)
+        ).fetchall()
+        return {row['position_key']: row['peak_pnl'] for row in rows}
+
+
+class TradeHistory:
+    """Columnar fill history for one symbol, ingested incrementally by trade id
+    
+    REST polling only asks for trades after the `from_id` cursor. Numbers live in growable
+    NumPy columns; display dicts (with formatted times) are only built for rows being read.
+    """
+    
+    PAGE_SIZE = 1000          # futures_account_trades max limit
+    WINDOW_MS = 7 * 86400000  # max startTime/endTime span per request
+    MAX_AGE_MS = 180 * 86400000
+    
+    SIDES = ('BUY', 'SELL')
+    POSITION_SIDES = ('BOTH', 'LONG', 'SHORT')
+    
+    def __init__(self, symbol, capacity=1024):
+        self.symbol = symbol
+        self.lock = threading.Lock()
+        self.count = 0
+        self.from_id = None        # last trade id covered by REST polling
+        self.known_ids = set()
+        self.version = 0           # bumped whenever rows are added
+        self.history_complete = False
+        self.allocate(capacity)
+    
+    def allocate(self, capacity):
+        old = getattr(self, 'ids', None)
+        columns = {
+            'ids': np.int64, 'order_ids': np.int64, 'times': np.int64,
+            'prices': np.float64, 'qtys': np.float64, 'commissions': np.float64, 'realized_pnls': np.float64,
+            'sides': np.int8, 'position_sides': np.int8
+        }
+        for name, dtype in columns.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                column[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, column)
+        self.capacity = capacity
+    
+    def next_params(self, limit=50):
+        """futures_account_trades params for the next incremental poll"""
+        if self.from_id is None:
+            return {'symbol': self.symbol, 'limit': limit}
+        return {'symbol': self.symbol, 'fromId': self.from_id + 1, 'limit': self.PAGE_SIZE}
+    
+    def append(self, trades, from_poll=False):
+        """Add raw API trades (or stream-built ones); returns the new trades, oldest first
+        
+        from_poll=True advances the REST cursor. Stream trades don't, so a poll after a
+        reconnect still picks up anything missed in between.
+        """
+        with self.lock:
+            new = [t for t in trades if t['id'] not in self.known_ids]
+            if from_poll and trades:
+                self.from_id = max(self.from_id or 0, max(t['id'] for t in trades))
+            if not new:
+                return []
+            
+            new.sort(key=lambda t: t['id'])
+            if self.count + len(new) > self.capacity:
+                self.allocate(max(self.capacity * 2, self.count + len(new)))
+            
+            n = self.count
+            k = len(new)
+            self.ids[n:n + k] = [t['id'] for t in new]
+            self.order_ids[n:n + k] = [t.get('orderId') or 0 for t in new]
+            self.times[n:n + k] = [t['time'] for t in new]
+            self.prices[n:n + k] = [float(t['price']) for t in new]
+            self.qtys[n:n + k] = [float(t['qty']) for t in new]
+            self.commissions[n:n + k] = [float(t.get('commission', 0)) for t in new]
+            self.realized_pnls[n:n + k] = [float(t.get('realizedPnl', 0)) for t in new]
+            self.sides[n:n + k] = [self.SIDES.index(t['side']) for t in new]
+            self.position_sides[n:n + k] = [self.POSITION_SIDES.index(t.get('positionSide', 'BOTH')) for t in new]
+            self.count += k
+            
+            # Late or backfilled rows: keep the columns in trade id order
+            if n and self.ids[n] < self.ids[n - 1]:
+                order = np.argsort(self.ids[:self.count], kind='stable')
+                for name in ('ids', 'order_ids', 'times', 'prices', 'qtys', 'commissions',
+                             'realized_pnls', 'sides', 'position_sides'):
+                    column = getattr(self, name)
+                    column[:self.count] = column[:self.count][order]
+            
+            self.known_ids.update(t['id'] for t in new)
+            self.version += 1
+            return new
+    
+    def ingest(self, client, limit=50):
+        """Fetch only trades newer than the cursor (all pages); returns the new trades"""
+        new = []
+        while True:
+            trades = client.futures_account_trades(**self.next_params(limit))
+            new += self.append(trades, from_poll=True)
+            if len(trades) < self.PAGE_SIZE or 'fromId' not in self.next_params(limit):
+                return new
+    
+    def backfill(self, client, max_requests=4):
+        """Fetch older trades before the oldest held, one 7-day window per request
+        
+        Stops after the first window that adds rows; returns the trades added.
+        """
+        now_ms = int(time.time() * 1000)
+        with self.lock:
+            end = int(self.times[:self.count].min()) - 1 if self.count else now_ms
+        
+        added = []
+        for _ in range(max_requests):
+            if now_ms - end > self.MAX_AGE_MS:
+                self.history_complete = True
+                break
+            
+            trades = client.futures_account_trades(symbol=self.symbol, startTime=end - self.WINDOW_MS + 1,
+                                                   endTime=end, limit=self.PAGE_SIZE)
+            added += self.append(trades)
+            if len(trades) == self.PAGE_SIZE:
+                end = min(t['time'] for t in trades) - 1
+            else:
+                end -= self.WINDOW_MS
+            
+            if added:
+                break
+        return added
+    
+    def row(self, i, time_format='%H:%M:%S'):
+        """Display dict for one row (formatting happens here, on read)"""
+        return {
+            'id': int(self.ids[i]),
+            'order_id': int(self.order_ids[i]),
+            'symbol': self.symbol,
+            'side': self.SIDES[self.sides[i]],
+            'price': float(self.prices[i]),
+            'quantity': float(self.qtys[i]),
+            'commission': float(self.commissions[i]),
+            'realized_pnl': float(self.realized_pnls[i]),
+            'time_ms': int(self.times[i]),
+            'time': datetime.fromtimestamp(self.times[i] / 1000).strftime(time_format),
+            'position_side': self.POSITION_SIDES[self.position_sides[i]]
+        }
+    
+    def recent(self, n=100):
+        """Newest n rows, oldest first"""
+        with self.lock:
+            return [self.row(i) for i in range(max(0, self.count - n), self.count)]
+    
+    def page(self, page=0, page_size=50):
+        """Newest-first page of rows"""
+        with self.lock:
+            stop = self.count - page * page_size
+            return [self.row(i, '%Y-%m-%d %H:%M:%S') for i in range(stop - 1, max(0, stop - page_size) - 1, -1)]
+    
+    def totals(self):
+        with self.lock:
+            return {
+                'trades': self.count,
+                'realized_pnl': float(self.realized_pnls[:self.count].sum()),
+                'commission': float(self.commissions[:self.count].sum()),
+                'volume': float((self.prices[:self.count] * self.qtys[:self.count]).sum())
+            }
+
+
+class ScheduledTask:
+    """One periodic bot task with its own cadence and start deadline"""
+    
+    def __init__(self, name, func, interval, priority=PRIORITY_NORMAL, deadline=None, jitter=0.1):
+        self.name = name
+        self.func = func
+        self.async_func = None  # Set by runtimes that have a non-blocking version
+        self.interval = interval
+        self.priority = priority
+        self.deadline = deadline if deadline is not None else interval
+        self.jitter = jitter
+        
+        self.next_run = 0
+        self.last_run = 0
+        self.runs = 0
+        self.late_runs = 0
+        self.errors = 0
+        self.max_lateness = 0
+        self.durations = deque(maxlen=200)
+    
+    def reschedule(self, now):
+        spread = self.interval * self.jitter
+        self.next_run = now + self.interval + random.uniform(-spread, spread)
+
+
+class TaskScheduler:
+    """Per-bot task table: every task runs on its own interval, most urgent first
+    
+    Tasks due at the same moment run in priority order (PRIORITY_CRITICAL first). First
+    runs start at a random offset and every reschedule is jittered, so bots started
+    together drift apart instead of hitting the API in lockstep.
+    """
+    
+    def __init__(self, name, start_spread=2.0):
+        self.name = name
+        self.start_spread = start_spread
+        self.tasks = {}
+    
+    def add(self, name, func, interval, priority=PRIORITY_NORMAL, deadline=None, jitter=0.1):
+        task = ScheduledTask(name, func, interval, priority, deadline, jitter)
+        task.next_run = time.time() + random.uniform(0, min(interval, self.start_spread))
+        self.tasks[name] = task
+        return task
+    
+    def trigger(self, name):
+        """Make a task due now (e.g. refresh positions right after a fill)"""
+        task = self.tasks.get(name)
+        if task:
+            task.next_run = min(task.next_run, time.time())
+    
+    def due_tasks(self, now=None):
+        now = now or time.time()
+        due = [task for task in self.tasks.values() if task.next_run <= now]
+        due.sort(key=lambda task: (task.priority, task.next_run))
+        return due
+    
+    def seconds_until_next(self, now=None):
+        if not self.tasks:
+            return 1.0
+        now = now or time.time()
+        return max(0.0, min(task.next_run for task in self.tasks.values()) - now)
+    
+    def mark_started(self, task, started):
+        lateness = started - task.next_run
+        task.max_lateness = max(task.max_lateness, lateness)
+        if lateness > task.deadline:
+            task.late_runs += 1
+        task.last_run = started
+        task.runs += 1
+        task.reschedule(started)
+    
+    def mark_finished(self, task, started, error=None):
+        task.durations.append(time.time() - started)
+        if error is not None:
+            task.errors += 1
+            print(f"[{self.name}] Task {task.name} error: {error}")
+    
+    def run_task(self, task):
+        """Run one due task on the calling thread and return its result"""
+        started = time.time()
+        self.mark_started(task, started)
+        try:
+            result = task.func()
+        except Exception as e:
+            self.mark_finished(task, started, e)
+            return None
+        self.mark_finished(task, started)
+        return result
+    
+    def stats(self):
+        """Per-task run counts and timings"""
+        stats = {}
+        for name, task in self.tasks.items():
+            durations = list(task.durations)
+            stats[name] = {
+                'interval': task.interval,
+                'runs': task.runs,
+                'late_runs': task.late_runs,
+                'errors': task.errors,
+                'max_lateness': task.max_lateness,
+                'avg_duration': sum(durations) / len(durations) if durations else 0,
+                'max_duration': max(durations) if durations else 0
+            }
+        return stats
+
+
+# Strategy settings the backtester reads (defaults match a fresh BinanceFuturesBot)
+BACKTEST_DEFAULTS = {
+    'capital': 1000,
+    'grid_count': 10,
+    'grid_range_percent': 2,
+    'max_open_orders_per_side': 5,
+    'enable_position_tp': True,
+    'enable_position_sl': True,
+    'enable_trailing_per_position': True,
+    'position_tp_percent': 3.0,
+    'position_sl_percent': 2.0,
+    'position_trailing_percent': 1.5,
+    'enable_dynamic_grid': True,
+    'rebalance_cooldown': 300,
+    'enable_auto_pause_resume': True,
+    'volatility_threshold': 5,
+    'trend_threshold': 3,
+    'pause_cooldown': 180,
+    'max_pauses_per_hour': 3,
+    'required_stable_checks': 3,
+    'stop_loss_percent': 5,
+    'take_profit_percent': 10,
+    'trailing_stop_percent': 2,
+    'max_drawdown_percent': 15,
+    'daily_loss_limit_percent': 10,
+    'tick_size': 0.01,
+    'step_size': 0.001,
+    'min_qty': 0.001
+}
+
+
+class GridBacktester:
+    """Replay historical klines through the bot's grid rules, without an exchange
+    
+    Mirrors BinanceFuturesBot: locked levels around a base price, hedge LONG/SHORT limit
+    fills refilled per level, TP/SL/trailing on each hedge position, rebalance with
+    cooldown, auto pause/resume from the 1h market analysis and the bot-level risk stop.
+    Stretches where nothing can trigger are skipped with vectorized scans; only candles
+    that may trigger are walked along open -> low/high -> close (the nearer extreme of a
+    green candle is taken to be the low). One market check per candle; funding is not
+    modelled.
+    """
+    
+    SCAN_CHUNK = 32
+    MAX_SCAN_CHUNK = 65536
+    
+    def __init__(self, klines, settings=None, maker_fee=0.0002, taker_fee=0.0005, indicators=None):
+        self.klines = np.asarray(klines, dtype=float)[:, :7]
+        self.open = self.klines[:, KLINE_OPEN]
+        self.high = self.klines[:, KLINE_HIGH]
+        self.low = self.klines[:, KLINE_LOW]
+        self.close = self.klines[:, KLINE_CLOSE]
+        self.times = self.klines[:, KLINE_OPEN_TIME].astype(np.int64)
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        
+        # The 1h analysis only depends on the data; reuse it across parameter sets
+        self.volatility, self.trend = indicators or hourly_market_indicators(self.klines)
+        
+        unknown = set(settings or {}) - set(BACKTEST_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown backtest settings: {', '.join(sorted(unknown))}")
+        self.settings = dict(BACKTEST_DEFAULTS, **(settings or {}))
+        for key, value in self.settings.items():
+            setattr(self, key, value)
+    
+    @staticmethod
+    def settings_from_bot(bot):
+        """Current strategy settings of a live bot, for a backtest with the same configuration"""
+        return {key: getattr(bot, key) for key in BACKTEST_DEFAULTS}
+    
+    def candles(self, seconds):
+        """Whole candles covering `seconds` of wall time"""
+        return max(1, math.ceil(seconds / self.candle_seconds))
+    
+    def reset(self):
+        count = len(self.klines)
+        steps = np.diff(self.times)
+        self.candle_seconds = float(np.median(steps)) / 1000 if len(steps) else 60
+        
+        self.stable = (np.abs(self.trend) <= self.trend_threshold) & (self.volatility <= self.volatility_threshold)
+        index = np.arange(count)
+        self.stable_streak = index - np.maximum.accumulate(np.where(self.stable, -1, index))
+        
+        self.balance = float(self.capital)
+        self.highest_balance = self.balance
+        self.equity = np.empty(count)
+        self.trades = []
+        self.fees = 0.0
+        self.realized_pnl = 0.0
+        
+        self.orders = []
+        self.positions = {}
+        self.locked_grid_levels = []
+        self.grid_base_price = 0
+        self.grid_initialized = False
+        self.is_paused = False
+        self.auto_paused = False
+        self.auto_pause_enabled = self.enable_auto_pause_resume
+        self.rebalance_gate = 0
+        self.pause_gate = 0
+        self.pause_candles = []
+        self.rebalance_count = 0
+        self.pause_count = 0
+        self.stop_reason = None
+    
+    def run(self):
+        """Replay every candle; returns {'summary', 'times', 'equity', 'trades'}"""
+        started = time.perf_counter()
+        self.reset()
+        count = len(self.klines)
+        
+        k = 0
+        while k < count:
+            j = self.next_event(k)
+            self.fill_equity(k, j)
+            if j >= count:
+                break
+            
+            if j > k:
+                self.track_peaks(self.high[k:j].max(), self.low[k:j].min())
+            self.walk_candle(j)
+            if self.stop_reason is None:
+                self.check_market(j)
+            self.fill_equity(j, j + 1)
+            k = j + 1
+            
+            if self.stop_reason is not None:
+                self.equity[k:] = self.balance
+                break
+        
+        return {
+            'summary': self.summary(time.perf_counter() - started),
+            'times': self.times,
+            'equity': self.equity,
+            'trades': self.trades
+        }
+    
+    def summary(self, elapsed):
+        equity = self.equity
+        peak = np.maximum.accumulate(equity)
+        closes = [t for t in self.trades if t['event'] != 'FILL']
+        return {
+            'candles': len(equity),
+            'start': datetime.fromtimestamp(self.times[0] / 1000).strftime('%Y-%m-%d %H:%M'),
+            'end': datetime.fromtimestamp(self.times[-1] / 1000).strftime('%Y-%m-%d %H:%M'),
+            'initial_balance': float(self.capital),
+            'final_equity': float(equity[-1]),
+            'return_percent': float((equity[-1] - self.capital) / self.capital * 100),
+            'max_drawdown_percent': float(((peak - equity) / peak).max() * 100),
+            'realized_pnl': float(self.realized_pnl),
+            'fees': float(self.fees),
+            'fills': len(self.trades) - len(closes),
+            'closes': len(closes),
+            'wins': sum(1 for t in closes if t['realized_pnl'] > 0),
+            'rebalances': self.rebalance_count,
+            'pauses': self.pause_count,
+            'stop_reason': self.stop_reason,
+            'seconds': elapsed
+        }
+    
+    # --- grid -------------------------------------------------------------
+    
+    def round_price(self, price):
+        return math.floor(price / self.tick_size + 1e-9) * self.tick_size
+    
+    def lock_grid(self, j, price):
+        """calculate_and_lock_grid_levels + reconcile: resting orders become the new grid"""
+        self.grid_base_price = price
+        upper_price = price * (1 + self.grid_range_percent / 100)
+        lower_price = price * (1 - self.grid_range_percent / 100)
+        step = (upper_price - lower_price) / (self.grid_count - 1)
+        self.locked_grid_levels = [lower_price + i * step for i in range(self.grid_count)]
+        
+        quantity = math.floor((self.capital / 2) / (self.grid_count / 2) / price / self.step_size + 1e-9) * self.step_size
+        if quantity < self.min_qty:
+            self.stop(j, price, f"Quantity too small: {quantity}")
+            return False
+        
+        self.orders = []
+        long_count = 0
+        short_count = 0
+        for level in self.locked_grid_levels:
+            if level < price and long_count < self.max_open_orders_per_side:
+                self.orders.append({'side': 'BUY', 'position_side': 'LONG', 'price': self.round_price(level),
+                                    'quantity': quantity, 'active_from': j})
+                long_count += 1
+            elif level > price and short_count < self.max_open_orders_per_side:
+                self.orders.append({'side': 'SELL', 'position_side': 'SHORT', 'price': self.round_price(level),
+                                    'quantity': quantity, 'active_from': j})
+                short_count += 1
+        
+        self.grid_initialized = bool(self.orders)
+        return True
+    
+    def rebalance_bounds(self):
+        """(lower, upper) price triggers of check_grid_rebalance"""
+        upper_bound = max(self.locked_grid_levels)
+        lower_bound = min(self.locked_grid_levels)
+        buffer = (upper_bound - lower_bound) * 0.20
+        return lower_bound - buffer, upper_bound + buffer
+    
+    def rebalance_armed(self, j):
+        return (self.enable_dynamic_grid and self.grid_initialized and not self.auto_paused
+                and j >= self.rebalance_gate)
+    
+    # --- positions --------------------------------------------------------
+    
+    def position_triggers(self, side, position):
+        """(take profit, stop loss) prices of a hedge position, None when disabled"""
+        entry = position['entry']
+        direction = 1 if side == 'LONG' else -1
+        take_profit = entry * (1 + direction * self.position_tp_percent / 100) if self.enable_position_tp else None
+        stop_loss = entry * (1 - direction * self.position_sl_percent / 100) if self.enable_position_sl else None
+        return take_profit, stop_loss
+    
+    def trailing_price(self, side, position):
+        """Price where the PnL has given back position_trailing_percent of its peak, or None"""
+        if not self.enable_trailing_per_position or position['peak'] <= 0:
+            return None
+        direction = 1 if side == 'LONG' else -1
+        give_back = position['peak'] * (1 - self.position_trailing_percent / 100) / position['amount']
+        return position['entry'] + direction * give_back
+    
+    def unrealized(self, prices):
+        pnl = 0
+        for side, position in self.positions.items():
+            direction = 1 if side == 'LONG' else -1
+            pnl = pnl + direction * (prices - position['entry']) * position['amount']
+        return pnl
+    
+    def track_peaks(self, high, low):
+        """Peak PnL per position (position_highest_pnl) after the price visited high and low"""
+        for side, position in self.positions.items():
+            best = high if side == 'LONG' else low
+            direction = 1 if side == 'LONG' else -1
+            position['peak'] = max(position['peak'], direction * (best - position['entry']) * position['amount'])
+    
+    def fill_equity(self, start, end):
+        if end > start:
+            self.equity[start:end] = self.balance + self.unrealized(self.close[start:end])
+    
+    # --- event search -----------------------------------------------------
+    
+    def next_event(self, k):
+        """First candle from k on where an order, exit, rebalance or market change may trigger"""
+        count = len(self.klines)
+        chunk = self.SCAN_CHUNK
+        peaks = {side: position['entry'] + (1 if side == 'LONG' else -1) * position['peak'] / position['amount']
+                 for side, position in self.positions.items()}
+        
+        start = k
+        while start < count:
+            end = min(count, start + chunk)
+            hit = self.scan(start, end, peaks)
+            if hit.any():
+                return start + int(hit.argmax())
+            start = end
+            chunk = min(chunk * 2, self.MAX_SCAN_CHUNK)
+        return count
+    
+    def scan(self, start, end, peaks):
+        """Candles of [start, end) that may trigger something; a superset, walk_candle decides"""
+        low = self.low[start:end]
+        high = self.high[start:end]
+        hit = np.zeros(end - start, dtype=bool)
+        
+        if self.orders:
+            prices = np.array([o['price'] for o in self.orders])
+            hit |= ((low[:, None] <= prices) & (prices <= high[:, None])).any(axis=1)
+        
+        for side, position in self.positions.items():
+            entry = position['entry']
+            take_profit, stop_loss = self.position_triggers(side, position)
+            
+            if side == 'LONG':
+                if take_profit is not None:
+                    hit |= high >= take_profit
+                if stop_loss is not None:
+                    hit |= low <= stop_loss
+                if self.enable_trailing_per_position:
+                    best = np.maximum(np.maximum.accumulate(high), peaks[side])
+                    level = entry + (best - entry) * (1 - self.position_trailing_percent / 100)
+                    hit |= (best > entry) & (low <= level) & (high > entry)
+                    peaks[side] = best[-1]
+            else:
+                if take_profit is not None:
+                    hit |= low <= take_profit
+                if stop_loss is not None:
+                    hit |= high >= stop_loss
+                if self.enable_trailing_per_position:
+                    best = np.minimum(np.minimum.accumulate(low), peaks[side])
+                    level = entry - (entry - best) * (1 - self.position_trailing_percent / 100)
+                    hit |= (best < entry) & (high >= level) & (low < entry)
+                    peaks[side] = best[-1]
+        
+        if self.enable_dynamic_grid and self.grid_initialized and not self.auto_paused:
+            lower, upper = self.rebalance_bounds()
+            outside = (high > upper) | (low < lower)
+            outside[:max(0, self.rebalance_gate - start)] = False
+            hit |= outside
+        
+        index = np.arange(start, end)
+        if self.auto_paused:
+            hit |= (self.stable_streak[start:end] >= self.required_stable_checks) & (index >= self.pause_gate)
+        elif not self.is_paused and not self.grid_initialized:
+            hit |= self.stable[start:end]
+        elif self.auto_pause_enabled and self.grid_initialized:
+            hit |= ~self.stable[start:end] & (index >= self.pause_gate)
+        
+        return hit
+    
+    # --- candle walk ------------------------------------------------------
+    
+    def walk_candle(self, j):
+        o, h, l, c = self.open[j], self.high[j], self.low[j], self.close[j]
+        path = (l, h, c) if c >= o else (h, l, c)
+        
+        price = o
+        for target in path:
+            while self.stop_reason is None:
+                event = self.next_price_event(j, price, target)
+                if event is None:
+                    break
+                price, handler, args = event
+                self.track_peaks(price, price)
+                handler(j, price, *args)
+            
+            if self.stop_reason is not None:
+                return
+            price = target
+            self.track_peaks(price, price)
+    
+    @staticmethod
+    def crossed(a, b, threshold, above):
+        """Price where a move a -> b first reaches `threshold` from the given side, or None"""
+        if above:
+            if a >= threshold:
+                return a
+            return threshold if b >= threshold else None
+        if a <= threshold:
+            return a
+        return threshold if b <= threshold else None
+    
+    def next_price_event(self, j, a, b):
+        """Nearest trigger on the move a -> b: (price, handler, args) or None"""
+        low, high = min(a, b), max(a, b)
+        events = []
+        
+        for order in self.orders:
+            if order['active_from'] <= j and low <= order['price'] <= high:
+                events.append((order['price'], self.fill_order, (order,)))
+        
+        for side, position in list(self.positions.items()):
+            take_profit, stop_loss = self.position_triggers(side, position)
+            is_long = side == 'LONG'
+            
+            if take_profit is not None:
+                price = self.crossed(a, b, take_profit, above=is_long)
+                if price is not None:
+                    events.append((price, self.close_position, (side, 'TAKE_PROFIT')))
+            
+            if stop_loss is not None:
+                price = self.crossed(a, b, stop_loss, above=not is_long)
+                if price is not None:
+                    events.append((price, self.close_position, (side, 'STOP_LOSS')))
+            
+            trailing = self.trailing_price(side, position)
+            if trailing is not None:
+                price = self.crossed(a, b, trailing, above=not is_long)
+                if price is not None and (price > position['entry']) == is_long:
+                    events.append((price, self.close_position, (side, 'TRAILING')))
+        
+        if self.rebalance_armed(j):
+            lower, upper = self.rebalance_bounds()
+            for threshold, above in ((upper, True), (lower, False)):
+                price = self.crossed(a, b, threshold, above)
+                if price is not None:
+                    events.append((price, self.rebalance, ()))
+        
+        if not events:
+            return None
+        return min(events, key=lambda event: abs(event[0] - a))
+    
+    def record(self, j, event, side, position_side, price, quantity, fee, realized_pnl=0.0):
+        self.trades.append({
+            'time': int(self.times[j]),
+            'event': event,
+            'side': side,
+            'position_side': position_side,
+            'price': price,
+            'quantity': quantity,
+            'fee': fee,
+            'realized_pnl': realized_pnl,
+            'balance': self.balance
+        })
+    
+    def fill_order(self, j, price, order):
+        """Limit fill: grow the hedge position, then re-place the level (refill_grid_level)"""
+        self.orders.remove(order)
+        quantity = order['quantity']
+        fee = price * quantity * self.maker_fee
+        self.balance -= fee
+        self.fees += fee
+        
+        side = order['position_side']
+        position = self.positions.get(side)
+        if position is None:
+            self.positions[side] = {'amount': quantity, 'entry': price, 'peak': 0.0}
+        else:
+            amount = position['amount'] + quantity
+            position['entry'] = (position['entry'] * position['amount'] + price * quantity) / amount
+            position['amount'] = amount
+        self.record(j, 'FILL', order['side'], side, price, quantity, fee)
+        
+        if not self.is_paused and self.grid_initialized:
+            same_side = sum(1 for o in self.orders if o['position_side'] == side)
+            if same_side < self.max_open_orders_per_side:
+                self.orders.append(dict(order, active_from=j + 1))
+        
+        self.check_risk(j, price)
+    
+    def close_position(self, j, price, side, reason):
+        """Market close of a whole hedge position (check_position_tp_sl)"""
+        position = self.positions.pop(side)
+        direction = 1 if side == 'LONG' else -1
+        realized_pnl = direction * (price - position['entry']) * position['amount']
+        fee = price * position['amount'] * self.taker_fee
+        self.balance += realized_pnl - fee
+        self.realized_pnl += realized_pnl
+        self.fees += fee
+        self.record(j, reason, 'SELL' if side == 'LONG' else 'BUY', side, price, position['amount'], fee, realized_pnl)
+        
+        if reason != 'RISK_STOP':
+            self.check_risk(j, price)
+    
+    def rebalance(self, j, price):
+        if self.lock_grid(j, price):
+            self.rebalance_count += 1
+            self.rebalance_gate = j + self.candles(self.rebalance_cooldown)
+    
+    def check_risk(self, j, price):
+        """check_risk_management on the wallet balance (daily start = initial, as in the bot)"""
+        self.highest_balance = max(self.highest_balance, self.balance)
+        initial = self.capital
+        loss_percent = (initial - self.balance) / initial * 100
+        drawdown = (self.highest_balance - self.balance) / self.highest_balance * 100
+        
+        reason = None
+        if self.stop_loss_percent > 0 and loss_percent >= self.stop_loss_percent:
+            reason = f"Stop Loss ({loss_percent:.2f}%)"
+        elif drawdown >= self.max_drawdown_percent:
+            reason = f"Max Drawdown ({drawdown:.2f}%)"
+        elif loss_percent >= self.daily_loss_limit_percent:
+            reason = f"Daily Loss Limit ({loss_percent:.2f}%)"
+        elif self.take_profit_percent > 0 and -loss_percent >= self.take_profit_percent:
+            reason = f"Take Profit ({-loss_percent:.2f}%)"
+        elif self.trailing_stop_percent > 0 and self.highest_balance > initial and drawdown >= self.trailing_stop_percent:
+            reason = f"Trailing Stop ({drawdown:.2f}%)"
+        
+        if reason:
+            self.stop(j, price, reason)
+    
+    def stop(self, j, price, reason):
+        """Bot stop: cancel the grid and close every position at market"""
+        self.orders = []
+        self.stop_reason = reason
+        for side in list(self.positions):
+            self.close_position(j, price, side, 'RISK_STOP')
+    
+    # --- market analysis --------------------------------------------------
+    
+    def check_market(self, j):
+        """analyze_market + run_grid_task at the candle close"""
+        price = self.close[j]
+        
+        if self.auto_paused:
+            if self.stable_streak[j] >= self.required_stable_checks and j >= self.pause_gate:
+                self.auto_paused = False
+                self.is_paused = False
+                self.lock_grid(j, price)
+        
+        elif not self.is_paused and not self.grid_initialized:
+            if self.stable[j] and self.lock_grid(j, price):
+                self.rebalance_gate = j + self.candles(self.rebalance_cooldown)
+        
+        elif self.auto_pause_enabled and self.grid_initialized and not self.stable[j] and j >= self.pause_gate:
+            hour = self.candles(3600)
+            self.pause_candles = [p for p in self.pause_candles if j - p < hour]
+            if len(self.pause_candles) >= self.max_pauses_per_hour:
+                self.auto_pause_enabled = False
+                return
+            
+            # A trend pause cancels the grid; a volatility pause only stops refills
+            if abs(self.trend[j]) > self.trend_threshold:
+                self.orders = []
+            self.auto_paused = True
+            self.is_paused = True
+            self.pause_count += 1
+            self.pause_gate = j + self.candles(self.pause_cooldown)
+            self.pause_candles.append(j)
+
+
+def load_backtest_klines(source, interval='1m', days=30):
+    """Klines for a backtest as a float array with the KLINE_* columns
+    
+    `source` is a CSV of Binance klines (data.binance.vision layout, header optional) or a
+    symbol, downloaded from the public mainnet futures endpoint in 1500-candle pages.
+    """
+    if os.path.exists(source):
+        frame = pd.read_csv(source, header=None, usecols=range(7))
+        return frame.apply(pd.to_numeric, errors='coerce').dropna().to_numpy(dtype=float)
+    
+    client = Client()
+    end_time = int(time.time() * 1000)
+    start_time = end_time - days * 86400000
+    rows = []
+    while start_time < end_time:
+        batch = client.futures_klines(symbol=source.upper(), interval=interval,
+                                      startTime=start_time, limit=1500)
+        rows.extend(k[:7] for k in batch)
+        if len(batch) < 1500:
+            break
+        start_time = batch[-1][KLINE_OPEN_TIME] + 1
+    return np.array(rows, dtype=float)
+
+
+def run_backtest(source, interval='1m', days=30, overrides=(), output=None):
+    """CLI entry: load klines, replay them, print the report and optionally write CSVs"""
+    settings = {}
+    for item in overrides:
+        key, _, value = item.partition('=')
+        if key not in BACKTEST_DEFAULTS:
+            print(f"❌ Unknown setting '{key}' (known: {', '.join(BACKTEST_DEFAULTS)})")
+            return None
+        try:
+            settings[key] = json.loads(value)
+        except ValueError:
+            settings[key] = value
+    
+    print(f"📥 Loading klines from {source}...")
+    klines = load_backtest_klines(source, interval, days)
+    if len(klines) == 0:
+        print(f"❌ No klines for {source}")
+        return None
+    
+    result = GridBacktester(klines, settings).run()
+    summary = result['summary']
+    
+    print(f"\n{'='*60}")
+    print(f"📊 BACKTEST {summary['start']} -> {summary['end']} ({summary['candles']} candles)")
+    print(f"   Equity: ${summary['initial_balance']:.2f} -> ${summary['final_equity']:.2f} "
+          f"({summary['return_percent']:+.2f}%)")
+    print(f"   Max drawdown: {summary['max_drawdown_percent']:.2f}%")
+    print(f"   Realized PnL: ${summary['realized_pnl']:.4f} | Fees: ${summary['fees']:.4f}")
+    print(f"   Fills: {summary['fills']} | Closes: {summary['closes']} ({summary['wins']} wins)")
+    print(f"   Rebalances: {summary['rebalances']} | Auto pauses: {summary['pauses']}")
+    if summary['stop_reason']:
+        print(f"   🛑 Bot stopped: {summary['stop_reason']}")
+    print(f"   ⏱️ Simulated in {summary['seconds']:.2f}s")
+    print(f"{'='*60}\n")
+    
+    if output:
+        pd.DataFrame({'time': result['times'], 'equity': result['equity']}).to_csv(f"{output}_equity.csv", index=False)
+        pd.DataFrame(result['trades'], columns=['time', 'event', 'side', 'position_side', 'price', 'quantity',
+                                                'fee', 'realized_pnl', 'balance']).to_csv(f"{output}_trades.csv", index=False)
+        print(f"💾 Wrote {output}_equity.csv and {output}_trades.csv")
+    
+    return result
+
+
+# Parameter sweep: every combination backtested in a process pool
+PARAMETER_PROFILE_PATH = "grid_profile.json"
+PROFILE_EXCLUDED_SETTINGS = ('capital', 'tick_size', 'step_size', 'min_qty')
+
+_sweep_data = None
+
+
+def attach_sweep_data(path):
+    """Pool initializer: map the shared klines + indicators read-only (never pickled per task)"""
+    global _sweep_data
+    _sweep_data = np.load(path, mmap_mode='r')
+
+
+def run_sweep_task(task):
+    """One backtest in a worker: task = (combo, settings, start, end, maker_fee, taker_fee)"""
+    combo, settings, start, end, maker_fee, taker_fee = task
+    data = _sweep_data[start:end]
+    result = GridBacktester(data[:, :7], settings, maker_fee, taker_fee,
+                            indicators=(data[:, 7], data[:, 8])).run()
+    return combo, start, end, result['summary']
+
+
+class ParameterSweep:
+    """Backtest every combination of a parameter grid across a process pool
+    
+    Klines and their 1h indicators are written once to a .npy file that each worker maps
+    read-only, so tasks carry only settings and window bounds. Results are ranked per
+    capital value (each becomes a profile tier) by the sum of their return, drawdown and
+    fill-count ranks. With walk_forward=N the data is cut into N + 1 equal windows and
+    the winner of each window is re-tested on the next one.
+    """
+    
+    RANK_METRICS = (('return_percent', True), ('max_drawdown_percent', False), ('fills', True))
+    
+    def __init__(self, klines, grid, base_settings=None, walk_forward=0, workers=None,
+                 maker_fee=0.0002, taker_fee=0.0005):
+        unknown = (set(grid) | set(base_settings or {})) - set(BACKTEST_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown backtest settings: {', '.join(sorted(unknown))}")
+        
+        self.klines = np.asarray(klines, dtype=float)[:, :7]
+        self.grid = grid
+        self.base_settings = dict(base_settings or {})
+        self.walk_forward = walk_forward
+        self.workers = workers or os.cpu_count() or 1
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+    
+    def combinations(self):
+        keys = list(self.grid)
+        return [dict(self.base_settings, **dict(zip(keys, values)))
+                for values in itertools.product(*(self.grid[key] for key in keys))]
+    
+    def windows(self):
+        """(start, end) of each walk-forward window, oldest first"""
+        count = len(self.klines)
+        size = count // (self.walk_forward + 1)
+        bounds = [i * size for i in range(self.walk_forward + 1)] + [count]
+        return list(zip(bounds[:-1], bounds[1:]))
+    
+    def rank(self, results):
+        """[(combo, summary)] best first; runs that never filled are dropped"""
+        results = [r for r in results if r[1]['fills'] > 0]
+        if not results:
+            return []
+        
+        scores = np.zeros(len(results))
+        for metric, higher_is_better in self.RANK_METRICS:
+            values = np.array([summary[metric] for _, summary in results], dtype=float)
+            order = np.argsort(-values if higher_is_better else values, kind='stable')
+            ranks = np.empty(len(values))
+            ranks[order] = np.arange(len(values))
+            scores += ranks
+        
+        order = sorted(range(len(results)), key=lambda i: (scores[i], -results[i][1]['return_percent']))
+        return [results[i] for i in order]
+    
+    def tiers(self, combos, summaries):
+        """{capital: ranked [(combo, summary)]} for one window"""
+        groups = {}
+        for combo, summary in summaries.items():
+            capital = combos[combo].get('capital', BACKTEST_DEFAULTS['capital'])
+            groups.setdefault(capital, []).append((combo, summary))
+        return {capital: self.rank(results) for capital, results in sorted(groups.items())}
+    
+    def run(self):
+        """Returns {'combos', 'ranking': {capital: [...]}, 'walk_forward': [...], 'seconds'}"""
+        started = time.perf_counter()
+        combos = self.combinations()
+        volatility, trend = hourly_market_indicators(self.klines)
+        
+        handle, path = tempfile.mkstemp(suffix='.npy', prefix='gridbot_sweep_')
+        os.close(handle)
+        try:
+            np.save(path, np.column_stack([self.klines, volatility, trend]))
+            
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=attach_sweep_data,
+                                     initargs=(path,)) as pool:
+                windows = [(0, len(self.klines))]
+                if self.walk_forward:
+                    windows += self.windows()[:-1]
+                summaries = self.map(pool, [(i, combo, start, end) for start, end in windows
+                                            for i, combo in enumerate(combos)])
+                
+                folds = []
+                tests = []
+                all_windows = self.windows()
+                for train, test in zip(all_windows[:-1], all_windows[1:]):
+                    for capital, ranked in self.tiers(combos, summaries[train]).items():
+                        if ranked:
+                            folds.append({'capital': capital, 'train': ranked[0][1], 'combo': ranked[0][0]})
+                            tests.append((ranked[0][0], combos[ranked[0][0]]) + test)
+                
+                if tests:
+                    tested = self.map(pool, tests)
+                    for fold, (combo, _, start, end) in zip(folds, tests):
+                        fold['test'] = tested[(start, end)][combo]
+        finally:
+            os.remove(path)
+        
+        return {
+            'combos': combos,
+            'ranking': self.tiers(combos, summaries[(0, len(self.klines))]),
+            'walk_forward': folds if self.walk_forward else [],
+            'seconds': time.perf_counter() - started
+        }
+    
+    def map(self, pool, tasks):
+        """Run (combo, settings, start, end) tasks; {(start, end): {combo: summary}}"""
+        chunksize = max(1, len(tasks) // (self.workers * 4))
+        results = {}
+        jobs = ((combo, settings, start, end, self.maker_fee, self.taker_fee)
+                for combo, settings, start, end in tasks)
+        for combo, start, end, summary in pool.map(run_sweep_task, jobs, chunksize=chunksize):
+            results.setdefault((start, end), {})[combo] = summary
+        return results
+    
+    def build_profile(self, report, source=None):
+        """Parameter profile: per capital tier, the winning values of the swept settings"""
+        swept = [key for key in self.grid if key not in PROFILE_EXCLUDED_SETTINGS]
+        combos = report['combos']
+        tiers = []
+        for capital, ranked in report['ranking'].items():
+            if not ranked:
+                continue
+            combo, summary = ranked[0]
+            tiers.append({
+                'capital': capital,
+                'settings': {key: combos[combo][key] for key in swept},
+                'backtest': summary,
+                'walk_forward': [{'train': f['train'], 'test': f.get('test')}
+                                 for f in report['walk_forward'] if f['capital'] == capital]
+            })
+        
+        return {
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'source': source,
+            'candles': len(self.klines),
+            'fees': {'maker': self.maker_fee, 'taker': self.taker_fee},
+            'tiers': tiers
+        }
+
+
+def load_parameter_profile(path=None):
+    """Read a sweep profile (JSON) and check it has usable tiers"""
+    with open(path or PARAMETER_PROFILE_PATH) as f:
+        profile = json.load(f)
+    
+    tiers = profile.get('tiers') or []
+    if not tiers or any('capital' not in t or not isinstance(t.get('settings'), dict) for t in tiers):
+        raise ValueError(f"{path or PARAMETER_PROFILE_PATH}: no valid tiers")
+    
+    unknown = {key for t in tiers for key in t['settings']} - (set(BACKTEST_DEFAULTS) - set(PROFILE_EXCLUDED_SETTINGS))
+    if unknown:
+        raise ValueError(f"{path or PARAMETER_PROFILE_PATH}: unknown settings {', '.join(sorted(unknown))}")
+    
+    profile['tiers'] = sorted(tiers, key=lambda t: t['capital'])
+    return profile
+
+
+def profile_tier(profile, capital):
+    """Largest tier the capital can fund (tiers are sorted), else the smallest tier
+    
+    A tier's settings were tuned on its own capital, so a bot never gets a bigger tier's
+    grid: $30 uses the $10 tier, not the $50 one.
+    """
+    funded = [t for t in profile['tiers'] if t['capital'] <= capital]
+    return funded[-1] if funded else profile['tiers'][0]
+
+
+def parse_setting_values(items):
+    """['grid_count=8,10,12', ...] -> {'grid_count': [8, 10, 12], ...} (values parsed as JSON)"""
+    grid = {}
+    for item in items:
+        key, _, values = item.partition('=')
+        if key not in BACKTEST_DEFAULTS:
+            raise ValueError(f"Unknown setting '{key}' (known: {', '.join(BACKTEST_DEFAULTS)})")
+        
+        parsed = []
+        for value in values.split(','):
+            try:
+                parsed.append(json.loads(value))
+            except ValueError:
+                parsed.append(value)
+        grid[key] = parsed
+    return grid
+
+
+def run_sweep(source, interval='1m', days=30, params=(), overrides=(), walk_forward=0,
+              workers=None, profile_path=None):
+    """CLI entry: sweep a parameter grid, print the leaders and write the profile"""
+    try:
+        grid = parse_setting_values(params) or {
+            'capital': [20, 50, 100, 1000],
+            'grid_count': [6, 8, 10, 12],
+            'grid_range_percent': [1.0, 1.5, 2.0, 3.0],
+            'position_tp_percent': [2.0, 3.0, 5.0],
+            'position_sl_percent': [1.0, 2.0, 3.0]
+        }
+        base_settings = {key: values[0] for key, values in parse_setting_values(overrides).items()}
+    except ValueError as e:
+        print(f"❌ {e}")
+        return None
+    
+    print(f"📥 Loading klines from {source}...")
+    klines = load_backtest_klines(source, interval, days)
+    if len(klines) == 0:
+        print(f"❌ No klines for {source}")
+        return None
+    
+    sweep = ParameterSweep(klines, grid, base_settings, walk_forward, workers)
+    combos = math.prod(len(values) for values in grid.values())
+    print(f"🧮 Sweeping {combos} combinations x {1 + walk_forward} windows on {sweep.workers} workers...")
+    report = sweep.run()
+    
+    print(f"\n{'='*60}")
+    print(f"📊 SWEEP RESULTS ({report['seconds']:.1f}s)")
+    for capital, ranked in report['ranking'].items():
+        print(f"\n💰 Capital ${capital}:")
+        if not ranked:
+            print(f"   ⚠️ No combination filled any order")
+        for combo, summary in ranked[:5]:
+            values = ', '.join(f"{key}={report['combos'][combo][key]}" for key in grid if key != 'capital')
+            print(f"   {summary['return_percent']:+7.2f}% | DD {summary['max_drawdown_percent']:5.2f}% | "
+                  f"{summary['fills']:5d} fills | {values}")
+    
+    for fold in report['walk_forward']:
+        test = fold.get('test') or {}
+        print(f"🔁 ${fold['capital']} {fold['train']['start']} -> {test.get('start', '?')}: "
+              f"train {fold['train']['return_percent']:+.2f}% | "
+              f"test {test.get('return_percent', 0):+.2f}% (DD {test.get('max_drawdown_percent', 0):.2f}%)")
+    print(f"{'='*60}\n")
+    
+    profile = sweep.build_profile(report, source)
+    with open(profile_path or PARAMETER_PROFILE_PATH, 'w') as f:
+        json.dump(profile, f, indent=2)
+    print(f"💾 Wrote parameter profile with {len(profile['tiers'])} tiers to {profile_path or PARAMETER_PROFILE_PATH}")
+    return profile
+
+
+class MockExchange:
+    """In-process stand-in for Binance USDⓈ-M futures, for offline integration and load tests
+    
+    Deterministic: prices only move through set_price() (usually driven by PriceReplay) and
+    resting LIMIT orders are matched against each new price, best price first, then by
+    order id, filling completely at their limit price (or, with fill_probability < 1, on a
+    seeded coin flip per touch). One USDT wallet per API key, hedge
+    or one-way mode, simple initial-margin checks, no liquidation or funding payments.
+    Klines are built from the price updates on the wall clock (seeded with synthetic
+    history). serve_streams() runs a localhost WebSocket server for the market and
+    user-data streams. Use MockClient(exchange) in place of binance Client.
+    """
+    
+    KLINE_HEADROOM = 1440  # live 1m candles kept beyond the seeded history
+    
+    def __init__(self, balance=10000, maker_fee=0.0002, taker_fee=0.0005, leverage=20,
+                 seed=7, clock=None, latency=0.0, fill_probability=1.0):
+        self.initial_balance = balance
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.default_leverage = leverage
+        self.seed = seed
+        self.clock = clock or time.time
+        
+        # Simulated network delay per REST call and chance a touched order fills
+        self.latency = latency
+        self.fill_probability = fill_probability
+        self.rng = random.Random(seed)
+        self.lock = threading.RLock()
+        
+        self.symbols = {}
+        self.accounts = {}
+        self.orders = {}  # symbol -> {orderId: order}
+        self.listen_keys = {}
+        self.next_order_id = 1
+        self.next_trade_id = 1
+        self.request_counts = {}
+        self.request_weights = {}
+        
+        # Stream server
+        self.server = None
+        self.server_thread = None
+        self.stream_url = None
+        self.subscribers = []
+        self.streams_stopped = threading.Event()
+    
+    def now_ms(self):
+        return int(self.clock() * 1000)
+    
+    @staticmethod
+    def error(code, msg, status_code=400):
+        return BinanceAPIException(None, status_code, json.dumps({'code': code, 'msg': msg}))
+    
+    # --- market data ------------------------------------------------------
+    
+    @staticmethod
+    def synthetic_klines(price, count, volatility=0.001, seed=7, end_time=None, interval_ms=60000):
+        """Deterministic random-walk candles (KLINE_* columns) whose last close is `price`"""
+        rng = np.random.default_rng(seed)
+        close = np.exp(np.cumsum(rng.normal(0, volatility, count)))
+        close *= price / close[-1]
+        opens = np.concatenate(([close[0]], close[:-1]))
+        high = np.maximum(opens, close) * (1 + np.abs(rng.normal(0, volatility / 2, count)))
+        low = np.minimum(opens, close) * (1 - np.abs(rng.normal(0, volatility / 2, count)))
+        
+        end_time = end_time if end_time is not None else int(time.time() * 1000) // interval_ms * interval_ms
+        open_time = end_time - (count - 1 - np.arange(count)) * interval_ms
+        return np.column_stack([open_time, opens, high, low, close,
+                                rng.uniform(1, 100, count), open_time + interval_ms - 1])
+    
+    def add_symbol(self, symbol, price, tick_size=0.01, step_size=0.001, min_qty=0.001,
+                   max_qty=10000, history_minutes=2880, volatility=0.001, funding_rate=0.0001):
+        """List a USDT perpetual with `history_minutes` of seeded 1m history ending at `price`"""
+        symbol = symbol.upper()
+        klines = KlineBuffer(max(history_minutes, 1) + self.KLINE_HEADROOM)
+        minute = self.now_ms() // 60000 * 60000
+        if history_minutes:
+            seed = [self.seed, zlib.crc32(symbol.encode())]
+            for row in self.synthetic_klines(price, history_minutes, volatility, seed, minute):
+                klines.push(row)
+        
+        with self.lock:
+            self.symbols[symbol] = {
+                'symbol': symbol,
+                'price': float(price),
+                'tick_size': tick_size,
+                'step_size': step_size,
+                'min_qty': min_qty,
+                'max_qty': max_qty,
+                'price_precision': max(0, -int(math.floor(math.log10(tick_size)))),
+                'quantity_precision': max(0, -int(math.floor(math.log10(step_size)))),
+                'funding_rate': funding_rate,
+                'klines': klines,
+                'live_candles': {}  # interval -> open candle, see current_candle
+            }
+            self.orders.setdefault(symbol, {})
+    
+    def symbol_info(self, symbol):
+        info = self.symbols.get((symbol or '').upper())
+        if info is None:
+            raise self.error(-1121, "Invalid symbol.")
+        return info
+    
+    def set_price(self, symbol, price, volume=1.0):
+        """Trade at `price`: update the current 1m candle, match resting orders, publish streams"""
+        with self.lock:
+            info = self.symbol_info(symbol)
+            info['price'] = price = float(price)
+            
+            minute = self.now_ms() // 60000 * 60000
+            klines = info['klines']
+            last_open = klines.last_open_time()
+            if klines.count and last_open == minute:
+                row = klines.data[(klines.start + klines.count - 1) % klines.capacity]
+                row[KLINE_HIGH] = max(row[KLINE_HIGH], price)
+                row[KLINE_LOW] = min(row[KLINE_LOW], price)
+                row[KLINE_CLOSE] = price
+                row[KLINE_VOLUME] += volume
+            else:
+                # Flat candles over a gap, like an idle market
+                if klines.count:
+                    last_close = klines.window(1)[0, KLINE_CLOSE]
+                    for open_time in range(int(last_open) + 60000, minute, 60000)[-1440:]:
+                        klines.push(np.array([open_time, last_close, last_close, last_close, last_close, 0,
+                                              open_time + 59999], dtype=float))
+                klines.push(np.array([minute, price, price, price, price, volume, minute + 59999], dtype=float))
+            
+            for candle in info['live_candles'].values():
+                if candle[KLINE_OPEN_TIME] <= minute <= candle[KLINE_CLOSE_TIME]:
+                    candle[KLINE_HIGH] = max(candle[KLINE_HIGH], price)
+                    candle[KLINE_LOW] = min(candle[KLINE_LOW], price)
+                    candle[KLINE_CLOSE] = price
+                    candle[KLINE_VOLUME] += volume
+            
+            self.match_orders(info)
+            self.publish_market(info)
+    
+    def aggregate_klines(self, symbol, interval):
+        """Candles of `interval` built from the 1m history (KLINE_* columns)"""
+        interval_ms = KlineCache.INTERVAL_MS.get(interval)
+        if interval_ms is None:
+            raise self.error(-1120, "Invalid interval.")
+        
+        klines = self.symbol_info(symbol)['klines']
+        rows = klines.window(klines.count)
+        if interval_ms == 60000 or not len(rows):
+            return rows
+        
+        groups = (rows[:, KLINE_OPEN_TIME] // interval_ms).astype(np.int64)
+        starts = np.flatnonzero(np.diff(groups, prepend=groups[0] - 1))
+        ends = np.append(starts[1:], len(rows)) - 1
+        open_time = groups[starts] * interval_ms
+        return np.column_stack([
+            open_time,
+            rows[starts, KLINE_OPEN],
+            np.maximum.reduceat(rows[:, KLINE_HIGH], starts),
+            np.minimum.reduceat(rows[:, KLINE_LOW], starts),
+            rows[ends, KLINE_CLOSE],
+            np.add.reduceat(rows[:, KLINE_VOLUME], starts),
+            open_time + interval_ms - 1
+        ])
+    
+    def current_candle(self, info, interval):
+        """Open candle of `interval` for the kline stream
+        
+        Kept up to date by set_price; only a new candle is built from the 1m rows it spans,
+        so a tick costs the same however long the history is.
+        """
+        klines = info['klines']
+        interval_ms = KlineCache.INTERVAL_MS[interval]
+        if interval_ms == 60000:
+            return klines.window(1)[0]
+        
+        open_time = klines.last_open_time() // interval_ms * interval_ms
+        candle = info['live_candles'].get(interval)
+        if candle is None or candle[KLINE_OPEN_TIME] != open_time:
+            rows = klines.window(min(klines.count, interval_ms // 60000))
+            rows = rows[rows[:, KLINE_OPEN_TIME] >= open_time]
+            candle = np.array([open_time, rows[0, KLINE_OPEN], rows[:, KLINE_HIGH].max(),
+                               rows[:, KLINE_LOW].min(), rows[-1, KLINE_CLOSE], rows[:, KLINE_VOLUME].sum(),
+                               open_time + interval_ms - 1])
+            info['live_candles'][interval] = candle
+        return candle
+    
+    # --- accounts and orders ----------------------------------------------
+    
+    def account(self, api_key):
+        account = self.accounts.get(api_key)
+        if account is None:
+            account = {
+                'balance': float(self.initial_balance),
+                'dual_side': False,
+                'leverage': {},
+                'positions': {},
+                'trades': []
+            }
+            self.accounts[api_key] = account
+        return account
+    
+    def position(self, account, symbol, position_side):
+        return account['positions'].setdefault((symbol, position_side), {'amount': 0.0, 'entry': 0.0})
+    
+    def unrealized(self, symbol, position_side, position):
+        direction = -1 if position_side == 'SHORT' else 1
+        return direction * (self.symbols[symbol]['price'] - position['entry']) * position['amount']
+    
+    def available_balance(self, api_key, account):
+        """Wallet + unrealized PnL - initial margin of positions and opening orders"""
+        available = account['balance']
+        for (symbol, position_side), position in account['positions'].items():
+            leverage = account['leverage'].get(symbol, self.default_leverage)
+            available += self.unrealized(symbol, position_side, position)
+            available -= abs(position['amount']) * self.symbols[symbol]['price'] / leverage
+        
+        for symbol, orders in self.orders.items():
+            leverage = account['leverage'].get(symbol, self.default_leverage)
+            for order in orders.values():
+                if order['api_key'] == api_key and not self.is_closing(order):
+                    available -= order['quantity'] * order['price'] / leverage
+        return available
+    
+    @staticmethod
+    def is_closing(order):
+        return ((order['side'] == 'SELL' and order['position_side'] == 'LONG') or
+                (order['side'] == 'BUY' and order['position_side'] == 'SHORT'))
+    
+    def order_payload(self, order):
+        info = self.symbols[order['symbol']]
+        return {
+            'orderId': order['orderId'],
+            'symbol': order['symbol'],
+            'status': order['status'],
+            'clientOrderId': order['clientOrderId'],
+            'price': f"{order['price']:.{info['price_precision']}f}",
+            'avgPrice': f"{order['avg_price']:.{info['price_precision']}f}",
+            'origQty': f"{order['quantity']:.{info['quantity_precision']}f}",
+            'executedQty': f"{order['executed']:.{info['quantity_precision']}f}",
+            'cumQuote': f"{order['executed'] * order['avg_price']:.8f}",
+            'timeInForce': order['time_in_force'],
+            'type': order['type'],
+            'origType': order['type'],
+            'reduceOnly': False,
+            'closePosition': False,
+            'side': order['side'],
+            'positionSide': order['position_side'],
+            'stopPrice': '0',
+            'workingType': 'CONTRACT_PRICE',
+            'priceProtect': False,
+            'time': order['time'],
+            'updateTime': order['update_time']
+        }
+    
+    def create_order(self, api_key, params):
+        """Validate, then rest or fill one order; returns the order payload"""
+        info = self.symbol_info(params.get('symbol'))
+        account = self.account(api_key)
+        order_type = params.get('type', 'LIMIT')
+        side = params.get('side')
+        position_side = params.get('positionSide', 'BOTH')
+        
+        if side not in ('BUY', 'SELL') or order_type not in ('LIMIT', 'MARKET'):
+            raise self.error(-1116, "Invalid orderType.")
+        if account['dual_side'] != (position_side in ('LONG', 'SHORT')):
+            raise self.error(-4061, "Order's position side does not match user's setting.")
+        
+        quantity = float(params.get('quantity', 0))
+        if quantity <= 0 or quantity < info['min_qty']:
+            raise self.error(-4003, "Quantity less than or equal to zero.")
+        if abs(quantity / info['step_size'] - round(quantity / info['step_size'])) > 1e-6:
+            raise self.error(-1111, "Precision is over the maximum defined for this asset.")
+        
+        price = info['price']
+        if order_type == 'LIMIT':
+            price = float(params.get('price', 0))
+            if price <= 0 or abs(price / info['tick_size'] - round(price / info['tick_size'])) > 1e-6:
+                raise self.error(-4014, "Price not increased by tick size.")
+        
+        order = {
+            'orderId': self.next_order_id,
+            'api_key': api_key,
+            'symbol': info['symbol'],
+            'clientOrderId': params.get('newClientOrderId') or f"mock_{self.next_order_id}",
+            'side': side,
+            'position_side': position_side,
+            'type': order_type,
+            'time_in_force': params.get('timeInForce', 'GTC') if order_type == 'LIMIT' else 'GTC',
+            'price': price if order_type == 'LIMIT' else 0.0,
+            'quantity': quantity,
+            'executed': 0.0,
+            'avg_price': 0.0,
+            'status': 'NEW',
+            'time': self.now_ms(),
+            'update_time': self.now_ms()
+        }
+        
+        if self.is_closing(order):
+            if order_type == 'MARKET' and quantity > self.position(account, info['symbol'], position_side)['amount'] + 1e-12:
+                raise self.error(-2022, "ReduceOnly Order is rejected.")
+        else:
+            leverage = account['leverage'].get(info['symbol'], self.default_leverage)
+            if quantity * price / leverage > self.available_balance(api_key, account):
+                raise self.error(-2019, "Margin is insufficient.")
+        
+        self.next_order_id += 1
+        
+        # Marketable orders take liquidity at the current price
+        crosses = order_type == 'MARKET' or (side == 'BUY' and price >= info['price']) or \
+                  (side == 'SELL' and price <= info['price'])
+        if crosses:
+            self.fill(order, info['price'], maker=False)
+        else:
+            self.orders[info['symbol']][order['orderId']] = order
+            self.publish_order_update(order, 'NEW')
+        return self.order_payload(order)
+    
+    def match_orders(self, info):
+        """Fill resting LIMIT orders the new price has reached (best price first, then id)"""
+        price = info['price']
+        orders = self.orders[info['symbol']]
+        touched = [o for o in orders.values()
+                   if (o['side'] == 'BUY' and o['price'] >= price) or (o['side'] == 'SELL' and o['price'] <= price)]
+        touched.sort(key=lambda o: (-o['price'] if o['side'] == 'BUY' else o['price'], o['orderId']))
+        for order in touched:
+            if self.fill_probability < 1 and self.rng.random() >= self.fill_probability:
+                continue
+            del orders[order['orderId']]
+            self.fill(order, order['price'], maker=True)
+    
+    def fill(self, order, price, maker):
+        """Execute the whole order at `price` and update position, wallet and trade log"""
+        symbol = order['symbol']
+        account = self.account(order['api_key'])
+        position_side = order['position_side']
+        if position_side == 'BOTH':
+            position_side = 'LONG' if order['side'] == 'BUY' else 'SHORT'
+            # One-way mode: an opposite position is reduced first
+            opposite = self.position(account, symbol, 'SHORT' if position_side == 'LONG' else 'LONG')
+            if opposite['amount'] > 0:
+                position_side = 'SHORT' if position_side == 'LONG' else 'LONG'
+        position = self.position(account, symbol, position_side)
+        
+        quantity = order['quantity']
+        realized_pnl = 0.0
+        closing = (order['side'] == 'SELL') == (position_side == 'LONG')
+        if closing:
+            quantity = min(quantity, position['amount'])
+            if quantity <= 0:
+                order['status'] = 'EXPIRED'
+                order['update_time'] = self.now_ms()
+                self.publish_order_update(order, 'EXPIRED')
+                return
+            direction = 1 if position_side == 'LONG' else -1
+            realized_pnl = direction * (price - position['entry']) * quantity
+            position['amount'] -= quantity
+            if position['amount'] <= 1e-12:
+                position['amount'] = 0.0
+                position['entry'] = 0.0
+        else:
+            amount = position['amount'] + quantity
+            position['entry'] = (position['entry'] * position['amount'] + price * quantity) / amount
+            position['amount'] = amount
+        
+        commission = price * quantity * (self.maker_fee if maker else self.taker_fee)
+        account['balance'] += realized_pnl - commission
+        
+        trade = {
+            'symbol': symbol,
+            'id': self.next_trade_id,
+            'orderId': order['orderId'],
+            'side': order['side'],
+            'price': f"{price:.{self.symbols[symbol]['price_precision']}f}",
+            'qty': f"{quantity:.{self.symbols[symbol]['quantity_precision']}f}",
+            'realizedPnl': f"{realized_pnl:.8f}",
+            'marginAsset': 'USDT',
+            'quoteQty': f"{price * quantity:.8f}",
+            'commission': f"{commission:.8f}",
+            'commissionAsset': 'USDT',
+            'time': self.now_ms(),
+            'positionSide': order['position_side'],
+            'buyer': order['side'] == 'BUY',
+            'maker': maker
+        }
+        self.next_trade_id += 1
+        account['trades'].append(trade)
+        
+        order['executed'] = quantity
+        order['avg_price'] = price
+        order['status'] = 'FILLED'
+        order['update_time'] = trade['time']
+        self.publish_order_update(order, 'TRADE', trade)
+        self.publish_account_update(order['api_key'], account, symbol, position_side)
+    
+    # --- streams ----------------------------------------------------------
+    
+    def serve_streams(self, host='127.0.0.1', port=0):
+        """Start the localhost WebSocket server; returns its base URL (also in stream_url)"""
+        if ws_serve is None:
+            raise RuntimeError("websockets is not installed")
+        if self.server is None:
+            self.streams_stopped.clear()
+            self.server = ws_serve(self.handle_connection, host, port)
+            self.stream_url = f"ws://{host}:{self.server.socket.getsockname()[1]}"
+            self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True,
+                                                  name="MockExchangeStreams")
+            self.server_thread.start()
+        return self.stream_url
+    
+    def stop_streams(self):
+        if self.server is not None:
+            self.streams_stopped.set()
+            self.server.shutdown()
+            self.server = None
+            self.stream_url = None
+    
+    def handle_connection(self, connection):
+        """/stream?streams=a/b (market, combined payloads) or /ws/<listenKey> (user data)"""
+        path = connection.request.path
+        subscriber = {'queue': queue.Queue(), 'streams': set(), 'api_key': None}
+        
+        if path.startswith('/ws/'):
+            subscriber['api_key'] = self.listen_keys.get(path[len('/ws/'):])
+            if subscriber['api_key'] is None:
+                connection.close()
+                return
+        elif path.startswith('/stream?streams='):
+            subscriber['streams'] = set(path[len('/stream?streams='):].split('/'))
+        else:
+            connection.close()
+            return
+        
+        with self.lock:
+            self.subscribers = self.subscribers + [subscriber]
+        try:
+            while not self.streams_stopped.is_set():
+                try:
+                    connection.send(subscriber['queue'].get(timeout=0.5))
+                except queue.Empty:
+                    continue
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                self.subscribers = [s for s in self.subscribers if s is not subscriber]
+    
+    def publish_market(self, info):
+        symbol = info['symbol']
+        stream = symbol.lower()
+        now = self.now_ms()
+        price = info['price']
+        tick = info['tick_size']
+        
+        for subscriber in self.subscribers:
+            streams = subscriber['streams']
+            if not streams:
+                continue
+            
+            if f"{stream}@bookTicker" in streams:
+                subscriber['queue'].put(json.dumps({'stream': f"{stream}@bookTicker", 'data': {
+                    'e': 'bookTicker', 'E': now, 'T': now, 's': symbol,
+                    'b': f"{price - tick / 2:.10f}", 'B': '10', 'a': f"{price + tick / 2:.10f}", 'A': '10'}}))
+            if f"{stream}@markPrice@1s" in streams:
+                subscriber['queue'].put(json.dumps({'stream': f"{stream}@markPrice@1s", 'data': {
+                    'e': 'markPriceUpdate', 'E': now, 's': symbol, 'p': f"{price:.10f}",
+                    'i': f"{price:.10f}", 'r': f"{info['funding_rate']:.8f}", 'T': now // 28800000 * 28800000 + 28800000}}))
+            
+            for name in streams:
+                if name.startswith(f"{stream}@kline_"):
+                    interval = name.split('_', 1)[1]
+                    if interval not in KlineCache.INTERVAL_MS:
+                        continue
+                    candle = self.current_candle(info, interval)
+                    subscriber['queue'].put(json.dumps({'stream': name, 'data': {
+                        'e': 'kline', 'E': now, 's': symbol, 'k': {
+                            't': int(candle[KLINE_OPEN_TIME]), 'T': int(candle[KLINE_CLOSE_TIME]),
+                            's': symbol, 'i': interval, 'o': str(candle[KLINE_OPEN]),
+                            'c': str(candle[KLINE_CLOSE]), 'h': str(candle[KLINE_HIGH]),
+                            'l': str(candle[KLINE_LOW]), 'v': str(candle[KLINE_VOLUME]),
+                            'x': False}}}))
+    
+    def publish_user_event(self, api_key, event):
+        message = json.dumps(event)
+        for subscriber in self.subscribers:
+            if subscriber['api_key'] == api_key:
+                subscriber['queue'].put(message)
+    
+    def publish_order_update(self, order, execution, trade=None):
+        now = self.now_ms()
+        self.publish_user_event(order['api_key'], {
+            'e': 'ORDER_TRADE_UPDATE', 'E': now, 'T': now,
+            'o': {
+                's': order['symbol'], 'c': order['clientOrderId'], 'S': order['side'], 'o': order['type'],
+                'f': order['time_in_force'], 'q': str(order['quantity']), 'p': str(order['price']),
+                'ap': str(order['avg_price']), 'sp': '0', 'x': execution, 'X': order['status'],
+                'i': order['orderId'], 'l': trade['qty'] if trade else '0', 'z': str(order['executed']),
+                'L': trade['price'] if trade else '0', 'n': trade['commission'] if trade else '0',
+                'N': 'USDT', 'T': now, 't': trade['id'] if trade else 0, 'm': bool(trade and trade['maker']),
+                'R': False, 'wt': 'CONTRACT_PRICE', 'ot': order['type'], 'ps': order['position_side'],
+                'cp': False, 'rp': trade['realizedPnl'] if trade else '0'
+            }
+        })
+    
+    def publish_account_update(self, api_key, account, symbol, position_side):
+        now = self.now_ms()
+        position = self.position(account, symbol, position_side)
+        self.publish_user_event(api_key, {
+            'e': 'ACCOUNT_UPDATE', 'E': now, 'T': now,
+            'a': {
+                'm': 'ORDER',
+                'B': [{'a': 'USDT', 'wb': f"{account['balance']:.8f}", 'cw': f"{account['balance']:.8f}", 'bc': '0'}],
+                'P': [{'s': symbol, 'pa': str(position['amount'] * (-1 if position_side == 'SHORT' else 1)),
+                       'ep': str(position['entry']), 'cr': '0', 'mt': 'cross', 'iw': '0', 'ps': position_side,
+                       'up': f"{self.unrealized(symbol, position_side, position):.8f}"}]
+            }
+        })
+    
+    # --- REST endpoints (called through MockClient with the caller's API key) ---
+    
+    def get_server_time(self, api_key):
+        return {'serverTime': self.now_ms()}
+    
+    def futures_exchange_info(self, api_key):
+        return {'timezone': 'UTC', 'serverTime': self.now_ms(), 'symbols': [{
+            'symbol': info['symbol'],
+            'status': 'TRADING',
+            'contractType': 'PERPETUAL',
+            'baseAsset': info['symbol'][:-4],
+            'quoteAsset': 'USDT',
+            'pricePrecision': info['price_precision'],
+            'quantityPrecision': info['quantity_precision'],
+            'filters': [
+                {'filterType': 'PRICE_FILTER', 'tickSize': str(info['tick_size'])},
+                {'filterType': 'LOT_SIZE', 'stepSize': str(info['step_size']),
+                 'minQty': str(info['min_qty']), 'maxQty': str(info['max_qty'])},
+                {'filterType': 'MIN_NOTIONAL', 'notional': '5'}
+            ]
+        } for info in self.symbols.values()]}
+    
+    def futures_symbol_ticker(self, api_key, symbol=None):
+        if symbol is None:
+            return [{'symbol': s, 'price': str(info['price']), 'time': self.now_ms()}
+                    for s, info in self.symbols.items()]
+        info = self.symbol_info(symbol)
+        return {'symbol': info['symbol'], 'price': str(info['price']), 'time': self.now_ms()}
+    
+    def futures_klines(self, api_key, symbol, interval, limit=500, startTime=None, endTime=None):
+        with self.lock:
+            rows = self.aggregate_klines(symbol, interval)
+        if startTime is not None:
+            rows = rows[rows[:, KLINE_OPEN_TIME] >= startTime]
+        if endTime is not None:
+            rows = rows[rows[:, KLINE_OPEN_TIME] <= endTime]
+        rows = rows[:max(1, limit)] if startTime is not None else rows[-max(1, limit):]
+        return [[int(r[KLINE_OPEN_TIME]), str(r[KLINE_OPEN]), str(r[KLINE_HIGH]), str(r[KLINE_LOW]),
+                 str(r[KLINE_CLOSE]), str(r[KLINE_VOLUME]), int(r[KLINE_CLOSE_TIME]), '0', 0, '0', '0', '0']
+                for r in rows]
+    
+    def futures_funding_rate(self, api_key, symbol, limit=1, **params):
+        info = self.symbol_info(symbol)
+        funding_time = self.now_ms() // 28800000 * 28800000
+        return [{'symbol': info['symbol'], 'fundingRate': f"{info['funding_rate']:.8f}", 'fundingTime': funding_time}]
+    
+    def futures_account(self, api_key):
+        with self.lock:
+            account = self.account(api_key)
+            positions = [{
+                'symbol': symbol,
+                'positionSide': position_side,
+                'positionAmt': str(position['amount'] * (-1 if position_side == 'SHORT' else 1)),
+                'entryPrice': str(position['entry']),
+                'unrealizedProfit': f"{self.unrealized(symbol, position_side, position):.8f}",
+                'leverage': str(account['leverage'].get(symbol, self.default_leverage))
+            } for (symbol, position_side), position in account['positions'].items()]
+            unrealized = sum(float(p['unrealizedProfit']) for p in positions)
+            available = self.available_balance(api_key, account)
+            return {
+                'assets': [{
+                    'asset': 'USDT',
+                    'walletBalance': f"{account['balance']:.8f}",
+                    'unrealizedProfit': f"{unrealized:.8f}",
+                    'marginBalance': f"{account['balance'] + unrealized:.8f}",
+                    'availableBalance': f"{available:.8f}"
+                }],
+                'positions': positions,
+                'totalWalletBalance': f"{account['balance']:.8f}",
+                'totalUnrealizedProfit': f"{unrealized:.8f}",
+                'totalMarginBalance': f"{account['balance'] + unrealized:.8f}",
+                'availableBalance': f"{available:.8f}"
+            }
+    
+    def futures_position_information(self, api_key, symbol=None):
+        with self.lock:
+            account = self.account(api_key)
+            symbols = [self.symbol_info(symbol)['symbol']] if symbol else list(self.symbols)
+            sides = ('LONG', 'SHORT') if account['dual_side'] else ('BOTH',)
+            result = []
+            for s in symbols:
+                price = self.symbols[s]['price']
+                for position_side in sides:
+                    if position_side == 'BOTH':
+                        long = self.position(account, s, 'LONG')
+                        short = self.position(account, s, 'SHORT')
+                        position, sign = (long, 1) if long['amount'] else (short, -1)
+                        pnl = sign * (price - position['entry']) * position['amount']
+                    else:
+                        position = self.position(account, s, position_side)
+                        sign = -1 if position_side == 'SHORT' else 1
+                        pnl = self.unrealized(s, position_side, position)
+                    
+                    result.append({
+                        'symbol': s,
+                        'positionAmt': str(sign * position['amount']),
+                        'entryPrice': str(position['entry']),
+                        'markPrice': str(price),
+                        'unRealizedProfit': f"{pnl:.8f}",
+                        'liquidationPrice': '0',
+                        'leverage': str(account['leverage'].get(s, self.default_leverage)),
+                        'marginType': 'cross',
+                        'positionSide': position_side,
+                        'updateTime': self.now_ms()
+                    })
+            return result
+    
+    def futures_get_position_mode(self, api_key):
+        return {'dualSidePosition': self.account(api_key)['dual_side']}
+    
+    def futures_change_position_mode(self, api_key, dualSidePosition):
+        with self.lock:
+            account = self.account(api_key)
+            dual = str(dualSidePosition).lower() == 'true'
+            if dual == account['dual_side']:
+                raise self.error(-4059, "No need to change position side.")
+            if any(o['api_key'] == api_key for orders in self.orders.values() for o in orders.values()):
+                raise self.error(-4067, "Position side cannot be changed if there exists open orders.")
+            if any(p['amount'] for p in account['positions'].values()):
+                raise self.error(-4068, "Position side cannot be changed if there exists position.")
+            account['dual_side'] = dual
+            return {'code': 200, 'msg': 'success'}
+    
+    def futures_change_leverage(self, api_key, symbol, leverage):
+        with self.lock:
+            info = self.symbol_info(symbol)
+            self.account(api_key)['leverage'][info['symbol']] = int(leverage)
+            return {'leverage': int(leverage), 'maxNotionalValue': '1000000', 'symbol': info['symbol']}
+    
+    def futures_get_open_orders(self, api_key, symbol=None):
+        with self.lock:
+            symbols = [self.symbol_info(symbol)['symbol']] if symbol else list(self.orders)
+            return [self.order_payload(o) for s in symbols for o in self.orders[s].values()
+                    if o['api_key'] == api_key]
+    
+    def futures_create_order(self, api_key, **params):
+        with self.lock:
+            return self.create_order(api_key, params)
+    
+    def futures_place_batch_order(self, api_key, batchOrders):
+        if len(batchOrders) > 5:
+            raise self.error(-1102, "Param 'batchOrders' exceeds the maximum of 5 orders.")
+        results = []
+        with self.lock:
+            for params in batchOrders:
+                try:
+                    results.append(self.create_order(api_key, params))
+                except BinanceAPIException as e:
+                    results.append({'code': e.code, 'msg': e.message})
+        return results
+    
+    def own_order(self, api_key, symbol, order_id):
+        order = self.orders[self.symbol_info(symbol)['symbol']].get(int(order_id))
+        if order is None or order['api_key'] != api_key:
+            raise self.error(-2011, "Unknown order sent.")
+        return order
+    
+    def cancel(self, order):
+        del self.orders[order['symbol']][order['orderId']]
+        order['status'] = 'CANCELED'
+        order['update_time'] = self.now_ms()
+        self.publish_order_update(order, 'CANCELED')
+        return self.order_payload(order)
+    
+    def futures_cancel_order(self, api_key, symbol, orderId):
+        with self.lock:
+            return self.cancel(self.own_order(api_key, symbol, orderId))
+    
+    def futures_cancel_orders(self, api_key, symbol, orderidlist=None, orderIdList=None):
+        results = []
+        with self.lock:
+            for order_id in orderidlist or orderIdList or []:
+                try:
+                    results.append(self.cancel(self.own_order(api_key, symbol, order_id)))
+                except BinanceAPIException as e:
+                    results.append({'code': e.code, 'msg': e.message})
+        return results
+    
+    def futures_cancel_all_open_orders(self, api_key, symbol):
+        with self.lock:
+            info = self.symbol_info(symbol)
+            for order in [o for o in self.orders[info['symbol']].values() if o['api_key'] == api_key]:
+                self.cancel(order)
+            return {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+    
+    def futures_modify_order(self, api_key, symbol, orderId, side, quantity, price):
+        """Amend price/quantity in place (same order id); a crossing price fills at once"""
+        with self.lock:
+            order = self.own_order(api_key, symbol, orderId)
+            info = self.symbols[order['symbol']]
+            if side != order['side']:
+                raise self.error(-4027, "Side does not match.")
+            
+            new_price = float(price)
+            if abs(new_price / info['tick_size'] - round(new_price / info['tick_size'])) > 1e-6:
+                raise self.error(-4014, "Price not increased by tick size.")
+            order['price'] = new_price
+            order['quantity'] = float(quantity)
+            order['update_time'] = self.now_ms()
+            
+            crosses = (side == 'BUY' and new_price >= info['price']) or (side == 'SELL' and new_price <= info['price'])
+            if crosses:
+                del self.orders[order['symbol']][order['orderId']]
+                self.fill(order, info['price'], maker=False)
+            else:
+                self.publish_order_update(order, 'AMENDMENT')
+            return self.order_payload(order)
+    
+    def futures_account_trades(self, api_key, symbol, limit=500, fromId=None, startTime=None, endTime=None):
+        with self.lock:
+            symbol = self.symbol_info(symbol)['symbol']
+            trades = [t for t in self.account(api_key)['trades'] if t['symbol'] == symbol]
+        
+        if fromId is not None:
+            return [t for t in trades if t['id'] >= fromId][:limit]
+        if startTime is not None or endTime is not None:
+            start = startTime or 0
+            end = endTime if endTime is not None else float('inf')
+            return [t for t in trades if start <= t['time'] <= end][:limit]
+        return trades[-limit:]
+    
+    def futures_stream_get_listen_key(self, api_key):
+        with self.lock:
+            for listen_key, owner in self.listen_keys.items():
+                if owner == api_key:
+                    return listen_key
+            listen_key = f"mock{zlib.crc32(api_key.encode()):08x}{len(self.listen_keys):04d}"
+            self.listen_keys[listen_key] = api_key
+            return listen_key
+    
+    def futures_stream_keepalive(self, api_key, listenKey):
+        if self.listen_keys.get(listenKey) != api_key:
+            raise self.error(-1125, "This listenKey does not exist.")
+        return {}
+
+
+class MockClient:
+    """binance Client stand-in for one API key on a MockExchange
+    
+    Same method names, keyword arguments and payload shapes as the python-binance calls
+    the bot and scanner make; pass it as BinanceFuturesBot(..., client=MockClient(exchange)).
+    """
+    
+    def __init__(self, exchange, api_key='mock-key', api_secret='mock-secret'):
+        self.exchange = exchange
+        self.API_KEY = api_key
+        self.API_SECRET = api_secret
+        self.API_URL = 'mock://exchange'
+        self.network = 'mock'
+        self.session = requests.Session()
+        self.response = None
+    
+    @property
+    def stream_url(self):
+        return self.exchange.stream_url
+    
+    def async_client(self):
+        return MockAsyncClient(self)
+    
+    def __getattr__(self, name):
+        if not (name.startswith('futures_') or name == 'get_server_time'):
+            raise AttributeError(name)
+        
+        endpoint = getattr(self.exchange, name, None)
+        if endpoint is None:
+            raise AttributeError(f"MockExchange does not implement {name}")
+        
+        exchange = self.exchange
+        
+        def call(**params):
+            with exchange.lock:
+                exchange.request_counts[name] = exchange.request_counts.get(name, 0) + 1
+                exchange.request_weights[name] = (exchange.request_weights.get(name, 0) +
+                                                  GovernedClient.request_weight(name, params))
+            if exchange.latency:
+                time.sleep(exchange.latency)
+            return endpoint(self.API_KEY, **params)
+        return call
+
+
+class MockAsyncClient:
+    """AsyncClient stand-in over a MockClient (for AsyncBotEngine)"""
+    
+    def __init__(self, client):
+        self.client = client
+        self.API_KEY = client.API_KEY
+        self.API_SECRET = client.API_SECRET
+        self.response = None
+    
+    def __getattr__(self, name):
+        call = getattr(self.client, name)
+        
+        async def call_async(**params):
+            return call(**params)
+        return call_async
+    
+    async def close_connection(self):
+        pass
+
+
+class PriceReplay:
+    """Drive one MockExchange symbol through candles: open -> low/high -> close each
+    
+    step() replays a single candle (deterministic tests); start() replays the rest in a
+    background thread, one candle every `candle_seconds`.
+    """
+    
+    def __init__(self, exchange, symbol, klines, candle_seconds=1.0, loop=False):
+        self.exchange = exchange
+        self.symbol = symbol.upper()
+        self.klines = np.asarray(klines, dtype=float)
+        self.candle_seconds = candle_seconds
+        self.loop = loop
+        self.index = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        
+        if self.symbol not in exchange.symbols:
+            exchange.add_symbol(self.symbol, self.klines[0, KLINE_OPEN])
+    
+    def step(self):
+        """Replay the next candle; False once the data is exhausted (unless looping)"""
+        if self.index >= len(self.klines):
+            if not self.loop:
+                return False
+            self.index = 0
+        
+        o, h, l, c, v = self.klines[self.index, [KLINE_OPEN, KLINE_HIGH, KLINE_LOW, KLINE_CLOSE, KLINE_VOLUME]]
+        path = (o, l, h, c) if c >= o else (o, h, l, c)
+        for price in path:
+            self.exchange.set_price(self.symbol, price, v / 4)
+        self.index += 1
+        return True
+    
+    def run(self):
+        while not self.stop_event.is_set() and self.step():
+            self.stop_event.wait(self.candle_seconds)
+    
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True, name=f"PriceReplay-{self.symbol}")
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.candle_seconds + 1)
+
+
+class LoadTestExchange(MockExchange):
+    """MockExchange that also times fill -> refill and TP/SL trigger -> close for the load test
+    
+    A refill is a new LIMIT order at the price, side and position side of an earlier LIMIT
+    fill. A TP/SL trigger is the first price at which a position crosses its bot's
+    position_tp_percent / position_sl_percent; the reaction ends at the MARKET close.
+    """
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bots = {}  # symbol -> bot, for its TP/SL thresholds
+        self.fill_times = {}
+        self.refill_delays = []
+        self.tp_sl_triggers = {}
+        self.tp_sl_delays = []
+        self.fill_count = 0
+    
+    def reset_metrics(self):
+        with self.lock:
+            self.request_counts = {}
+            self.request_weights = {}
+            self.refill_delays = []
+            self.tp_sl_delays = []
+            self.fill_count = 0
+    
+    def create_order(self, api_key, params):
+        now = self.clock()
+        key = (str(params.get('symbol', '')).upper(), params.get('side'), params.get('positionSide', 'BOTH'))
+        if params.get('type', 'LIMIT') == 'LIMIT':
+            filled = self.fill_times.pop(key + (round(float(params.get('price', 0)), 8),), None)
+            if filled is not None:
+                self.refill_delays.append(now - filled)
+        else:
+            triggered = self.tp_sl_triggers.pop((key[0], key[2]), None)
+            if triggered is not None:
+                self.tp_sl_delays.append(now - triggered)
+        return super().create_order(api_key, params)
+    
+    def fill(self, order, price, maker):
+        super().fill(order, price, maker)
+        if order['status'] == 'FILLED':
+            self.fill_count += 1
+            if order['type'] == 'LIMIT':
+                key = (order['symbol'], order['side'], order['position_side'], round(order['price'], 8))
+                self.fill_times[key] = self.clock()
+    
+    def set_price(self, symbol, price, volume=1.0):
+        with self.lock:
+            super().set_price(symbol, price, volume)
+            bot = self.bots.get(symbol.upper())
+            if bot is not None:
+                self.check_tp_sl_triggers(symbol.upper(), bot)
+    
+    def check_tp_sl_triggers(self, symbol, bot):
+        price = self.symbols[symbol]['price']
+        for account in self.accounts.values():
+            for position_side, direction in (('LONG', 1), ('SHORT', -1)):
+                position = account['positions'].get((symbol, position_side))
+                key = (symbol, position_side)
+                if not position or position['amount'] <= 0:
+                    self.tp_sl_triggers.pop(key, None)
+                    continue
+                
+                move = direction * (price - position['entry']) / position['entry'] * 100
+                hit = ((bot.enable_position_tp and move >= bot.position_tp_percent) or
+                       (bot.enable_position_sl and move <= -bot.position_sl_percent))
+                if hit:
+                    self.tp_sl_triggers.setdefault(key, self.clock())
+                else:
+                    self.tp_sl_triggers.pop(key, None)
+
+
+LOAD_TEST_BOT_COUNTS = (1, 10, 50, 200)
+LOAD_TEST_REPORT_PATH = "loadtest_report.json"
+
+
+def latency_percentiles(samples):
+    """{'count', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'} of durations in seconds"""
+    if not len(samples):
+        return {'count': 0, 'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None}
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99]) * 1000
+    return {
+        'count': len(samples),
+        'p50_ms': round(float(p50), 2),
+        'p90_ms': round(float(p90), 2),
+        'p99_ms': round(float(p99), 2),
+        'max_ms': round(float(np.max(samples)) * 1000, 2)
+    }
+
+
+def process_rss_mb():
+    """Resident memory of this process in MB (None where it can't be read)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1e6 if sys.platform == 'darwin' else 1e3), 1)  # peak, not current
+    except (ImportError, OSError):
+        return None
+
+
+def run_load_test_round(bot_count, duration=60, latency=0.02, fill_probability=1.0, capital=1000,
+                        replay_volatility=0.002, tick_seconds=1.0, tp_sl_percent=0.5, warmup=10, seed=7):
+    """Start bot_count bots on a fresh LoadTestExchange, drive prices for `duration` seconds, measure"""
+    # Every round is a new exchange: symbol metadata and candles cached by an earlier round don't apply
+    ExchangeInfoCache.reset_shared()
+    KlineCache.reset_shared()
+    
+    exchange = LoadTestExchange(balance=bot_count * capital * 4, latency=latency,
+                                fill_probability=fill_probability, seed=seed)
+    api_key = f"loadtest-{bot_count}-{seed}"
+    replays = []
+    for i in range(bot_count):
+        symbol = f"LT{bot_count}X{i:03d}USDT"
+        price = 100 + i
+        exchange.add_symbol(symbol, price, tick_size=0.01, step_size=0.1, min_qty=0.1,
+                            history_minutes=1500, volatility=0.0002)
+        path = MockExchange.synthetic_klines(price, 3600, replay_volatility, seed=[seed, i])
+        replays.append(PriceReplay(exchange, symbol, path, loop=True))
+    exchange.serve_streams()
+    
+    def build_bot(symbol):
+        bot = BinanceFuturesBot(api_key, api_key, True, bot_id=symbol, client=MockClient(exchange, api_key, api_key))
+        bot.symbol = symbol
+        bot.capital = capital
+        bot.initial_capital = capital
+        return bot
+    
+    bots = []
+    
+    def start_bot(bot, success, message):
+        if not success:
+            return
+        
+        # Tight exits so TP/SL fire within the measured window
+        bot.position_tp_percent = bot.position_sl_percent = tp_sl_percent
+        bot.enable_trailing_per_position = False
+        exchange.bots[bot.symbol] = bot
+        bot.start()
+        bots.append(bot)
+    
+    init_started = time.time()
+    BulkInitializer([build_bot(replay.symbol) for replay in replays], on_result=start_bot).run()
+    init_seconds = time.time() - init_started
+    
+    # Let first market checks run and grids go out before measuring
+    time.sleep(warmup)
+    for bot in bots:
+        bot.loop_durations.clear()
+    exchange.reset_metrics()
+    
+    measure_started = time.time()
+    next_tick = measure_started
+    threads = rss = 0
+    while time.time() - measure_started < duration:
+        for replay in replays:
+            replay.step()
+        next_tick += tick_seconds
+        time.sleep(max(0.0, next_tick - time.time()))
+        threads = max(threads, threading.active_count())
+        rss = max(rss, process_rss_mb() or 0)
+    minutes = (time.time() - measure_started) / 60
+    
+    loop_durations = [d for bot in bots for d in bot.loop_durations]
+    late_runs = sum(stats['late_runs'] for bot in bots if bot.scheduler for stats in bot.scheduler.stats().values())
+    task_errors = sum(stats['errors'] for bot in bots if bot.scheduler for stats in bot.scheduler.stats().values())
+    with exchange.lock:
+        request_counts = dict(exchange.request_counts)
+        request_weights = dict(exchange.request_weights)
+        refill_delays = list(exchange.refill_delays)
+        tp_sl_delays = list(exchange.tp_sl_delays)
+        fills = exchange.fill_count
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda bot: bot.stop(), bots))
+    exchange.stop_streams()
+    
+    return {
+        'bots': bot_count,
+        'bots_started': len(bots),
+        'init_seconds': round(init_seconds, 2),
+        'duration_seconds': round(minutes * 60, 1),
+        'loop_latency': latency_percentiles(loop_durations),
+        'requests_per_minute': round(sum(request_counts.values()) / minutes, 1),
+        'weight_per_minute': round(sum(request_weights.values()) / minutes, 1),
+        'requests_by_endpoint': request_counts,
+        'fills': fills,
+        'fill_to_refill': latency_percentiles(refill_delays),
+        'tp_sl_reaction': latency_percentiles(tp_sl_delays),
+        'late_task_runs': late_runs,
+        'task_errors': task_errors,
+        'threads': threads,
+        'rss_mb': rss or None
+    }
+
+
+def run_load_test(counts=LOAD_TEST_BOT_COUNTS, duration=60, latency_ms=20, fill_probability=1.0,
+                  report_path=None, verbose=False):
+    """CLI entry: load-test the bot loop at each bot count and write a JSON report"""
+    settings = {
+        'duration_seconds': duration,
+        'latency_ms': latency_ms,
+        'fill_probability': fill_probability
+    }
+    report = {
+        'version': '2.2.1',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'settings': settings,
+        'runs': []
+    }
+    
+    # Keep mock fills out of the real state database
+    StateStore.DEFAULT_PATH = os.path.join(tempfile.mkdtemp(prefix="gridbot_loadtest_"), "state.db")
+    
+    for count in counts:
+        print(f"🏋️ Load test: {count} bots for {duration}s (latency {latency_ms}ms, fill rate {fill_probability})...")
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+            run = run_load_test_round(count, duration, latency_ms / 1000, fill_probability)
+        report['runs'].append(run)
+        
+        loop = run['loop_latency']
+        print(f"   loop p50/p99 {loop['p50_ms']}/{loop['p99_ms']} ms | "
+              f"{run['requests_per_minute']:.0f} req/min, weight {run['weight_per_minute']:.0f}/min | "
+              f"refill p50 {run['fill_to_refill']['p50_ms']} ms | TP/SL p50 {run['tp_sl_reaction']['p50_ms']} ms | "
+              f"{run['threads']} threads, {run['rss_mb']} MB")
+    
+    path = report_path or LOAD_TEST_REPORT_PATH
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Wrote load test report to {path}")
+    return report
+
+
+@dataclass(frozen=True)
+class BotSnapshot:
+    """Immutable view of one bot for the GUI, summary and exporters; replaced as a whole
+    
+    Row dicts inside are never mutated by the bot (updates build new dicts), so readers
+    can use them without locks or copies.
+    """
+    version: int
+    symbol: str
+    current_price: float
+    balance: float
+    available_balance: float
+    pnl: float
+    market_state: str
+    is_running: bool
+    is_paused: bool
+    positions: tuple
+    open_orders: tuple
+    filled_orders: tuple
+    updated: float
+
 
 class BinanceFuturesBot:
-    def __init__(self, api_key, api_secret, use_testnet=True, bot_id=None):
+    # State published in BotSnapshot; assigning a different value bumps state_version
+    DISPLAY_ATTRIBUTES = frozenset({
+        'positions', 'open_orders', 'filled_orders', 'current_price',
+        'balance', 'pnl', 'market_state', 'is_running', 'is_paused'
+    })
+    
+    def __setattr__(self, name, value):
+        if name in self.DISPLAY_ATTRIBUTES:
+            old = self.__dict__.get(name)
+            if old is not value and old != value:
+                # Lost increments between threads are fine: any change is still seen
+                self.__dict__['state_version'] = self.__dict__.get('state_version', 0) + 1
+        self.__dict__[name] = value
+    
+    def __init__(self, api_key, api_secret, use_testnet=True, bot_id=None, client=None):
         self.use_testnet = use_testnet
         self.bot_id = bot_id or "default"
         
@@ -32,7 +3784,11 @@ class BinanceFuturesBot:
         api_key = api_key.strip().replace(' ', '').replace('\n', '').replace('\r', '')
         api_secret = api_secret.strip().replace(' ', '').replace('\n', '').replace('\r', '')
         
-        if use_testnet:
+        if client is not None:
+            # Injected client (e.g. MockClient for offline runs)
+            self.client = client
+            print(f"🧩 [{self.bot_id}] Using injected {type(client).__name__}")
+        elif use_testnet:
             self.client = Client(api_key, api_secret, testnet=True)
             self.client.API_URL = 'https://testnet.binancefuture.com'
             print(f"🧪 [{self.bot_id}] Using TESTNET")
@@ -40,6 +3796,16 @@ class BinanceFuturesBot:
             self.client = Client(api_key, api_secret)
             print(f"💰 [{self.bot_id}] Using REAL BINANCE")
         
+        # All REST calls share the process-wide rate budget
+        self.client = GovernedClient(self.client, RateGovernor.shared(use_testnet))
+        
+        # Balance/PnL come from the per-API-key snapshot, not per-bot account calls
+        self.account_state = AccountStateService.for_client(self.client, use_testnet)
+        
+        # Persistent history and grid state (writes go through a background thread)
+        self.network = getattr(client, 'network', None) or ("testnet" if use_testnet else "mainnet")
+        self.store = StateStore.shared()
+        
         # Bot settings
         self.symbol = "BTCUSDT"
         self.leverage = 10
@@ -73,7 +3839,8 @@ class BinanceFuturesBot:
         self.daily_start_balance = 0
         self.max_open_orders_per_side = 5
         
-        # State
+        # State (state_version changes whenever a DISPLAY_ATTRIBUTES value does)
+        self.state_version = 0
         self.is_running = False
         self.is_paused = False
         self.positions = []
@@ -88,6 +3855,18 @@ class BinanceFuturesBot:
         self.market_state = "UNKNOWN"
         self.grid_levels = []
         
+        # Real-time price stream (REST fallback when stale)
+        self.use_price_stream = True
+        self.price_stream = None
+        self.price_stream_url = None
+        self.price_stale_after = 5
+        self.price_rest_interval = 5
+        self.last_rest_price_time = 0
+        self.funding_rate = 0
+        self.funding_rate_time = 0
+        self.market_ok = False
+        self.market_message = ""
+        
         # Grid stability
         self.grid_initialized = False
         self.grid_base_price = 0
@@ -98,6 +3877,25 @@ class BinanceFuturesBot:
         # Order tracking
         self.last_filled_order_ids = set()
         self.active_order_ids = set()
+        self.pending_refills = {}  # (price, position_side) filled on the stream, refilled by the 'refill' task
+        self.trade_history = None
+        self.filled_orders_version = -1
+        self.order_lock = threading.RLock()
+        self.peak_lock = threading.Lock()  # position_highest_pnl (bot, stream and close paths)
+        self.snapshot = None  # latest BotSnapshot, see publish_snapshot
+        self.batch_size = 5
+        self.reconcile_qty_tolerance = 0.05
+        
+        # User data stream (event-driven fills, polling fallback when down)
+        self.use_user_stream = True
+        self.user_stream = None
+        self.user_stream_url = None
+        self.user_stream_synced_connect = 0
+        
+        # Injected clients bring their own stream server (or none: REST only)
+        if client is not None and hasattr(client, 'stream_url'):
+            self.price_stream_url = self.user_stream_url = client.stream_url
+            self.use_price_stream = self.use_user_stream = client.stream_url is not None
         
         # Cooldown timers
         self.last_rebalance_time = 0
@@ -114,6 +3912,23 @@ class BinanceFuturesBot:
         self.stable_checks = 0
         self.required_stable_checks = 3
         
+        # Task cadences in seconds (see build_scheduler)
+        self.scheduler = None
+        self.loop_durations = deque(maxlen=1000)  # seconds per loop pass that ran tasks
+        self.task_intervals = {
+            'price': 1,
+            'tp_sl': 1,
+            'grid': 5,
+            'refill': 15,
+            'positions': 30,
+            'risk': 5,
+            'orders': 30,
+            'market': 60,
+            'funding': 1800
+        }
+        self.position_log_interval = 30
+        self.last_position_log_time = 0
+        
         # Symbol precision
         self.price_precision = 2
         self.quantity_precision = 3
@@ -125,18 +3940,27 @@ class BinanceFuturesBot:
         # Thread management
         self.bot_thread = None
         self.stop_event = threading.Event()
+        self.runtime = None  # None = own thread, AsyncBotEngine = shared event loop
         
         # Small capital optimization
         self.min_capital = 10
         self.max_capital = 100
         self.is_small_capital = False
         
+        # Sweep profile (load_parameter_profile) replaces the hard-coded capital tiers
+        self.parameter_profile = None
+        self.profile_tier = None
+        
         print(f"✅ [{self.bot_id}] Bot initialized (v2.2.1)")
     
     def optimize_for_small_capital(self):
         """Auto-optimize settings for small capital (10-100 USD)"""
         self.is_small_capital = self.capital <= self.max_capital
         
+        if self.parameter_profile:
+            self.apply_parameter_profile()
+            return
+        
         if self.is_small_capital:
             print(f"\n{'='*60}")
             print(f"💡 [{self.bot_id}] SMALL CAPITAL MODE ACTIVATED!")
@@ -219,22 +4043,28 @@ class BinanceFuturesBot:
             print(f"   ⚖️ RISK:REWARD = 1:{self.position_tp_percent/self.position_sl_percent:.2f}")
             print(f"{'='*60}\n")
     
+    def apply_parameter_profile(self):
+        """Settings of the profile tier matching our capital (from a backtest sweep)"""
+        self.profile_tier = profile_tier(self.parameter_profile, self.capital)
+        for key, value in self.profile_tier['settings'].items():
+            setattr(self, key, value)
+        
+        backtest = self.profile_tier.get('backtest') or {}
+        print(f"\n{'='*60}")
+        print(f"📐 [{self.bot_id}] PARAMETER PROFILE (tier ${self.profile_tier['capital']})")
+        print(f"   Capital: ${self.capital:.2f}")
+        for key, value in self.profile_tier['settings'].items():
+            print(f"      {key}: {value}")
+        if backtest:
+            print(f"   📊 Backtest: {backtest['return_percent']:+.2f}% | "
+                  f"DD {backtest['max_drawdown_percent']:.2f}% | {backtest['fills']} fills")
+        print(f"{'='*60}\n")
+    
     def calculate_optimal_grid_spacing(self):
         """Calculate optimal grid spacing based on capital and volatility"""
         try:
-            klines = self.client.futures_klines(symbol=self.symbol, interval='15m', limit=96)
-            df = pd.DataFrame(klines, columns=['time', 'open', 'high', 'low', 'close', 'volume', 
-                                               'close_time', 'quote_volume', 'trades', 
-                                               'taker_buy_base', 'taker_buy_quote', 'ignore'])
-            df['close'] = df['close'].astype(float)
-            df['high'] = df['high'].astype(float)
-            df['low'] = df['low'].astype(float)
-            
-            df['tr'] = df[['high', 'low', 'close']].apply(
-                lambda x: max(x['high'] - x['low'], 
-                             abs(x['high'] - x['close']), 
-                             abs(x['low'] - x['close'])), axis=1)
-            atr = df['tr'].tail(24).mean()
+            klines = KlineCache.shared(self.use_testnet).get(self.symbol, '15m', 96, self.client, max_age=60)
+            atr = average_true_range(klines[:, KLINE_HIGH], klines[:, KLINE_LOW], klines[:, KLINE_CLOSE], 24)
             atr_percent = (atr / self.current_price) * 100
             
             if self.is_small_capital:
@@ -259,6 +4089,7 @@ class BinanceFuturesBot:
             
             account = self.client.futures_account()
             print(f"✅ [{self.bot_id}] Account access OK! Assets: {len(account['assets'])}")
+            self.account_state.publish_account(account)
             
             if not account:
                 return False, "❌ Futures account not accessible"
@@ -276,26 +4107,23 @@ class BinanceFuturesBot:
             return False, f"❌ Connection Error: {str(e)}"
     
     def get_symbol_info(self):
-        """Get symbol precision"""
+        """Get symbol precision (from the shared exchange info cache)"""
         try:
-            info = self.client.futures_exchange_info()
-            for s in info['symbols']:
-                if s['symbol'] == self.symbol:
-                    self.price_precision = s['pricePrecision']
-                    self.quantity_precision = s['quantityPrecision']
-                    
-                    for f in s['filters']:
-                        if f['filterType'] == 'PRICE_FILTER':
-                            self.tick_size = float(f['tickSize'])
-                        elif f['filterType'] == 'LOT_SIZE':
-                            self.step_size = float(f['stepSize'])
-                            self.min_qty = float(f['minQty'])
-                            self.max_qty = float(f['maxQty'])
-                    
-                    print(f"✅ [{self.bot_id}] {self.symbol} Info:")
-                    print(f"   Price precision: {self.price_precision}, Tick: {self.tick_size}")
-                    print(f"   Qty precision: {self.quantity_precision}, Step: {self.step_size}")
-                    break
+            info = ExchangeInfoCache.shared(self.use_testnet).get(self.symbol, self.client)
+            if info is None:
+                print(f"⚠️ [{self.bot_id}] {self.symbol} not found in exchange info")
+                return
+            
+            self.price_precision = info['price_precision']
+            self.quantity_precision = info['quantity_precision']
+            self.tick_size = info['tick_size']
+            self.step_size = info['step_size']
+            self.min_qty = info['min_qty']
+            self.max_qty = info['max_qty']
+            
+            print(f"✅ [{self.bot_id}] {self.symbol} Info:")
+            print(f"   Price precision: {self.price_precision}, Tick: {self.tick_size}")
+            print(f"   Qty precision: {self.quantity_precision}, Step: {self.step_size}")
         except Exception as e:
             print(f"[{self.bot_id}] Error getting symbol info: {str(e)}")
     
@@ -317,44 +4145,45 @@ class BinanceFuturesBot:
         rounded = (qty_decimal / step).quantize(Decimal('1'), rounding=ROUND_DOWN) * step
         return float(rounded)
     
-    def initialize(self):
+    def initialize(self, warm_start=False, account_ready=False):
+        """Connect and lock the grid; warm_start resumes a saved grid and its resting orders
+        
+        account_ready skips the account-wide steps (connection test, hedge mode) that
+        BulkInitializer has already done once for every bot on this API key.
+        """
         try:
-            print(f"\n{'='*60}")
-            print(f"🔍 [{self.bot_id}] Testing API connection...")
-            print(f"{'='*60}")
-            
-            success, msg = self.test_connection()
-            if not success:
-                return False, msg
-            
-            print(f"✅ [{self.bot_id}] Connection test passed!")
+            if not account_ready:
+                print(f"\n{'='*60}")
+                print(f"🔍 [{self.bot_id}] Testing API connection...")
+                print(f"{'='*60}")
+                
+                success, msg = self.test_connection()
+                if not success:
+                    return False, msg
+                
+                print(f"✅ [{self.bot_id}] Connection test passed!")
             
             self.get_symbol_info()
             
-            try:
-                self.client.futures_cancel_all_open_orders(symbol=self.symbol)
-                print(f"✅ [{self.bot_id}] Cancelled all old orders for {self.symbol}")
-            except:
-                pass
+            state = self.load_grid_state() if warm_start else None
+            if state:
+                print(f"♻️ [{self.bot_id}] Warm start: resuming grid saved at "
+                      f"{datetime.fromtimestamp(state['saved_at']).strftime('%Y-%m-%d %H:%M:%S')}")
+            else:
+                try:
+                    self.client.futures_cancel_all_open_orders(symbol=self.symbol)
+                    print(f"✅ [{self.bot_id}] Cancelled all old orders for {self.symbol}")
+                except:
+                    pass
             
             self.client.futures_change_leverage(symbol=self.symbol, leverage=self.leverage)
             print(f"✅ [{self.bot_id}] Leverage: {self.leverage}x")
             
-            try:
-                current_mode = self.client.futures_get_position_mode()
-                if not current_mode['dualSidePosition']:
-                    self.client.futures_change_position_mode(dualSidePosition=True)
-                    print(f"✅ [{self.bot_id}] ENABLED Hedge Mode")
-                else:
-                    print(f"✅ [{self.bot_id}] Hedge Mode already enabled")
-            except BinanceAPIException as e:
-                if e.code == -4059:
-                    print(f"✅ [{self.bot_id}] Hedge Mode already enabled")
-                elif e.code == -4067:
-                    print(f"⚠️ [{self.bot_id}] Cannot change position mode - open orders exist")
-                    return False, "Error: Open orders exist, cannot change position mode"
-                else:
-                    print(f"⚠️ [{self.bot_id}] Hedge Mode error: {str(e)}")
+            # A resumed grid was placed in hedge mode already
+            if not state and not account_ready:
+                success, msg = self.enable_hedge_mode()
+                if not success:
+                    return False, msg
             
             self.update_balance()
             self.initial_capital = self.balance
@@ -365,23 +4194,60 @@ class BinanceFuturesBot:
             self.current_price = float(ticker['price'])
             
             self.optimize_for_small_capital()
-            self.calculate_optimal_grid_spacing()
-            self.calculate_and_lock_grid_levels()
+            
+            if state:
+                self.restore_grid_state(state)
+                self.get_positions()
+                
+                # Peaks only carry over for positions that are still open
+                open_keys = {pos['position_key'] for pos in self.positions}
+                with self.peak_lock:
+                    self.position_highest_pnl = {key: pnl for key, pnl in self.position_highest_pnl.items()
+                                                 if key in open_keys}
+                kept, cancelled, amended, placed = self.reconcile_grid_orders()
+                self.grid_initialized = kept + amended + placed > 0
+            else:
+                if not self.profile_tier:
+                    self.calculate_optimal_grid_spacing()
+                self.calculate_and_lock_grid_levels()
             
             self.last_rebalance_time = time.time()
             self.last_pause_time = 0
-            self.pause_timestamps = []
+            if not state:
+                self.pause_timestamps = []
             
+            self.publish_snapshot()
             mode = "TESTNET" if self.use_testnet else "REAL"
+            if state:
+                return True, f"♻️ [{self.bot_id}] Warm start successful! ({mode})"
             return True, f"✅ [{self.bot_id}] Initialization successful! ({mode})"
         except BinanceAPIException as e:
             return False, f"API Error ({e.code}): {e.message}"
         except Exception as e:
             return False, f"Error: {str(e)}"
     
+    def enable_hedge_mode(self):
+        """Switch the account to hedge mode (account-wide); fails only if open orders block it"""
+        try:
+            current_mode = self.client.futures_get_position_mode()
+            if not current_mode['dualSidePosition']:
+                self.client.futures_change_position_mode(dualSidePosition=True)
+                print(f"✅ [{self.bot_id}] ENABLED Hedge Mode")
+            else:
+                print(f"✅ [{self.bot_id}] Hedge Mode already enabled")
+        except BinanceAPIException as e:
+            if e.code == -4059:
+                print(f"✅ [{self.bot_id}] Hedge Mode already enabled")
+            elif e.code == -4067:
+                print(f"⚠️ [{self.bot_id}] Cannot change position mode - open orders exist")
+                return False, "Error: Open orders exist, cannot change position mode"
+            else:
+                print(f"⚠️ [{self.bot_id}] Hedge Mode error: {str(e)}")
+        return True, "Hedge Mode enabled"
+    
     def calculate_and_lock_grid_levels(self):
         """Calculate grid levels and LOCK them"""
-        if self.auto_grid:
+        if self.auto_grid and not self.profile_tier:
             if self.capital < 20:
                 self.grid_count = 4
             elif self.capital < 50:
@@ -409,6 +4275,69 @@ class BinanceFuturesBot:
         print(f"📊 [{self.bot_id}] Base Price: ${self.grid_base_price:.2f}")
         print(f"📊 [{self.bot_id}] Grid Count: {self.grid_count}")
         print(f"💡 [{self.bot_id}] Grid prices are now LOCKED (stable)")
+        
+        self.save_grid_state()
+    
+    def save_grid_state(self):
+        """Persist the locked grid definition so a restart can resume it (warm start)"""
+        if not self.locked_grid_levels:
+            return
+        
+        state = {
+            'symbol': self.symbol,
+            'use_testnet': self.use_testnet,
+            'grid_base_price': self.grid_base_price,
+            'locked_grid_levels': self.locked_grid_levels,
+            'grid_range_percent': self.grid_range_percent,
+            'quantity': self.calculate_grid_quantity(),
+            'capital': self.capital,
+            'leverage': self.leverage,
+            'initial_capital': self.initial_capital,
+            'highest_balance': self.highest_balance,
+            'daily_start_balance': self.daily_start_balance,
+            'pause_timestamps': self.pause_timestamps,
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'saved_at': time.time()
+        }
+        self.store.save_grid_snapshot(self.network, self.symbol, state)
+    
+    def load_grid_state(self):
+        try:
+            state = self.store.load_grid_snapshot(self.network, self.symbol)
+        except Exception as e:
+            print(f"⚠️ [{self.bot_id}] Could not load grid state: {e}")
+            return None
+        
+        if not state or state.get('symbol') != self.symbol or not state.get('locked_grid_levels'):
+            return None
+        return state
+    
+    def clear_grid_state(self):
+        self.store.clear_grid_snapshot(self.network, self.symbol)
+    
+    def restore_grid_state(self, state):
+        """Re-lock a saved grid and its risk baselines instead of re-centering on the ticker"""
+        self.grid_base_price = state['grid_base_price']
+        self.locked_grid_levels = list(state['locked_grid_levels'])
+        self.grid_levels = self.locked_grid_levels.copy()
+        self.grid_count = len(self.locked_grid_levels)
+        self.grid_range_percent = state.get('grid_range_percent', self.grid_range_percent)
+        
+        self.initial_capital = state.get('initial_capital') or self.initial_capital
+        self.highest_balance = max(state.get('highest_balance', 0), self.balance)
+        if state.get('date') == datetime.now().strftime('%Y-%m-%d'):
+            self.daily_start_balance = state.get('daily_start_balance') or self.daily_start_balance
+        self.pause_timestamps = [t for t in state.get('pause_timestamps', []) if time.time() - t < 3600]
+        peaks = self.store.load_position_peaks(self.network, self.symbol)
+        with self.peak_lock:
+            self.position_highest_pnl.update(peaks)
+        
+        if state.get('quantity') and state['quantity'] != self.calculate_grid_quantity():
+            print(f"⚠️ [{self.bot_id}] Grid quantity changed ({state['quantity']} -> "
+                  f"{self.calculate_grid_quantity()}), resting orders will be amended")
+        
+        print(f"🔒 [{self.bot_id}] RESTORED Grid Range: ${min(self.locked_grid_levels):.2f} - "
+              f"${max(self.locked_grid_levels):.2f} (base ${self.grid_base_price:.2f})")
     
     def check_grid_rebalance(self):
         """Check if need to rebalance grid"""
@@ -433,15 +4362,7 @@ class BinanceFuturesBot:
             print(f"{'='*60}\n")
             
             self.calculate_and_lock_grid_levels()
-            
-            try:
-                self.client.futures_cancel_all_open_orders(symbol=self.symbol)
-                print(f"✅ [{self.bot_id}] Cancelled old orders")
-            except Exception as e:
-                print(f"⚠️ Cancel error: {e}")
-            
-            time.sleep(2)
-            self.grid_initialized = False
+            self.reconcile_grid_orders()
             return True
             
         elif self.current_price < lower_trigger:
@@ -453,120 +4374,171 @@ class BinanceFuturesBot:
             print(f"{'='*60}\n")
             
             self.calculate_and_lock_grid_levels()
-            
-            try:
-                self.client.futures_cancel_all_open_orders(symbol=self.symbol)
-                print(f"✅ [{self.bot_id}] Cancelled old orders")
-            except Exception as e:
-                print(f"⚠️ Cancel error: {e}")
-            
-            time.sleep(2)
-            self.grid_initialized = False
+            self.reconcile_grid_orders()
             return True
         
         return False
     
     def update_balance(self):
-        try:
-            account = self.client.futures_account()
-            for asset in account['assets']:
-                if asset['asset'] == 'USDT':
-                    self.balance = float(asset['walletBalance'])
-                    self.available_balance = float(asset['availableBalance'])
-                    
-                    if self.balance > self.highest_balance:
-                        self.highest_balance = self.balance
-        except Exception as e:
-            print(f"[{self.bot_id}] Error updating balance: {e}")
+        """Near-fresh account state (reuses a snapshot taken in the last few seconds)"""
+        self.apply_account_snapshot(self.account_state.get(max_age=5))
+    
+    def apply_account_snapshot(self, snapshot):
+        """Balance, available balance and unrealized PnL from the shared account snapshot"""
+        if snapshot is None:
+            return
+        
+        self.balance = snapshot.balance
+        self.available_balance = snapshot.available_balance
+        self.pnl = snapshot.unrealized_pnl
+        
+        if self.balance > self.highest_balance:
+            self.highest_balance = self.balance
     
     def get_positions(self):
         try:
             positions = self.client.futures_position_information(symbol=self.symbol)
-            self.positions = []
-            for pos in positions:
-                if float(pos['positionAmt']) != 0:
-                    try:
-                        leverage = int(pos.get('leverage', self.leverage))
-                    except (ValueError, TypeError):
-                        leverage = self.leverage
-                    
-                    position_key = f"{pos['symbol']}_{pos.get('positionSide', 'BOTH')}"
-                    
-                    self.positions.append({
-                        'symbol': pos['symbol'],
-                        'side': 'LONG' if float(pos['positionAmt']) > 0 else 'SHORT',
-                        'amount': abs(float(pos['positionAmt'])),
-                        'entry_price': float(pos['entryPrice']),
-                        'unrealized_pnl': float(pos['unRealizedProfit']),
-                        'leverage': leverage,
-                        'position_side': pos.get('positionSide', 'BOTH'),
-                        'position_key': position_key,
-                        'mark_price': float(pos.get('markPrice', 0)),
-                        'liquidation_price': float(pos.get('liquidationPrice', 0))
-                    })
-                    
-                    if position_key not in self.position_highest_pnl:
-                        self.position_highest_pnl[position_key] = float(pos['unRealizedProfit'])
-                    else:
-                        current_pnl = float(pos['unRealizedProfit'])
-                        if current_pnl > self.position_highest_pnl[position_key]:
-                            self.position_highest_pnl[position_key] = current_pnl
-            
-            return self.positions
+            return self.apply_positions(positions)
         except Exception as e:
             print(f"[{self.bot_id}] Error getting positions: {str(e)}")
             return []
     
+    def apply_positions(self, positions):
+        """Parse futures_position_information and track per-position peak PnL"""
+        positions_list = []
+        for pos in positions:
+            if float(pos['positionAmt']) != 0:
+                try:
+                    leverage = int(pos.get('leverage', self.leverage))
+                except (ValueError, TypeError):
+                    leverage = self.leverage
+                
+                position_key = f"{pos['symbol']}_{pos.get('positionSide', 'BOTH')}"
+                
+                positions_list.append({
+                    'symbol': pos['symbol'],
+                    'side': 'LONG' if float(pos['positionAmt']) > 0 else 'SHORT',
+                    'amount': abs(float(pos['positionAmt'])),
+                    'entry_price': float(pos['entryPrice']),
+                    'unrealized_pnl': float(pos['unRealizedProfit']),
+                    'leverage': leverage,
+                    'position_side': pos.get('positionSide', 'BOTH'),
+                    'position_key': position_key,
+                    'mark_price': float(pos.get('markPrice', 0)),
+                    'liquidation_price': float(pos.get('liquidationPrice', 0))
+                })
+                
+                self.track_position_peak(position_key, float(pos['unRealizedProfit']))
+        
+        self.positions = positions_list
+        return self.positions
+    
+    def track_position_peak(self, position_key, current_pnl):
+        # Queue the write under the lock too: the writer applies the queue in order, so the
+        # stored peak can't be overtaken by a lower one from the other thread
+        with self.peak_lock:
+            if position_key in self.position_highest_pnl and current_pnl <= self.position_highest_pnl[position_key]:
+                return
+            self.position_highest_pnl[position_key] = current_pnl
+            self.store.save_position_peak(self.network, self.symbol, position_key, current_pnl)
+    
+    def mark_positions(self, mark_price):
+        """Re-value cached positions at a newer mark price between REST refreshes"""
+        if mark_price <= 0:
+            return self.positions
+        
+        marked = []
+        for pos in self.positions:
+            direction = 1 if pos['side'] == 'LONG' else -1
+            unrealized_pnl = (mark_price - pos['entry_price']) * pos['amount'] * direction
+            marked.append(dict(pos, unrealized_pnl=unrealized_pnl, mark_price=mark_price))
+            self.track_position_peak(pos['position_key'], unrealized_pnl)
+        
+        self.positions = marked
+        return self.positions
+    
     def get_open_orders(self):
         try:
             orders = self.client.futures_get_open_orders(symbol=self.symbol)
-            self.open_orders = []
-            for order in orders:
-                self.open_orders.append({
-                    'order_id': order['orderId'],
-                    'symbol': order['symbol'],
-                    'side': order['side'],
-                    'type': order['type'],
-                    'price': float(order['price']),
-                    'quantity': float(order['origQty']),
-                    'filled': float(order['executedQty']),
-                    'status': order['status'],
-                    'time': datetime.fromtimestamp(order['time']/1000).strftime('%H:%M:%S'),
-                    'position_side': order.get('positionSide', 'BOTH')
-                })
-            return self.open_orders
+            return self.apply_open_orders(orders)
         except Exception as e:
             print(f"[{self.bot_id}] Error getting open orders: {str(e)}")
             return []
     
-    def get_filled_orders(self, limit=50):
+    def apply_open_orders(self, orders):
+        self.open_orders = [{
+            'order_id': order['orderId'],
+            'symbol': order['symbol'],
+            'side': order['side'],
+            'type': order['type'],
+            'price': float(order['price']),
+            'quantity': float(order['origQty']),
+            'filled': float(order['executedQty']),
+            'status': order['status'],
+            'time': datetime.fromtimestamp(order['time']/1000).strftime('%H:%M:%S'),
+            'position_side': order.get('positionSide', 'BOTH')
+        } for order in orders]
+        return self.open_orders
+    
+    def get_filled_orders(self, limit=50, page=None):
+        """Recent fills from the API, or a newest-first page of stored history (no API call)"""
+        if page is not None:
+            return self.store.trades_page(self.network, self.symbol, page, limit)
+        
         try:
-            trades = self.client.futures_account_trades(symbol=self.symbol, limit=limit)
-            self.filled_orders = []
-            for trade in trades:
-                self.filled_orders.append({
-                    'id': trade['id'],
-                    'symbol': trade['symbol'],
-                    'side': trade['side'],
-                    'price': float(trade['price']),
-                    'quantity': float(trade['qty']),
-                    'commission': float(trade['commission']),
-                    'realized_pnl': float(trade['realizedPnl']),
-                    'time': datetime.fromtimestamp(trade['time']/1000).strftime('%H:%M:%S'),
-                    'position_side': trade.get('positionSide', 'BOTH')
-                })
-            return self.filled_orders
+            return self.apply_new_trades(self.history().ingest(self.client, limit))
         except Exception as e:
             print(f"[{self.bot_id}] Error getting filled orders: {str(e)}")
             return []
     
-    def check_position_tp_sl(self):
+    def apply_filled_orders(self, trades):
+        """Ingest a poll result fetched elsewhere (e.g. with history().next_params on AsyncClient)"""
+        return self.apply_new_trades(self.history().append(trades, from_poll=True))
+    
+    def history(self):
+        """Trade history of the current symbol (the symbol may change before initialize)"""
+        if self.trade_history is None or self.trade_history.symbol != self.symbol:
+            self.trade_history = TradeHistory(self.symbol)
+            self.filled_orders_version = -1
+        return self.trade_history
+    
+    def apply_new_trades(self, new_trades):
+        """Persist new fills; rebuild the display list only when the history changed"""
+        history = self.history()
+        if new_trades:
+            self.store.record_trades(self.network, self.symbol, new_trades)
+        
+        if self.filled_orders_version != history.version:
+            self.filled_orders = history.recent(100)
+            self.filled_orders_version = history.version
+        return self.filled_orders
+    
+    def backfill_trade_history(self, max_requests=4):
+        """Load older fills (7-day windows) into the history and the store; returns rows added"""
+        try:
+            added = self.history().backfill(self.client, max_requests)
+            self.apply_new_trades(added)
+            if added:
+                print(f"📜 [{self.bot_id}] Backfilled {len(added)} older fills")
+            return len(added)
+        except Exception as e:
+            print(f"[{self.bot_id}] Error backfilling fills: {str(e)}")
+            return 0
+    
+    def check_position_tp_sl(self, refresh=True):
         """🆕 Check and close positions based on TP/SL"""
         if not self.enable_position_tp and not self.enable_position_sl:
             return
         
         try:
-            self.get_positions()
+            if refresh:
+                with self.client.priority(PRIORITY_CRITICAL):
+                    self.get_positions()
+            
+            # Runs every second on streamed prices; keep status lines at a readable pace
+            log_status = time.time() - self.last_position_log_time >= self.position_log_interval
+            if log_status:
+                self.last_position_log_time = time.time()
             
             for pos in self.positions:
                 position_key = pos['position_key']
@@ -597,7 +4569,7 @@ class BinanceFuturesBot:
                             should_close = True
                             close_reason = f"📉 TRAILING STOP ({pnl_drop:.4f}% drop from peak ${highest_pnl:.8f})"
                 
-                if not should_close and abs(pnl_percent) > 0.5:
+                if not should_close and log_status and abs(pnl_percent) > 0.5:
                     status_color = "🟢" if current_pnl > 0 else "🔴"
                     highest_pnl = self.position_highest_pnl.get(position_key, 0)
                     print(f"{status_color} [{self.bot_id}] {position_side} | "
@@ -628,27 +4600,36 @@ class BinanceFuturesBot:
             close_side = 'SELL' if position['side'] == 'LONG' else 'BUY'
             
             # 🔥 NO ROUNDING - Use exact amount from Binance API
-            order = self.client.futures_create_order(
-                symbol=position['symbol'],
-                side=close_side,
-                positionSide=position['position_side'],
-                type='MARKET',
-                quantity=position['amount']
-            )
+            with self.client.priority(PRIORITY_CRITICAL):
+                order = self.client.futures_create_order(
+                    symbol=position['symbol'],
+                    side=close_side,
+                    positionSide=position['position_side'],
+                    type='MARKET',
+                    quantity=position['amount']
+                )
             
             print(f"✅ [{self.bot_id}] Position closed successfully!")
             print(f"   Order ID: {order['orderId']}")
             print(f"   Realized PnL: ${position['unrealized_pnl']:.8f}")
             
-            if position['position_key'] in self.position_highest_pnl:
-                del self.position_highest_pnl[position['position_key']]
+            with self.peak_lock:
+                self.position_highest_pnl.pop(position['position_key'], None)
+                self.store.delete_position_peak(self.network, self.symbol, position['position_key'])
+            
+            # Don't close it again before the next positions refresh
+            self.positions = [pos for pos in self.positions
+                              if pos['position_key'] != position['position_key']]
+            if self.scheduler:
+                self.scheduler.trigger('positions')
             
         except Exception as e:
             print(f"❌ [{self.bot_id}] Error closing position: {str(e)}")
     
-    def check_risk_management(self):
+    def check_risk_management(self, refresh=True):
         """Risk management checks - BOT LEVEL"""
-        self.update_balance()
+        if refresh:
+            self.update_balance()
         
         if self.stop_loss_percent > 0:
             loss_amount = self.initial_capital - self.balance
@@ -683,25 +4664,15 @@ class BinanceFuturesBot:
     def analyze_market(self):
         """Market analysis with cooldown protection"""
         try:
-            klines = self.client.futures_klines(symbol=self.symbol, interval='1h', limit=24)
-            df = pd.DataFrame(klines, columns=['time', 'open', 'high', 'low', 'close', 'volume', 
-                                               'close_time', 'quote_volume', 'trades', 
-                                               'taker_buy_base', 'taker_buy_quote', 'ignore'])
-            df['close'] = df['close'].astype(float)
-            df['high'] = df['high'].astype(float)
-            df['low'] = df['low'].astype(float)
+            klines = KlineCache.shared(self.use_testnet).get(self.symbol, '1h', 24, self.client, max_age=30)
+            high, low, close = klines[:, KLINE_HIGH], klines[:, KLINE_LOW], klines[:, KLINE_CLOSE]
             
-            volatility = (df['high'].max() - df['low'].min()) / df['close'].mean() * 100
+            volatility = range_volatility(high, low, close)
+            trend_strength = sma_trend(close, 6, 24)
             
-            sma_short = df['close'].tail(6).mean()
-            sma_long = df['close'].tail(24).mean()
-            trend_strength = ((sma_short - sma_long) / sma_long) * 100
-            
-            try:
-                funding_info = self.client.futures_funding_rate(symbol=self.symbol, limit=1)
-                funding_rate = float(funding_info[0]['fundingRate']) * 100
-            except:
-                funding_rate = 0
+            if not self.funding_rate_time:
+                self.update_funding_rate()
+            funding_rate = self.funding_rate
             
             is_stable = (abs(trend_strength) <= self.trend_threshold and 
                         volatility <= self.volatility_threshold and 
@@ -736,16 +4707,9 @@ class BinanceFuturesBot:
                         self.pause_count += 1
                         
                         self.update_price()
-                        
-                        try:
-                            self.client.futures_cancel_all_open_orders(symbol=self.symbol)
-                            print(f"✅ [{self.bot_id}] Cancelled old orders")
-                        except:
-                            pass
-                        
-                        time.sleep(2)
                         self.calculate_and_lock_grid_levels()
-                        self.grid_initialized = False
+                        kept, cancelled, amended, placed = self.reconcile_grid_orders()
+                        self.grid_initialized = kept + amended + placed > 0
                         
                         return True, f"🔄 [{self.bot_id}] RESUMED! Stable market"
                 else:
@@ -792,32 +4756,436 @@ class BinanceFuturesBot:
                             self.last_pause_time = current_time
                             self.pause_timestamps.append(current_time)
             
-            if self.auto_paused:
-                pause_duration = (time.time() - self.pause_start_time) / 60
-                return False, f"⏸️ [{self.bot_id}] AUTO PAUSED ({pause_duration:.1f}m) - Waiting..."
+            if self.auto_paused:
+                pause_duration = (time.time() - self.pause_start_time) / 60
+                return False, f"⏸️ [{self.bot_id}] AUTO PAUSED ({pause_duration:.1f}m) - Waiting..."
+            
+            if abs(trend_strength) > self.trend_threshold:
+                self.market_state = "UPTREND" if trend_strength > 0 else "DOWNTREND"
+                return False, f"📈 [{self.bot_id}] Strong trend ({trend_strength:.2f}%)"
+            
+            elif volatility > self.volatility_threshold:
+                self.market_state = "HIGH_VOLATILITY"
+                return False, f"📊 [{self.bot_id}] High volatility ({volatility:.2f}%)"
+            
+            else:
+                self.market_state = "SIDEWAY"
+                return True, f"🔄 [{self.bot_id}] Stable sideway"
+                
+        except Exception as e:
+            print(f"[{self.bot_id}] Error in market analysis: {str(e)}")
+            return False, f"Analysis error: {str(e)}"
+    
+    def update_price(self, rest_interval=0):
+        """Use streamed price when fresh, REST ticker otherwise (at most every rest_interval s)"""
+        if self.price_stream and self.price_stream.is_fresh(self.price_stale_after):
+            self.current_price = self.price_stream.price
+            return
+        
+        now = time.time()
+        if now - self.last_rest_price_time < rest_interval:
+            return
+        self.last_rest_price_time = now
+        
+        try:
+            ticker = self.client.futures_symbol_ticker(symbol=self.symbol)
+            self.current_price = float(ticker['price'])
+        except:
+            pass
+    
+    def update_funding_rate(self):
+        """Last funding rate in percent (settles every 8h, so refreshed rarely)"""
+        try:
+            funding_info = self.client.futures_funding_rate(symbol=self.symbol, limit=1)
+            self.funding_rate = float(funding_info[0]['fundingRate']) * 100
+        except:
+            self.funding_rate = 0
+        self.funding_rate_time = time.time()
+    
+    def start_price_stream(self):
+        if not self.use_price_stream:
+            return
+        
+        if self.price_stream is None or self.price_stream.symbol != self.symbol.upper():
+            self.price_stream = MarkPriceStream(
+                self.symbol,
+                use_testnet=self.use_testnet,
+                base_url=self.price_stream_url,
+                bot_id=self.bot_id,
+                kline_intervals=('1h',),
+                kline_cache=KlineCache.shared(self.use_testnet)
+            )
+        self.price_stream.start()
+    
+    def stop_price_stream(self):
+        if self.price_stream:
+            self.price_stream.stop()
+    
+    def user_stream_live(self):
+        return self.user_stream is not None and self.user_stream.connected
+    
+    def start_user_stream(self):
+        if not self.use_user_stream:
+            return
+        
+        self.user_stream = UserDataStream.for_client(
+            self.client,
+            use_testnet=self.use_testnet,
+            base_url=self.user_stream_url
+        )
+        self.user_stream.add_listener(self.handle_user_event, symbol=self.symbol)
+    
+    def stop_user_stream(self):
+        if self.user_stream:
+            self.user_stream.remove_listener(self.handle_user_event)
+    
+    def handle_user_event(self, event):
+        """Apply ORDER_TRADE_UPDATE incrementally and queue the filled level for refill
+        
+        Runs on the user stream thread shared by every bot on the API key, so no REST
+        calls here: the refill itself goes out from this bot's 'refill' task.
+        """
+        if event.get('e') != 'ORDER_TRADE_UPDATE':
+            return
+        
+        o = event['o']
+        if o.get('s') != self.symbol:
+            return
+        
+        order_id = o['i']
+        status = o['X']
+        position_side = o.get('ps', 'BOTH')
+        
+        self.store.record_order_event(
+            self.network, self.symbol, order_id,
+            'AMENDED' if o.get('x') == 'AMENDMENT' else status,
+            o['S'], position_side, float(o.get('p', 0)), float(o.get('q', 0)),
+            float(o.get('z', 0)), event.get('T', event['E'])
+        )
+        
+        with self.order_lock:
+            if status == 'NEW' and o.get('x') == 'AMENDMENT':
+                self.open_orders = [dict(order, price=float(o['p']), quantity=float(o['q']))
+                                    if order['order_id'] == order_id else order
+                                    for order in self.open_orders]
+                return
+            
+            if status == 'NEW':
+                if o.get('o') == 'LIMIT' and order_id not in self.active_order_ids:
+                    self.open_orders = self.open_orders + [{
+                        'order_id': order_id,
+                        'symbol': o['s'],
+                        'side': o['S'],
+                        'type': o['o'],
+                        'price': float(o['p']),
+                        'quantity': float(o['q']),
+                        'filled': float(o.get('z', 0)),
+                        'status': status,
+                        'time': datetime.fromtimestamp(event.get('T', event['E'])/1000).strftime('%H:%M:%S'),
+                        'position_side': position_side
+                    }]
+                    self.active_order_ids.add(order_id)
+                return
+            
+            if o.get('x') == 'TRADE' and float(o.get('l', 0)) > 0:
+                if self.scheduler:
+                    self.scheduler.trigger('positions')
+                
+                trade_id = o['t']
+                if trade_id not in self.last_filled_order_ids:
+                    self.last_filled_order_ids.add(trade_id)
+                    self.apply_new_trades(self.history().append([{
+                        'id': trade_id,
+                        'orderId': order_id,
+                        'symbol': o['s'],
+                        'side': o['S'],
+                        'price': o['L'],
+                        'qty': o['l'],
+                        'commission': o.get('n', 0),
+                        'realizedPnl': o.get('rp', 0),
+                        'time': o['T'],
+                        'positionSide': position_side
+                    }]))
+            
+            if status in ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED'):
+                self.open_orders = [order for order in self.open_orders if order['order_id'] != order_id]
+                self.active_order_ids.discard(order_id)
             
-            if abs(trend_strength) > self.trend_threshold:
-                self.market_state = "UPTREND" if trend_strength > 0 else "DOWNTREND"
-                return False, f"📈 [{self.bot_id}] Strong trend ({trend_strength:.2f}%)"
+            is_grid_fill = (status == 'FILLED' and o.get('o') == 'LIMIT' and
+                            ((o['S'] == 'BUY' and position_side == 'LONG') or
+                             (o['S'] == 'SELL' and position_side == 'SHORT')))
             
-            elif volatility > self.volatility_threshold:
-                self.market_state = "HIGH_VOLATILITY"
-                return False, f"📊 [{self.bot_id}] High volatility ({volatility:.2f}%)"
+            if is_grid_fill:
+                print(f"⚡ [{self.bot_id}] Fill {o['S']} {position_side} @ {o['p']} (stream)")
+                self.pending_refills[(float(o['p']), position_side)] = time.time()
+                if self.scheduler:
+                    self.scheduler.trigger('refill')
+    
+    def refill_grid_level(self, price, position_side):
+        """Re-place the single locked level that just filled"""
+        if not self.is_running or self.is_paused or not self.grid_initialized or not self.market_ok:
+            return
+        
+        rounded_price = self.round_price(price)
+        level = next((l for l in self.locked_grid_levels
+                      if abs(self.round_price(l) - rounded_price) < self.tick_size / 2), None)
+        if level is None:
+            return
+        
+        side = 'BUY' if position_side == 'LONG' else 'SELL'
+        if (side == 'BUY') != (level < self.grid_base_price):
+            return
+        
+        same_side = [o for o in self.open_orders if o['position_side'] == position_side]
+        if len(same_side) >= self.max_open_orders_per_side:
+            return
+        if any(abs(self.round_price(o['price']) - rounded_price) < self.tick_size / 2 for o in same_side):
+            return
+        
+        qty_per_grid = self.calculate_grid_quantity()
+        if qty_per_grid < self.min_qty:
+            return
+        
+        order = {
+            'side': side,
+            'position_side': position_side,
+            'price': f"{rounded_price:.{self.price_precision}f}",
+            'quantity': f"{qty_per_grid:.{self.quantity_precision}f}",
+            'level': level
+        }
+        results = self.place_orders_batch([order])
+        self.report_order_results(results, "🔄 Refilled", "Cannot refill @")
+    
+    def calculate_grid_quantity(self):
+        """Quantity per grid order (capital split evenly across both sides)
+        
+        Sized at the locked grid base price so it stays stable while the grid is live.
+        """
+        total_grids = len(self.locked_grid_levels)
+        price = self.grid_base_price or self.current_price
+        if total_grids == 0 or price <= 0:
+            return 0
+        
+        capital_per_side = self.capital / 2
+        qty_per_grid = (capital_per_side / (total_grids / 2)) / price
+        return self.round_quantity(qty_per_grid)
+    
+    def desired_grid_orders(self, qty_per_grid=None):
+        """Target LIMIT orders for the locked grid: [{'side', 'position_side', 'price', 'quantity', 'level'}]"""
+        if qty_per_grid is None:
+            qty_per_grid = self.calculate_grid_quantity()
+        
+        orders = []
+        long_count = 0
+        short_count = 0
+        qty_str = f"{qty_per_grid:.{self.quantity_precision}f}"
+        
+        for level in self.locked_grid_levels:
+            price_str = f"{self.round_price(level):.{self.price_precision}f}"
+            
+            if level < self.grid_base_price and long_count < self.max_open_orders_per_side:
+                orders.append({'side': 'BUY', 'position_side': 'LONG', 'price': price_str,
+                               'quantity': qty_str, 'level': level})
+                long_count += 1
+            
+            elif level > self.grid_base_price and short_count < self.max_open_orders_per_side:
+                orders.append({'side': 'SELL', 'position_side': 'SHORT', 'price': price_str,
+                               'quantity': qty_str, 'level': level})
+                short_count += 1
+        
+        return orders
+    
+    def diff_grid_orders(self, desired, live):
+        """Split desired vs live LIMIT orders into (keep, cancel, amend, place)
+        
+        A live order is kept when side, position side and price match and its open quantity
+        is within reconcile_qty_tolerance. Leftover live orders are re-priced onto leftover
+        targets of the same side (amend) and only the rest are cancelled or placed.
+        """
+        remaining = {(o['side'], o['position_side'], o['price']): o for o in desired}
+        keep = []
+        unmatched = []
+        
+        for order in live:
+            if order['type'] != 'LIMIT':
+                continue
             
+            key = (order['side'], order['position_side'],
+                   f"{self.round_price(order['price']):.{self.price_precision}f}")
+            target = remaining.get(key)
+            open_qty = order['quantity'] - order['filled']
+            
+            if target and abs(open_qty - float(target['quantity'])) <= float(target['quantity']) * self.reconcile_qty_tolerance:
+                keep.append(order)
+                del remaining[key]
             else:
-                self.market_state = "SIDEWAY"
-                return True, f"🔄 [{self.bot_id}] Stable sideway"
-                
-        except Exception as e:
-            print(f"[{self.bot_id}] Error in market analysis: {str(e)}")
-            return False, f"Analysis error: {str(e)}"
+                unmatched.append(order)
+        
+        place = list(remaining.values())
+        amend = []
+        cancel = []
+        
+        for order in unmatched:
+            target = next((t for t in place if t['side'] == order['side'] and
+                           t['position_side'] == order['position_side']), None)
+            if target and order['filled'] == 0:
+                amend.append((order, target))
+                place.remove(target)
+            else:
+                cancel.append(order)
+        
+        return keep, cancel, amend, place
     
-    def update_price(self):
-        try:
-            ticker = self.client.futures_symbol_ticker(symbol=self.symbol)
-            self.current_price = float(ticker['price'])
-        except:
-            pass
+    def reconcile_grid_orders(self):
+        """Move live orders onto the locked grid with the fewest requests, no cancel-all
+        
+        Returns (kept, cancelled, amended, placed).
+        """
+        qty_per_grid = self.calculate_grid_quantity()
+        if qty_per_grid <= 0 or qty_per_grid < self.min_qty:
+            print(f"⚠️ [{self.bot_id}] Quantity too small: {qty_per_grid}")
+            return 0, 0, 0, 0
+        
+        with self.order_lock:
+            live = self.get_open_orders()
+            keep, cancel, amend, place = self.diff_grid_orders(self.desired_grid_orders(qty_per_grid), live)
+            cancelled = 0
+            amended = 0
+            
+            # Cancels first to release margin, then amends, then new orders
+            still_open = []
+            for i in range(0, len(cancel), 10):
+                chunk = cancel[i:i + 10]
+                try:
+                    results = self.client.futures_cancel_orders(
+                        symbol=self.symbol, orderidlist=[o['order_id'] for o in chunk])
+                except Exception as e:
+                    print(f"⚠️ [{self.bot_id}] Cancel error: {e}")
+                    still_open += chunk
+                    continue
+                done, failed = self.report_cancel_results(chunk, results)
+                cancelled += done
+                still_open += failed
+            
+            # An order that would not cancel still holds its slot and margin: place one fewer
+            # on that side, dropping the target farthest from the price
+            for order in still_open:
+                same_side = [t for t in place if t['position_side'] == order['position_side']]
+                if same_side:
+                    place.remove(max(same_side, key=lambda t: abs(float(t['price']) - self.current_price)))
+            
+            for order, target in amend:
+                try:
+                    self.client.futures_modify_order(
+                        symbol=self.symbol,
+                        orderId=order['order_id'],
+                        side=target['side'],
+                        quantity=target['quantity'],
+                        price=target['price']
+                    )
+                    amended += 1
+                except Exception as e:
+                    # Fall back to cancel + new order for this level
+                    print(f"⚠️ [{self.bot_id}] Amend {order['price']} -> {target['price']} failed: {e}")
+                    try:
+                        self.client.futures_cancel_order(symbol=self.symbol, orderId=order['order_id'])
+                        cancelled += 1
+                    except Exception:
+                        pass
+                    place.append(target)
+            
+            results = self.place_orders_batch(place)
+            placed = sum(self.report_order_results(results, "✅", "Error at"))
+            
+            self.get_open_orders()
+            self.active_order_ids = {order['order_id'] for order in self.open_orders}
+        
+        print(f"🔁 [{self.bot_id}] Grid reconciled: {len(keep)} kept, {cancelled} cancelled, "
+              f"{amended} amended, {placed} placed")
+        return len(keep), cancelled, amended, placed
+    
+    def report_cancel_results(self, orders, results):
+        """Per-order outcome of futures_cancel_orders (failures come back as {'code', 'msg'})
+        
+        Returns (cancelled, still_open); an unknown order (-2011) is already gone.
+        """
+        cancelled = 0
+        still_open = []
+        
+        for order, result in zip(orders, results):
+            code = result.get('code') if isinstance(result, dict) else None
+            if code is None or code == 200:
+                cancelled += 1
+            elif code == -2011:
+                print(f"  ⚠️ Cancel {order['price']}: already gone ({result.get('msg')})")
+            else:
+                print(f"  ⚠️ Cannot cancel {order['side']} {order['position_side']} @ {order['price']}: {result.get('msg')}")
+                still_open.append(order)
+        
+        return cancelled, still_open
+    
+    def place_orders_batch(self, orders):
+        """Place LIMIT orders in batches of up to 5, paced by the rate governor
+        
+        orders: [{'side', 'position_side', 'price', 'quantity', 'level'}]
+        Returns [(order, result, error)] in input order; error is (code, msg) or None.
+        """
+        results = []
+        
+        for i in range(0, len(orders), self.batch_size):
+            chunk = orders[i:i + self.batch_size]
+            params = [{
+                'symbol': self.symbol,
+                'side': o['side'],
+                'positionSide': o['position_side'],
+                'type': 'LIMIT',
+                'timeInForce': 'GTC',
+                'quantity': o['quantity'],
+                'price': o['price']
+            } for o in chunk]
+            
+            try:
+                if len(chunk) == 1:
+                    response = [self.client.futures_create_order(**params[0])]
+                else:
+                    response = self.client.futures_place_batch_order(batchOrders=params)
+            except BinanceAPIException as e:
+                results.extend((o, None, (e.code, e.message)) for o in chunk)
+                continue
+            except Exception as e:
+                results.extend((o, None, (None, str(e))) for o in chunk)
+                continue
+            
+            for o, r in zip(chunk, response):
+                if 'orderId' in r:
+                    results.append((o, r, None))
+                    self.store.record_order_event(self.network, self.symbol, r['orderId'], 'PLACED',
+                                                  o['side'], o['position_side'], float(o['price']),
+                                                  float(o['quantity']))
+                else:
+                    results.append((o, None, (r.get('code'), r.get('msg'))))
+        
+        return results
+    
+    def report_order_results(self, results, placed_label, error_label):
+        """Print per-level outcome; returns (long_placed, short_placed)"""
+        long_placed = 0
+        short_placed = 0
+        
+        for order, result, error in results:
+            side_text = f"{order['side']} {order['position_side']}"
+            if error is None:
+                if order['position_side'] == 'LONG':
+                    long_placed += 1
+                else:
+                    short_placed += 1
+                print(f"  {placed_label} {side_text} @ {order['price']}")
+            elif error[0] == -2021:
+                print(f"  ⚠️ Skip {order['price']}: would match immediately")
+            else:
+                print(f"  ⚠️ {error_label} {order['price']}: {error[1]}")
+        
+        return long_placed, short_placed
     
     def place_hedge_grid_orders(self):
         """Place STABLE grid orders using LOCKED prices"""
@@ -826,8 +5194,7 @@ class BinanceFuturesBot:
             total_grids = len(self.locked_grid_levels)
             
             capital_per_side = self.capital / 2
-            qty_per_grid = (capital_per_side / (total_grids / 2)) / self.current_price
-            qty_per_grid = self.round_quantity(qty_per_grid)
+            qty_per_grid = self.calculate_grid_quantity()
             
             if qty_per_grid <= 0 or qty_per_grid < self.min_qty:
                 print(f"⚠️ [{self.bot_id}] Quantity too small: {qty_per_grid}")
@@ -838,50 +5205,11 @@ class BinanceFuturesBot:
             print(f"   📊 Per order: {qty_per_grid} {self.symbol}")
             print(f"   🔒 Using LOCKED grid prices (stable!)")
             
-            long_count = 0
-            short_count = 0
+            orders = self.desired_grid_orders(qty_per_grid)
             
-            for level in self.locked_grid_levels:
-                rounded_price = self.round_price(level)
-                price_str = f"{rounded_price:.{self.price_precision}f}"
-                qty_str = f"{qty_per_grid:.{self.quantity_precision}f}"
-                
-                try:
-                    if level < self.grid_base_price and long_count < self.max_open_orders_per_side:
-                        self.client.futures_create_order(
-                            symbol=self.symbol,
-                            side='BUY',
-                            positionSide='LONG',
-                            type='LIMIT',
-                            timeInForce='GTC',
-                            quantity=qty_str,
-                            price=price_str
-                        )
-                        long_count += 1
-                        print(f"  ✅ BUY LONG @ {price_str} (LOCKED)")
-                        time.sleep(0.15)
-                    
-                    elif level > self.grid_base_price and short_count < self.max_open_orders_per_side:
-                        self.client.futures_create_order(
-                            symbol=self.symbol,
-                            side='SELL',
-                            positionSide='SHORT',
-                            type='LIMIT',
-                            timeInForce='GTC',
-                            quantity=qty_str,
-                            price=price_str
-                        )
-                        short_count += 1
-                        print(f"  ✅ SELL SHORT @ {price_str} (LOCKED)")
-                        time.sleep(0.15)
-                        
-                except BinanceAPIException as e:
-                    if e.code == -2021:
-                        print(f"  ⚠️ Skip {price_str}: would match immediately")
-                    else:
-                        print(f"  ⚠️ Error at {price_str}: {e.message}")
-                except Exception as e:
-                    print(f"  ⚠️ Error at {price_str}: {str(e)}")
+            with self.order_lock:
+                results = self.place_orders_batch(orders)
+            long_count, short_count = self.report_order_results(results, "✅", "Error at")
             
             total_placed = long_count + short_count
             if total_placed > 0:
@@ -894,170 +5222,205 @@ class BinanceFuturesBot:
             print(f"[{self.bot_id}] Error placing orders: {str(e)}")
     
     def refill_hedge_orders(self):
-        """Refill orders using order ID tracking"""
-        try:
-            self.get_filled_orders(limit=100)
-            current_filled_ids = {order['id'] for order in self.filled_orders}
-            
-            new_fills = current_filled_ids - self.last_filled_order_ids
-            
-            if not new_fills:
-                return
-            
-            print(f"🔄 [{self.bot_id}] {len(new_fills)} new fills detected! Refilling...")
-            
-            self.last_filled_order_ids = current_filled_ids
-            
-            self.get_open_orders()
-            self.active_order_ids = {order['order_id'] for order in self.open_orders}
-            
-            open_prices_long = {self.round_price(o['price']) 
-                                for o in self.open_orders 
-                                if o['position_side'] == 'LONG'}
-            open_prices_short = {self.round_price(o['price']) 
-                                 for o in self.open_orders 
-                                 if o['position_side'] == 'SHORT'}
-            
-            capital_per_side = self.capital / 2
-            total_grids = len(self.locked_grid_levels)
-            qty_per_grid = (capital_per_side / (total_grids / 2)) / self.current_price
-            qty_per_grid = self.round_quantity(qty_per_grid)
-            
-            if qty_per_grid < self.min_qty:
+        """Refill orders using order ID tracking (fallback when the user stream is down)"""
+        if self.user_stream_live():
+            if self.user_stream_synced_connect == self.user_stream.connect_count:
                 return
-            
-            long_count = len([o for o in self.open_orders if o['position_side'] == 'LONG'])
-            short_count = len([o for o in self.open_orders if o['position_side'] == 'SHORT'])
-            
-            refilled = 0
-            
-            for level in self.locked_grid_levels:
-                rounded_price = self.round_price(level)
-                price_str = f"{rounded_price:.{self.price_precision}f}"
+            # (Re)connected: one polling pass catches fills missed while disconnected
+            self.user_stream_synced_connect = self.user_stream.connect_count
+        
+        with self.order_lock:
+            try:
+                self.get_filled_orders(limit=100)
+                current_filled_ids = {order['id'] for order in self.filled_orders}
+                
+                new_fills = current_filled_ids - self.last_filled_order_ids
+                
+                if not new_fills:
+                    return
+                
+                print(f"🔄 [{self.bot_id}] {len(new_fills)} new fills detected! Refilling...")
+                
+                self.last_filled_order_ids = current_filled_ids
+                
+                self.get_open_orders()
+                self.active_order_ids = {order['order_id'] for order in self.open_orders}
+                
+                open_prices_long = {self.round_price(o['price']) 
+                                    for o in self.open_orders 
+                                    if o['position_side'] == 'LONG'}
+                open_prices_short = {self.round_price(o['price']) 
+                                     for o in self.open_orders 
+                                     if o['position_side'] == 'SHORT'}
+                
+                qty_per_grid = self.calculate_grid_quantity()
+                
+                if qty_per_grid < self.min_qty:
+                    return
+                
+                long_count = len([o for o in self.open_orders if o['position_side'] == 'LONG'])
+                short_count = len([o for o in self.open_orders if o['position_side'] == 'SHORT'])
+                
+                orders = []
                 qty_str = f"{qty_per_grid:.{self.quantity_precision}f}"
                 
-                try:
+                for level in self.locked_grid_levels:
+                    rounded_price = self.round_price(level)
+                    price_str = f"{rounded_price:.{self.price_precision}f}"
+                    
                     if (level < self.grid_base_price and 
                         rounded_price not in open_prices_long and 
                         long_count < self.max_open_orders_per_side):
                         
-                        self.client.futures_create_order(
-                            symbol=self.symbol,
-                            side='BUY',
-                            positionSide='LONG',
-                            type='LIMIT',
-                            timeInForce='GTC',
-                            quantity=qty_str,
-                            price=price_str
-                        )
-                        refilled += 1
+                        orders.append({'side': 'BUY', 'position_side': 'LONG', 'price': price_str,
+                                       'quantity': qty_str, 'level': level})
                         long_count += 1
                         open_prices_long.add(rounded_price)
-                        print(f"  🔄 Refilled BUY LONG @ {price_str}")
-                        time.sleep(0.15)
                     
                     elif (level > self.grid_base_price and 
                           rounded_price not in open_prices_short and 
                           short_count < self.max_open_orders_per_side):
                         
-                        self.client.futures_create_order(
-                            symbol=self.symbol,
-                            side='SELL',
-                            positionSide='SHORT',
-                            type='LIMIT',
-                            timeInForce='GTC',
-                            quantity=qty_str,
-                            price=price_str
-                        )
-                        refilled += 1
+                        orders.append({'side': 'SELL', 'position_side': 'SHORT', 'price': price_str,
+                                       'quantity': qty_str, 'level': level})
                         short_count += 1
                         open_prices_short.add(rounded_price)
-                        print(f"  🔄 Refilled SELL SHORT @ {price_str}")
-                        time.sleep(0.15)
-                        
-                except BinanceAPIException as e:
-                    if e.code == -2021:
-                        print(f"  ⚠️ Skip {price_str}: would match immediately")
-                    else:
-                        print(f"  ⚠️ Cannot refill @ {price_str}: {e.message}")
-                except Exception as e:
-                    print(f"  ⚠️ Error @ {price_str}: {str(e)}")
-            
-            if refilled > 0:
-                print(f"✅ [{self.bot_id}] Refilled {refilled} orders!")
                 
-        except Exception as e:
-            print(f"[{self.bot_id}] Refill error: {str(e)}")
+                results = self.place_orders_batch(orders)
+                refilled = sum(self.report_order_results(results, "🔄 Refilled", "Cannot refill @"))
+                
+                if refilled > 0:
+                    print(f"✅ [{self.bot_id}] Refilled {refilled} orders!")
+                    
+            except Exception as e:
+                print(f"[{self.bot_id}] Refill error: {str(e)}")
     
     def calculate_pnl(self):
-        try:
-            account = self.client.futures_account()
-            self.pnl = float(account['totalUnrealizedProfit'])
-            self.update_balance()
-        except:
-            pass
+        self.apply_account_snapshot(self.account_state.get())
+    
+    def sync_orders(self):
+        """Open orders and fills by polling, only while the user data stream is down"""
+        if not self.user_stream_live():
+            self.get_open_orders()
+            self.get_filled_orders()
+    
+    def run_price_task(self):
+        self.update_price(rest_interval=self.price_rest_interval)
+    
+    def run_tp_sl_task(self):
+        """Sub-second TP/SL: re-value positions at the streamed mark price, no REST"""
+        if self.price_stream and self.price_stream.is_fresh(self.price_stale_after):
+            self.mark_positions(self.price_stream.mark_price or self.price_stream.price)
+        self.check_position_tp_sl(refresh=False)
+    
+    def run_risk_task(self):
+        """Bot-level risk checks on the account snapshot; returns False when the bot stopped itself"""
+        self.calculate_pnl()
+        
+        stop_triggered, stop_msg = self.check_risk_management(refresh=False)
+        if stop_triggered:
+            print(stop_msg)
+            self.stop()
+            return False
+        return True
+    
+    def run_market_task(self):
+        self.market_ok, self.market_message = self.analyze_market()
+        
+        if self.grid_initialized and not self.market_ok and not self.auto_paused:
+            print(f"⚠️ [{self.bot_id}] {self.market_message}")
+    
+    def run_grid_task(self):
+        """Rebalance and first placement, using the last market analysis"""
+        current_time = time.time()
+        if (self.enable_dynamic_grid and 
+            self.grid_initialized and 
+            not self.auto_paused):
+            
+            if current_time - self.last_rebalance_time >= self.rebalance_cooldown:
+                if self.check_grid_rebalance():
+                    print(f"🔄 [{self.bot_id}] Grid rebalanced!")
+                    self.last_rebalance_time = current_time
+        
+        if not self.is_paused and not self.grid_initialized and self.market_ok:
+            print(f"🎯 [{self.bot_id}] {self.market_message}")
+            self.place_hedge_grid_orders()
+            self.last_rebalance_time = current_time
+    
+    def run_refill_task(self):
+        if not self.is_paused and self.grid_initialized and self.market_ok:
+            # Stream fills first; held while paused or the market is off, like polled fills
+            with self.order_lock:
+                pending, self.pending_refills = self.pending_refills, {}
+                for price, position_side in pending:
+                    self.refill_grid_level(price, position_side)
+            self.refill_hedge_orders()
+    
+    def build_scheduler(self):
+        """Task table for this bot: exits and prices every second, slow market data rarely"""
+        intervals = self.task_intervals
+        scheduler = TaskScheduler(self.bot_id)
+        
+        scheduler.add('price', self.run_price_task, intervals['price'], PRIORITY_CRITICAL, deadline=0.5)
+        scheduler.add('tp_sl', self.run_tp_sl_task, intervals['tp_sl'], PRIORITY_CRITICAL, deadline=0.5)
+        scheduler.add('risk', self.run_risk_task, intervals['risk'], PRIORITY_CRITICAL)
+        scheduler.add('positions', self.get_positions, intervals['positions'], PRIORITY_ORDER, deadline=2)
+        scheduler.add('grid', self.run_grid_task, intervals['grid'], PRIORITY_ORDER)
+        scheduler.add('refill', self.run_refill_task, intervals['refill'], PRIORITY_ORDER)
+        scheduler.add('market', self.run_market_task, intervals['market'], PRIORITY_NORMAL)
+        scheduler.add('orders', self.sync_orders, intervals['orders'], PRIORITY_NORMAL)
+        scheduler.add('funding', self.update_funding_rate, intervals['funding'], PRIORITY_NORMAL)
+        return scheduler
     
     def run_bot(self):
-        """Bot loop with TP/SL checks"""
+        """Bot loop: run whichever scheduled tasks are due, then sleep until the next one"""
         print(f"▶️ [{self.bot_id}] Bot thread started")
+        scheduler = self.scheduler
         
         while self.is_running and not self.stop_event.is_set():
             try:
-                self.update_price()
-                
-                # 🆕 Check position TP/SL FIRST
-                self.check_position_tp_sl()
-                
-                stop_triggered, stop_msg = self.check_risk_management()
-                if stop_triggered:
-                    print(stop_msg)
-                    self.stop()
-                    break
-                
-                should_run, message = self.analyze_market()
-                
-                current_time = time.time()
-                if (self.enable_dynamic_grid and 
-                    self.grid_initialized and 
-                    not self.auto_paused):
+                started = time.time()
+                due = scheduler.due_tasks()
+                for task in due:
+                    with self.client.priority(task.priority):
+                        result = scheduler.run_task(task)
                     
-                    if current_time - self.last_rebalance_time >= self.rebalance_cooldown:
-                        if self.check_grid_rebalance():
-                            print(f"🔄 [{self.bot_id}] Grid rebalanced!")
-                            self.last_rebalance_time = current_time
-                            time.sleep(3)
-                
-                if not self.is_paused:
-                    if not self.grid_initialized and should_run:
-                        print(f"🎯 [{self.bot_id}] {message}")
-                        self.place_hedge_grid_orders()
-                        self.last_rebalance_time = current_time
-                    
-                    elif self.grid_initialized and should_run:
-                        self.refill_hedge_orders()
-                    
-                    elif self.grid_initialized and not should_run and not self.auto_paused:
-                        print(f"⚠️ [{self.bot_id}] {message}")
-                
-                self.calculate_pnl()
-                self.get_positions()
-                self.get_open_orders()
-                self.get_filled_orders()
+                    if result is False or not self.is_running:
+                        break
                 
-                time.sleep(30)
+                if due:
+                    self.publish_snapshot()
+                    self.loop_durations.append(time.time() - started)
+                self.stop_event.wait(scheduler.seconds_until_next())
                 
             except Exception as e:
                 print(f"[{self.bot_id}] Error in loop: {str(e)}")
-                time.sleep(10)
+                self.stop_event.wait(10)
         
         print(f"⏹️ [{self.bot_id}] Bot thread stopped")
     
     def start(self):
-        """Start bot with independent thread"""
+        """Start bot on its own thread, or on the shared asyncio runtime if one is set"""
         if not self.is_running:
             self.is_running = True
             self.is_paused = False
             self.stop_event.clear()
+            self.start_price_stream()
+            
+            # Baseline for incremental stream updates
+            self.get_open_orders()
+            self.get_filled_orders(limit=100)
+            self.active_order_ids = {order['order_id'] for order in self.open_orders}
+            self.start_user_stream()
+            self.account_state.start(self, self.user_stream)
+            self.market_ok = False
+            self.scheduler = self.build_scheduler()
+            self.publish_snapshot()
+            
+            if self.runtime is not None:
+                self.runtime.add_bot(self)
+                print(f"✅ [{self.bot_id}] Started on {type(self.runtime).__name__}")
+                return
             
             self.bot_thread = threading.Thread(
                 target=self.run_bot, 
@@ -1067,108 +5430,347 @@ class BinanceFuturesBot:
             self.bot_thread.start()
             print(f"✅ [{self.bot_id}] Started on independent thread: {self.bot_thread.name}")
     
-    def stop(self):
-        """Stop bot and clean up - NO ROUNDING (use exact amounts)"""
+    def stop(self, cancel_orders=True):
+        """Stop bot and clean up - NO ROUNDING (use exact amounts)
+        
+        cancel_orders=False only stops the loop and streams and leaves the grid resting
+        on the exchange for a later warm start.
+        """
         print(f"\n{'='*60}")
         print(f"🛑 [{self.bot_id}] Stopping bot...")
         print(f"{'='*60}")
         
-        self.is_running = False
-        self.grid_initialized = False
-        self.auto_paused = False
-        self.stop_event.set()
+        self.is_running = False
+        self.grid_initialized = False
+        self.auto_paused = False
+        self.stop_event.set()
+        self.stop_price_stream()
+        self.stop_user_stream()
+        self.account_state.stop(self)
+        if self.runtime is not None:
+            self.runtime.remove_bot(self)
+        
+        if not cancel_orders:
+            self.save_grid_state()
+            print(f"💤 [{self.bot_id}] Stopped; grid orders and positions left open for warm start")
+            print(f"{'='*60}\n")
+            return
+        
+        self.clear_grid_state()
+        
+        try:
+            # Emergency path: jump ahead of refills and scanner traffic
+            with self.client.priority(PRIORITY_CRITICAL):
+                self.client.futures_cancel_all_open_orders(symbol=self.symbol)
+                print(f"✅ [{self.bot_id}] Cancelled all orders for {self.symbol}")
+                
+                positions = self.client.futures_position_information(symbol=self.symbol)
+                for pos in positions:
+                    position_amt = float(pos['positionAmt'])
+                    if position_amt != 0:
+                        close_side = 'SELL' if position_amt > 0 else 'BUY'
+                        pos_side = pos.get('positionSide', 'BOTH')
+                        
+                        # 🔥 NO ROUNDING - Use exact amount from Binance API
+                        abs_amt = abs(position_amt)
+                        
+                        try:
+                            self.client.futures_create_order(
+                                symbol=self.symbol,
+                                side=close_side,
+                                positionSide=pos_side,
+                                type='MARKET',
+                                quantity=abs_amt
+                            )
+                            print(f"✅ [{self.bot_id}] Closed position {pos_side}: {abs_amt} (EXACT from Binance)")
+                        except BinanceAPIException as e:
+                            print(f"⚠️ [{self.bot_id}] Error closing {pos_side}: {e.message}")
+                        except Exception as e:
+                            print(f"⚠️ [{self.bot_id}] Error closing {pos_side}: {str(e)}")
+            
+            self.positions = []
+            self.open_orders = []
+            self.filled_orders = []
+            self.locked_grid_levels = []
+            self.grid_levels = []
+            self.last_filled_order_ids = set()
+            self.active_order_ids = set()
+            self.pending_refills = {}
+            self.trade_history = None
+            print(f"🗑️ [{self.bot_id}] Cleaned cache")
+            
+            if self.pause_count > 0:
+                print(f"\n📊 [{self.bot_id}] AUTO PAUSE STATISTICS:")
+                print(f"   Auto pause count: {self.pause_count}")
+            
+            print(f"✅ [{self.bot_id}] Bot stopped successfully")
+            print(f"{'='*60}\n")
+            
+        except Exception as e:
+            print(f"[{self.bot_id}] Error during stop: {str(e)}")
+        self.publish_snapshot()
+    
+    def loop_alive(self):
+        """Is the bot loop (own thread or coroutine on the shared runtime) still running?"""
+        if self.runtime is not None:
+            return self.runtime.is_hosting(self)
+        return bool(self.bot_thread and self.bot_thread.is_alive())
+    
+    def pause(self):
+        if not self.auto_paused:
+            self.is_paused = True
+            self.publish_snapshot()
+            print(f"⏸️ [{self.bot_id}] Manual pause")
+    
+    def resume(self):
+        self.is_paused = False
+        self.auto_paused = False
+        self.stable_checks = 0
+        self.publish_snapshot()
+        print(f"▶️ [{self.bot_id}] Manual resume")
+    
+    def publish_snapshot(self):
+        """Swap in a new BotSnapshot if displayed state changed since the last one
+        
+        Built under order_lock so stream updates (fills, order events) are either fully in
+        it or not at all; readers just take `self.snapshot`.
+        """
+        current = self.snapshot
+        if current is not None and current.version == self.state_version:
+            return current
+        
+        with self.order_lock:
+            snapshot = BotSnapshot(
+                version=self.state_version,
+                symbol=self.symbol,
+                current_price=self.current_price,
+                balance=self.balance,
+                available_balance=self.available_balance,
+                pnl=self.pnl,
+                market_state=self.market_state,
+                is_running=self.is_running,
+                is_paused=self.is_paused,
+                positions=tuple(self.positions),
+                open_orders=tuple(self.open_orders),
+                filled_orders=tuple(self.filled_orders),
+                updated=time.time()
+            )
+        self.snapshot = snapshot
+        return snapshot
+
+
+class AsyncBotEngine:
+    """Optional runtime: host every bot as a coroutine on one asyncio event loop
+    
+    Per-loop REST reads go through one pooled AsyncClient (aiohttp) per API key and run
+    concurrently. Trading decisions and order writes reuse the bot's synchronous code on
+    a small shared executor, so thread count stays flat as bots are added.
+    """
+    
+    _shared = None
+    _shared_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+    
+    def __init__(self, io_workers=4):
+        self.loop = None
+        self.loop_thread = None
+        self.executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="AsyncEngineIO")
+        self.bot_tasks = {}
+        self.async_clients = {}
+        self.lock = threading.Lock()
+    
+    def ensure_loop(self):
+        with self.lock:
+            if self.loop_thread and self.loop_thread.is_alive():
+                return
+            
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(
+                target=self.loop.run_forever,
+                daemon=True,
+                name="AsyncBotEngine"
+            )
+            self.loop_thread.start()
+            print("⚡ Async bot engine started (single event loop)")
+    
+    def add_bot(self, bot):
+        self.ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self.host_bot(bot), self.loop)
+        self.bot_tasks[bot.bot_id] = future
+    
+    def remove_bot(self, bot):
+        future = self.bot_tasks.pop(bot.bot_id, None)
+        if future and not future.done():
+            # Wakes host_bot if it is sleeping between passes
+            self.loop.call_soon_threadsafe(future.cancel)
+    
+    def bot_count(self):
+        return len([f for f in self.bot_tasks.values() if not f.done()])
+    
+    def is_hosting(self, bot):
+        """True while the bot's coroutine is still running on the loop"""
+        future = self.bot_tasks.get(bot.bot_id)
+        return future is not None and not future.done()
+    
+    async def get_async_client(self, bot):
+        raw = bot.client.client
+        key = (raw.API_KEY, bot.use_testnet)
+        
+        client = self.async_clients.get(key)
+        if client is None:
+            if isinstance(raw, MockClient):
+                async_client = raw.async_client()
+            else:
+                async_client = await AsyncClient.create(raw.API_KEY, raw.API_SECRET, testnet=bot.use_testnet)
+            client = GovernedClient(async_client, RateGovernor.shared(bot.use_testnet))
+            self.async_clients[key] = client
+        return client
+    
+    def attach_async_tasks(self, bot, client):
+        """Give the REST-only scheduler tasks non-blocking versions on the shared AsyncClient"""
+        async def price():
+            if bot.price_stream and bot.price_stream.is_fresh(bot.price_stale_after):
+                bot.update_price()
+                return
+            
+            now = time.time()
+            if now - bot.last_rest_price_time < bot.price_rest_interval:
+                return
+            bot.last_rest_price_time = now
+            ticker = await client.futures_symbol_ticker(symbol=bot.symbol)
+            bot.current_price = float(ticker['price'])
+        
+        async def positions():
+            bot.apply_positions(await client.futures_position_information(symbol=bot.symbol))
+        
+        async def orders():
+            if bot.user_stream_live():
+                return
+            open_orders, trades = await asyncio.gather(
+                client.futures_get_open_orders(symbol=bot.symbol),
+                client.futures_account_trades(**bot.history().next_params(50))
+            )
+            bot.apply_open_orders(open_orders)
+            bot.apply_filled_orders(trades)
+        
+        for name, func in (('price', price), ('positions', positions), ('orders', orders)):
+            if name in bot.scheduler.tasks:
+                bot.scheduler.tasks[name].async_func = func
+    
+    async def run_task(self, bot, task):
+        """Await the async version of a task, or run the sync one on the executor"""
+        scheduler = bot.scheduler
+        started = time.time()
+        scheduler.mark_started(task, started)
+        
+        try:
+            if task.async_func:
+                result = await task.async_func()
+            else:
+                def run_with_priority():
+                    with bot.client.priority(task.priority):
+                        return task.func()
+                
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, run_with_priority)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            scheduler.mark_finished(task, started, e)
+            return None
+        
+        scheduler.mark_finished(task, started)
+        return result
+    
+    async def host_bot(self, bot):
+        print(f"▶️ [{bot.bot_id}] Bot coroutine started")
         
         try:
-            self.client.futures_cancel_all_open_orders(symbol=self.symbol)
-            print(f"✅ [{self.bot_id}] Cancelled all orders for {self.symbol}")
+            client = await self.get_async_client(bot)
+            self.attach_async_tasks(bot, client)
+            scheduler = bot.scheduler
             
-            positions = self.client.futures_position_information(symbol=self.symbol)
-            for pos in positions:
-                position_amt = float(pos['positionAmt'])
-                if position_amt != 0:
-                    close_side = 'SELL' if position_amt > 0 else 'BUY'
-                    pos_side = pos.get('positionSide', 'BOTH')
+            while bot.is_running and not bot.stop_event.is_set():
+                try:
+                    started = time.time()
+                    due = scheduler.due_tasks()
+                    for task in due:
+                        result = await self.run_task(bot, task)
+                        
+                        if result is False or not bot.is_running:
+                            break
                     
-                    # 🔥 NO ROUNDING - Use exact amount from Binance API
-                    abs_amt = abs(position_amt)
+                    if due:
+                        bot.publish_snapshot()
+                        bot.loop_durations.append(time.time() - started)
+                    await asyncio.sleep(scheduler.seconds_until_next())
                     
-                    try:
-                        self.client.futures_create_order(
-                            symbol=self.symbol,
-                            side=close_side,
-                            positionSide=pos_side,
-                            type='MARKET',
-                            quantity=abs_amt
-                        )
-                        print(f"✅ [{self.bot_id}] Closed position {pos_side}: {abs_amt} (EXACT from Binance)")
-                    except BinanceAPIException as e:
-                        print(f"⚠️ [{self.bot_id}] Error closing {pos_side}: {e.message}")
-                    except Exception as e:
-                        print(f"⚠️ [{self.bot_id}] Error closing {pos_side}: {str(e)}")
-            
-            self.positions = []
-            self.open_orders = []
-            self.filled_orders = []
-            self.locked_grid_levels = []
-            self.grid_levels = []
-            self.last_filled_order_ids = set()
-            self.active_order_ids = set()
-            print(f"🗑️ [{self.bot_id}] Cleaned cache")
-            
-            if self.pause_count > 0:
-                print(f"\n📊 [{self.bot_id}] AUTO PAUSE STATISTICS:")
-                print(f"   Auto pause count: {self.pause_count}")
-            
-            print(f"✅ [{self.bot_id}] Bot stopped successfully")
-            print(f"{'='*60}\n")
-            
-        except Exception as e:
-            print(f"[{self.bot_id}] Error during stop: {str(e)}")
-    
-    def pause(self):
-        if not self.auto_paused:
-            self.is_paused = True
-            print(f"⏸️ [{self.bot_id}] Manual pause")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[{bot.bot_id}] Error in loop: {str(e)}")
+                    await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            pass
+        
+        print(f"⏹️ [{bot.bot_id}] Bot coroutine stopped")
     
-    def resume(self):
-        self.is_paused = False
-        self.auto_paused = False
-        self.stable_checks = 0
-        print(f"▶️ [{self.bot_id}] Manual resume")
+    def shutdown(self):
+        if not self.loop or not self.loop.is_running():
+            return
+        
+        async def close_clients():
+            for client in self.async_clients.values():
+                await client.client.close_connection()
+            self.async_clients = {}
+        
+        try:
+            asyncio.run_coroutine_threadsafe(close_clients(), self.loop).result(timeout=5)
+        except Exception as e:
+            print(f"⚠️ Async engine shutdown: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
 
 
 class SidewayScanner:
     """Scan for sideway crypto coins"""
     
-    def __init__(self, api_key, api_secret, use_testnet=True):
+    def __init__(self, api_key, api_secret, use_testnet=True, client=None):
         self.use_testnet = use_testnet
         
         api_key = api_key.strip().replace(' ', '').replace('\n', '').replace('\r', '')
         api_secret = api_secret.strip().replace(' ', '').replace('\n', '').replace('\r', '')
         
-        if use_testnet:
+        if client is not None:
+            self.client = client
+        elif use_testnet:
             self.client = Client(api_key, api_secret, testnet=True)
             self.client.API_URL = 'https://testnet.binancefuture.com'
         else:
             self.client = Client(api_key, api_secret)
+        
+        # Scanner traffic yields to the bots' requests
+        self.client = GovernedClient(self.client, RateGovernor.shared(use_testnet), PRIORITY_SCAN)
+        
+        # Concurrent scan: worker threads share one pooled HTTP session
+        self.max_workers = 16
+        self.client.session.mount('https://', requests.adapters.HTTPAdapter(
+            pool_connections=4, pool_maxsize=self.max_workers))
     
     def analyze_symbol(self, symbol):
         """Analyze if a symbol is in sideway"""
         try:
-            klines = self.client.futures_klines(symbol=symbol, interval='1h', limit=24)
-            df = pd.DataFrame(klines, columns=['time', 'open', 'high', 'low', 'close', 'volume', 
-                                               'close_time', 'quote_volume', 'trades', 
-                                               'taker_buy_base', 'taker_buy_quote', 'ignore'])
-            df['close'] = df['close'].astype(float)
-            df['high'] = df['high'].astype(float)
-            df['low'] = df['low'].astype(float)
+            klines = KlineCache.shared(self.use_testnet).get(symbol, '1h', 24, self.client, max_age=60)
+            high, low, close = klines[:, KLINE_HIGH], klines[:, KLINE_LOW], klines[:, KLINE_CLOSE]
             
-            volatility = (df['high'].max() - df['low'].min()) / df['close'].mean() * 100
-            sma_short = df['close'].tail(6).mean()
-            sma_long = df['close'].tail(24).mean()
-            trend_strength = abs((sma_short - sma_long) / sma_long) * 100
+            volatility = range_volatility(high, low, close)
+            trend_strength = abs(sma_trend(close, 6, 24))
             
-            current_price = df['close'].iloc[-1]
+            current_price = float(close[-1])
             
             is_sideway = (trend_strength < 2 and volatility < 4)
             
@@ -1183,24 +5785,23 @@ class SidewayScanner:
             return None
     
     def scan_all_symbols(self, callback=None):
-        """Scan all USDT futures symbols"""
+        """Scan all USDT futures symbols concurrently (callback(done, total, symbol) per result)"""
         try:
-            exchange_info = self.client.futures_exchange_info()
-            symbols = [s['symbol'] for s in exchange_info['symbols'] 
-                      if s['symbol'].endswith('USDT') and s['status'] == 'TRADING']
+            symbols = ExchangeInfoCache.shared(self.use_testnet).tradable_symbols('USDT', self.client)
             
             sideway_coins = []
             total = len(symbols)
             
-            for i, symbol in enumerate(symbols):
-                if callback:
-                    callback(i + 1, total, symbol)
-                
-                result = self.analyze_symbol(symbol)
-                if result and result['is_sideway']:
-                    sideway_coins.append(result)
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Scanner") as pool:
+                futures = {pool.submit(self.analyze_symbol, symbol): symbol for symbol in symbols}
                 
-                time.sleep(0.1)
+                for i, future in enumerate(as_completed(futures)):
+                    if callback:
+                        callback(i + 1, total, futures[future])
+                    
+                    result = future.result()
+                    if result and result['is_sideway']:
+                        sideway_coins.append(result)
             
             sideway_coins.sort(key=lambda x: x['volatility'])
             
@@ -1211,8 +5812,524 @@ class SidewayScanner:
             return []
 
 
+class BulkInitializer:
+    """Initialize many bots together: account-wide steps once, per-symbol steps in parallel
+    
+    The connection test, exchange info and hedge mode run once per API key. Leverage,
+    cancel-all, ticker and klines run per symbol on a thread pool. Each bot's
+    GovernedClient paces them against the shared rate budget. on_result(bot, success,
+    message) is called as each symbol finishes.
+    
+    No bot initializes until its account is in hedge mode. If open orders block the
+    switch, the cold-start symbols cancel theirs and the switch is retried once. If it
+    still fails, the account's bots are reported as failed before any grid is locked.
+    """
+    
+    MAX_WORKERS = 8
+    
+    def __init__(self, bots, warm_start=False, on_result=None, max_workers=None):
+        self.bots = list(bots)
+        self.warm_start = warm_start
+        self.on_result = on_result
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.results = {}
+    
+    def report(self, bot, success, message):
+        self.results[bot.symbol] = (success, message)
+        if self.on_result:
+            try:
+                self.on_result(bot, success, message)
+            except Exception as e:
+                print(f"⚠️ [{bot.bot_id}] Result callback error: {e}")
+    
+    def prepare_account(self, bots):
+        """Account-wide steps for one API key, done through its first bot; returns (success, message)"""
+        bot = bots[0]
+        print(f"\n{'='*60}")
+        print(f"🔍 Testing API connection for {len(bots)} bots...")
+        print(f"{'='*60}")
+        
+        success, message = bot.test_connection()
+        if not success:
+            return False, message
+        
+        try:
+            ExchangeInfoCache.shared(bot.use_testnet).ensure(bot.client)
+            hedge_ok, _ = bot.enable_hedge_mode()
+            if hedge_ok:
+                return True, message
+            
+            # Open orders block the switch: clear the ones initialize would cancel anyway, then retry
+            cold = [b for b in bots if not (self.warm_start and b.load_grid_state())]
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(cold) or 1),
+                                    thread_name_prefix="BulkInit") as executor:
+                list(executor.map(self.cancel_open_orders, cold))
+            return bot.enable_hedge_mode()
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+    
+    @staticmethod
+    def cancel_open_orders(bot):
+        try:
+            bot.client.futures_cancel_all_open_orders(symbol=bot.symbol)
+        except Exception as e:
+            print(f"⚠️ [{bot.bot_id}] Could not cancel open orders: {e}")
+    
+    def run(self):
+        """Initialize every bot; returns {symbol: (success, message)}"""
+        started = time.time()
+        accounts = {}
+        for bot in self.bots:
+            accounts.setdefault(id(bot.account_state), []).append(bot)
+        
+        ready = []
+        for bots in accounts.values():
+            success, message = self.prepare_account(bots)
+            if success:
+                ready.extend(bots)
+            else:
+                for bot in bots:
+                    self.report(bot, False, message)
+        
+        if ready:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ready)),
+                                    thread_name_prefix="BulkInit") as executor:
+                futures = {executor.submit(bot.initialize, self.warm_start, True): bot for bot in ready}
+                for future in as_completed(futures):
+                    success, message = future.result()
+                    self.report(futures[future], success, message)
+        
+        ok = sum(1 for success, _ in self.results.values() if success)
+        print(f"🚀 Bulk initialize: {ok}/{len(self.bots)} bots ready in {time.time() - started:.1f}s")
+        return self.results
+
+
+DAEMON_CONTROL_PORT = 8765
+
+# Bot attributes a daemon config may set (the GUI tab's knobs plus risk and TP/SL settings)
+DAEMON_BOT_SETTINGS = (
+    'capital', 'leverage', 'grid_count', 'grid_range_percent', 'auto_grid', 'max_open_orders_per_side',
+    'stop_loss_percent', 'take_profit_percent', 'trailing_stop_percent', 'max_drawdown_percent',
+    'daily_loss_limit_percent', 'enable_dynamic_grid', 'enable_auto_pause_resume', 'enable_position_tp',
+    'enable_position_sl', 'enable_trailing_per_position', 'position_tp_percent', 'position_sl_percent',
+    'position_trailing_percent', 'volatility_threshold', 'trend_threshold', 'rebalance_cooldown',
+    'pause_cooldown', 'max_pauses_per_hour', 'required_stable_checks', 'use_profile'
+)
+
+# Of those: on/off switches and whole-number counts; everything else is a float (capital, percents, seconds)
+DAEMON_FLAG_SETTINGS = (
+    'auto_grid', 'enable_dynamic_grid', 'enable_auto_pause_resume', 'enable_position_tp',
+    'enable_position_sl', 'enable_trailing_per_position', 'use_profile'
+)
+DAEMON_COUNT_SETTINGS = (
+    'leverage', 'grid_count', 'max_open_orders_per_side', 'max_pauses_per_hour', 'required_stable_checks'
+)
+
+
+def parse_daemon_setting(key, value):
+    """Config value -> bot attribute value; raises ValueError instead of truncating or guessing"""
+    if key in DAEMON_FLAG_SETTINGS:
+        if not isinstance(value, bool):
+            raise ValueError(f"{key} must be true or false, got {value!r}")
+        return value
+    
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{key} must be a number, got {value!r}")
+    if key in DAEMON_COUNT_SETTINGS:
+        if value != int(value):
+            raise ValueError(f"{key} must be a whole number, got {value!r}")
+        return int(value)
+    return float(value)
+
+
+def config_flag(path, config, key, default):
+    """A top-level true/false setting; "false" or 0 must not silently mean something else"""
+    value = config.get(key, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"{path}: {key} must be true or false, got {value!r}")
+    return value
+
+
+def load_daemon_config(path):
+    """Read a headless config (.json, or .yaml/.yml with PyYAML installed); raises ValueError
+    
+    {
+      "api_key": "...", "api_secret": "...",   (or taken from BINANCE_API_KEY / BINANCE_API_SECRET)
+      "testnet": true, "runtime": "thread" | "async", "warm_start": false,
+      "control_host": "127.0.0.1", "control_port": 8765,
+      "defaults": {"capital": 50, "leverage": 10, ...},
+      "bots": [{"symbol": "BTCUSDT", "capital": 100}, "ETHUSDT", ...]
+    }
+    """
+    try:
+        with open(path) as f:
+            if path.lower().endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ValueError("YAML configs need PyYAML (pip install pyyaml); JSON works without it")
+                config = yaml.safe_load(f)
+            else:
+                config = json.load(f)
+    except OSError as e:
+        raise ValueError(f"cannot read {path}: {e}")
+    except Exception as e:
+        if isinstance(e, ValueError) and 'PyYAML' in str(e):
+            raise
+        raise ValueError(f"cannot parse {path}: {e}")
+    
+    if not isinstance(config, dict) or not config.get('bots'):
+        raise ValueError(f"{path}: needs a non-empty 'bots' list")
+    
+    api_key = config.get('api_key') or os.environ.get('BINANCE_API_KEY', '')
+    api_secret = config.get('api_secret') or os.environ.get('BINANCE_API_SECRET', '')
+    if not api_key or not api_secret:
+        raise ValueError(f"{path}: no API credentials (api_key/api_secret or BINANCE_API_KEY/BINANCE_API_SECRET)")
+    
+    runtime = config.get('runtime', 'thread')
+    if runtime not in ('thread', 'async'):
+        raise ValueError(f"{path}: runtime must be 'thread' or 'async'")
+    
+    # The control socket has no authentication: never let it listen beyond this machine
+    control_host = str(config.get('control_host', '127.0.0.1'))
+    try:
+        loopback = control_host == 'localhost' or ipaddress.ip_address(control_host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError(f"{path}: control_host must be a loopback address (127.0.0.1, ::1 or localhost), "
+                         f"got {control_host!r}")
+    
+    defaults = config.get('defaults') or {}
+    bots = []
+    for entry in config['bots']:
+        if isinstance(entry, str):
+            entry = {'symbol': entry}
+        symbol = str(entry.get('symbol', '')).strip().upper()
+        if not symbol:
+            raise ValueError(f"{path}: every bot needs a 'symbol'")
+        if any(bot['symbol'] == symbol for bot in bots):
+            raise ValueError(f"{path}: {symbol} is listed twice")
+        
+        settings = dict(defaults)
+        settings.update({key: value for key, value in entry.items() if key != 'symbol'})
+        unknown = set(settings) - set(DAEMON_BOT_SETTINGS)
+        if unknown:
+            raise ValueError(f"{path}: {symbol} has unknown settings {', '.join(sorted(unknown))}")
+        try:
+            settings = {key: parse_daemon_setting(key, value) for key, value in settings.items()}
+        except ValueError as e:
+            raise ValueError(f"{path}: {symbol}: {e}")
+        bots.append({'symbol': symbol, 'settings': settings})
+    
+    return {
+        'api_key': api_key,
+        'api_secret': api_secret,
+        'testnet': config_flag(path, config, 'testnet', True),
+        'runtime': runtime,
+        'warm_start': config_flag(path, config, 'warm_start', False),
+        'control_host': control_host,
+        'control_port': int(config.get('control_port', DAEMON_CONTROL_PORT)),
+        'bots': bots
+    }
+
+
+class ControlRequestHandler(socketserver.StreamRequestHandler):
+    """One JSON command per line in, one JSON reply per line out"""
+    
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                reply = self.server.daemon.handle_command(json.loads(line))
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, address, daemon):
+        self.daemon = daemon
+        if ':' in address[0]:
+            self.address_family = socketserver.socket.AF_INET6
+        super().__init__(address, ControlRequestHandler)
+
+
+class BotDaemon:
+    """Headless multi-bot runner: builds bots from a config, supervises them, serves a control socket
+    
+    Bots start together through BulkInitializer. Bots that fail to initialize are retried
+    every RETRY_INTERVAL seconds; a bot thread that died is restarted (grid left resting,
+    warm start). A bot that stopped itself on a risk
+    limit stays stopped until a "start" command. Control commands (JSON per line):
+    {"cmd": "status"}, {"cmd": "pause" | "resume" | "start" | "stop", "symbol": "BTCUSDT"},
+    {"cmd": "shutdown"}.
+    """
+    
+    SUPERVISE_INTERVAL = 10
+    RETRY_INTERVAL = 60
+    
+    def __init__(self, config):
+        self.config = config
+        self.entries = {
+            bot['symbol']: {
+                'symbol': bot['symbol'],
+                'settings': bot['settings'],
+                'bot': None,
+                'status': 'pending',
+                'error': None,
+                'wanted': True,
+                'next_retry': 0,
+                'restarts': 0
+            } for bot in config['bots']
+        }
+        self.runtime = AsyncBotEngine.shared() if config['runtime'] == 'async' else None
+        self.summary = SummaryWorker(lambda: [entry['bot'] for entry in list(self.entries.values())])
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.server = None
+        self.started = time.time()
+    
+    def build_bot(self, entry):
+        config = self.config
+        bot = BinanceFuturesBot(config['api_key'], config['api_secret'], config['testnet'], bot_id=entry['symbol'])
+        bot.symbol = entry['symbol']
+        for key, value in entry['settings'].items():
+            if key == 'use_profile':
+                if value:
+                    bot.parameter_profile = load_parameter_profile()
+                continue
+            setattr(bot, key, value)
+        bot.runtime = self.runtime
+        return bot
+    
+    def start_bots(self, entries, warm_start=None):
+        """Build, bulk-initialize and start configured bots; failures are retried by supervise()"""
+        if warm_start is None:
+            warm_start = self.config['warm_start']
+        
+        def failed(entry, error):
+            entry.update(status='failed', error=error, next_retry=time.time() + self.RETRY_INTERVAL)
+            print(f"❌ [{entry['symbol']}] Start failed: {error} - retrying in {self.RETRY_INTERVAL}s")
+        
+        bots = []
+        for entry in entries:
+            try:
+                entry['bot'] = entry['bot'] or self.build_bot(entry)
+                entry['status'] = 'initializing'
+                bots.append(entry['bot'])
+            except Exception as e:
+                failed(entry, str(e))
+        
+        def on_result(bot, success, message):
+            entry = self.entries[bot.symbol]
+            if not entry['wanted'] or self.stop_event.is_set():
+                entry['status'] = 'stopped'  # stopped or shutting down while initializing
+                return
+            if not success:
+                failed(entry, message)
+                return
+            try:
+                bot.start()
+                entry.update(status='running', error=None)
+                print(f"✅ [{entry['symbol']}] Running")
+            except Exception as e:
+                failed(entry, str(e))
+        
+        if bots:
+            BulkInitializer(bots, warm_start=warm_start, on_result=on_result).run()
+    
+    def supervise(self):
+        """One pass: start pending/failed bots, restart dead loops, note self-stopped bots
+        
+        Entries are claimed ('initializing') under the lock; the network work runs after
+        it is released so control commands are never stuck behind a slow start.
+        """
+        due = []
+        revived = []
+        with self.lock:
+            for entry in self.entries.values():
+                bot = entry['bot']
+                if not entry['wanted'] or entry['status'] == 'initializing' or self.stop_event.is_set():
+                    continue
+                
+                if entry['status'] in ('pending', 'failed'):
+                    if time.time() >= entry['next_retry']:
+                        entry['status'] = 'initializing'
+                        due.append(entry)
+                elif not bot.is_running:
+                    # Risk limits stop a bot on purpose; leave it for an operator
+                    entry.update(status='stopped', wanted=False, error="stopped itself (risk limit)")
+                    print(f"🛑 [{entry['symbol']}] Bot stopped itself - not restarting")
+                elif not bot.loop_alive():
+                    print(f"♻️ [{entry['symbol']}] Bot loop died - restarting")
+                    entry['restarts'] += 1
+                    entry['status'] = 'initializing'
+                    revived.append(entry)
+        
+        for entry in revived:
+            entry['bot'].stop(cancel_orders=False)
+        if due:
+            self.start_bots(due)
+        if revived:
+            # Its grid is still resting on the exchange: resume it rather than re-centre
+            self.start_bots(revived, warm_start=True)
+    
+    def status(self):
+        bots = []
+        for entry in list(self.entries.values()):
+            state = entry['bot'].snapshot if entry['bot'] else None
+            row = {
+                'symbol': entry['symbol'],
+                'status': entry['status'],
+                'error': entry['error'],
+                'restarts': entry['restarts']
+            }
+            if state:
+                row.update(
+                    running=state.is_running,
+                    paused=state.is_paused,
+                    price=state.current_price,
+                    market_state=state.market_state,
+                    pnl=state.pnl,
+                    positions=len(state.positions),
+                    open_orders=len(state.open_orders),
+                    fills=len(state.filled_orders),
+                    age=round(time.time() - state.updated, 1)
+                )
+            bots.append(row)
+        
+        summary = self.summary.snapshot
+        return {
+            'ok': True,
+            'uptime': round(time.time() - self.started),
+            'network': 'testnet' if self.config['testnet'] else 'mainnet',
+            'runtime': self.config['runtime'],
+            'account': {
+                'balance': summary.balance,
+                'available_balance': summary.available_balance,
+                'unrealized_pnl': summary.unrealized_pnl,
+                'age': round(self.summary.age() or 0, 1),
+                'stale': self.summary.is_stale()
+            } if summary and summary.accounts else None,
+            'bots': bots
+        }
+    
+    def handle_command(self, command):
+        cmd = command.get('cmd')
+        if cmd == 'status':
+            return self.status()
+        if cmd == 'shutdown':
+            self.stop_event.set()
+            return {'ok': True}
+        
+        entry = self.entries.get(str(command.get('symbol', '')).upper())
+        if entry is None:
+            return {'ok': False, 'error': f"unknown symbol {command.get('symbol')}"}
+        
+        with self.lock:
+            bot = entry['bot']
+            if cmd == 'pause' and bot:
+                bot.pause()
+            elif cmd == 'resume' and bot:
+                bot.resume()
+            elif cmd == 'stop':
+                # Claimed here; the cancels and closes run after the lock is released
+                entry.update(wanted=False, status='stopped', error=None)
+            elif cmd == 'start':
+                entry['wanted'] = True
+                if (bot and bot.is_running) or entry['status'] == 'initializing':
+                    return {'ok': True, 'status': entry['status']}  # re-initializing would re-lock a live grid
+                entry.update(status='initializing', next_retry=0)
+            else:
+                return {'ok': False, 'error': f"unknown command {cmd} (or bot not built yet)"}
+        
+        if cmd == 'start':
+            self.start_bots([entry])
+        elif cmd == 'stop' and bot and bot.is_running:
+            bot.stop()
+        return {'ok': True, 'status': entry['status']}
+    
+    def serve_control(self):
+        address = (self.config['control_host'], self.config['control_port'])
+        self.server = ControlServer(address, self)
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="DaemonControl").start()
+        print(f"🎛️ Control socket on {address[0]}:{self.server.server_address[1]} (JSON lines)")
+    
+    def run(self):
+        """Start everything and supervise until shutdown (command, SIGTERM or Ctrl+C)"""
+        print(f"🤖 Headless mode: {len(self.entries)} bots "
+              f"({'TESTNET' if self.config['testnet'] else 'REAL'}, {self.config['runtime']} runtime)")
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                signal.signal(sig, lambda *_: self.stop_event.set())
+            except (ValueError, OSError):
+                pass  # not the main thread / unsupported on this platform
+        
+        self.serve_control()
+        self.summary.start()
+        
+        while not self.stop_event.is_set():
+            self.supervise()
+            self.stop_event.wait(self.SUPERVISE_INTERVAL)
+        
+        self.shutdown()
+    
+    def shutdown(self):
+        print("\n🗑️ Stopping all bots...")
+        with self.lock:
+            for entry in self.entries.values():
+                entry['wanted'] = False
+            bots = [entry['bot'] for entry in self.entries.values() if entry['bot']]
+        
+        for bot in bots:
+            if bot.is_running:
+                bot.stop(cancel_orders=not self.config['warm_start'])
+        
+        if self.server:
+            self.server.shutdown()
+        self.summary.stop()
+        if self.runtime is not None:
+            self.runtime.shutdown()
+        print("✅ Headless runner stopped")
+
+
+def run_headless(config_path):
+    """CLI entry: run the bots of a config file without the GUI"""
+    try:
+        config = load_daemon_config(config_path)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return None
+    
+    daemon = BotDaemon(config)
+    daemon.run()
+    return daemon
+
+
+def import_tkinter():
+    """Load tkinter on first GUI use (headless and CLI modes never import it)"""
+    global tk, ttk, messagebox
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+
+
 class BotGUI:
+    FILLED_PAGE_SIZE = 20
+    
+    # GUI refresh scheduler cadences
+    REFRESH_TICK_MS = 250
+    VISIBLE_TAB_INTERVAL = 0.5
+    BACKGROUND_TAB_INTERVAL = 10
+    SUMMARY_INTERVAL = 1
+    
     def __init__(self):
+        import_tkinter()
         self.root = tk.Tk()
         self.root.title("Binance Futures HEDGE Bot 🚀 v2.2.1 - Per-Position TP/SL")
         self.root.geometry("1200x900")
@@ -1225,20 +6342,26 @@ class BotGUI:
         atexit.register(self.cleanup_on_exit)
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        self.exchange_info_loading = set()
+        
         self.setup_ui()
         self.start_summary_updates()
         self.check_my_ip()
+        self.load_exchange_info(self.use_testnet.get())
     
     def cleanup_on_exit(self):
         """Clean up all bots on exit"""
         print("\n🗑️ Cleaning up all bots...")
+        self.summary_worker.stop()
         for symbol, data in list(self.bots.items()):
             bot = data.get('bot')
             if bot and bot.is_running:
                 print(f"🛑 Stopping {symbol}...")
-                bot.stop()
+                bot.stop(cancel_orders=not self.warm_start.get())
                 if bot.bot_thread and bot.bot_thread.is_alive():
                     bot.bot_thread.join(timeout=5)
+        if AsyncBotEngine._shared is not None:
+            AsyncBotEngine._shared.shutdown()
         print("✅ Cleanup complete")
     
     def on_closing(self):
@@ -1248,8 +6371,11 @@ class BotGUI:
             self.root.destroy()
     
     def start_summary_updates(self):
-        """Start periodic summary updates"""
-        self.update_summary()
+        """Start the summary worker and the single GUI refresh loop"""
+        self.summary_worker = SummaryWorker(lambda: [data.get('bot') for data in list(self.bots.values())])
+        self.summary_worker.start()
+        self.summary_drawn_at = 0
+        self.refresh_tick()
     
     def check_my_ip(self):
         """Check and display user's IPv4 address"""
@@ -1316,6 +6442,7 @@ class BotGUI:
         # Main notebook
         self.main_notebook = ttk.Notebook(self.root)
         self.main_notebook.pack(fill="both", expand=True, padx=5, pady=5)
+        self.main_notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
         
         # Config tab
         config_tab = ttk.Frame(self.main_notebook)
@@ -1342,6 +6469,7 @@ class BotGUI:
         self.new_symbol_entry = ttk.Entry(add_inner, width=15)
         self.new_symbol_entry.pack(side="left", padx=5)
         ttk.Button(add_inner, text="Add Tab", command=self.add_symbol_tab).pack(side="left", padx=5)
+        ttk.Button(add_inner, text="🚀 Initialize All", command=self.initialize_all).pack(side="left", padx=5)
         
         # Right - Summary
         summary_frame = ttk.LabelFrame(control_bar, text="💰 SUMMARY", padding=5)
@@ -1389,6 +6517,9 @@ class BotGUI:
         self.active_bots_label = ttk.Label(status_row, text="Bots: 0", 
                                            font=("Arial", 9))
         self.active_bots_label.pack(side="left", padx=5)
+        
+        self.summary_age_label = ttk.Label(status_row, text="", font=("Arial", 8), foreground="gray")
+        self.summary_age_label.pack(side="left", padx=10)
     
     def setup_config_tab(self, parent):
         config_frame = ttk.LabelFrame(parent, text="🔑 API Configuration", padding=10)
@@ -1433,9 +6564,24 @@ class BotGUI:
                                             font=("Arial", 10, "bold"), foreground="green")
         self.mode_warning_label.grid(row=5, column=1, sticky="w", pady=2)
         
+        # Runtime checkbox
+        self.use_async_runtime = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="⚡ Async runtime (all bots on one event loop)", 
+                       variable=self.use_async_runtime).grid(row=6, column=1, sticky="w", pady=2)
+        
+        # Warm start checkbox
+        self.warm_start = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="♻️ Warm start (resume saved grids, keep orders on exit)", 
+                       variable=self.warm_start).grid(row=7, column=1, sticky="w", pady=2)
+        
+        # Parameter profile checkbox
+        self.use_profile = tk.BooleanVar(value=os.path.exists(PARAMETER_PROFILE_PATH))
+        ttk.Checkbutton(config_frame, text=f"📐 Use sweep profile ({PARAMETER_PROFILE_PATH}) instead of capital tiers", 
+                       variable=self.use_profile).grid(row=8, column=1, sticky="w", pady=2)
+        
         # Test Button
         ttk.Button(config_frame, text="🔌 Test Connection", 
-                  command=self.test_api_connection, width=20).grid(row=6, column=1, sticky="w", pady=10)
+                  command=self.test_api_connection, width=20).grid(row=9, column=1, sticky="w", pady=10)
         
         # Instructions
         info_frame = ttk.LabelFrame(parent, text="📖 v2.2.1 - PER-POSITION TP/SL ADDED", padding=10)
@@ -1676,6 +6822,7 @@ to see frequent auto-closes and learn the system!
     
     def toggle_testnet_warning(self):
         """Toggle testnet warning"""
+        self.load_exchange_info(self.use_testnet.get())
         if self.use_testnet.get():
             self.mode_warning_label.config(text="Mode: TESTNET (Safe) 🧪", foreground="green")
         else:
@@ -1753,7 +6900,8 @@ to see frequent auto-closes and learn the system!
                 self.scanner = SidewayScanner(api_key, api_secret, use_testnet)
                 
                 def update_progress(current, total, symbol):
-                    self.scan_progress_label.config(text=f"Scanning... {current}/{total} - {symbol}")
+                    self.root.after(0, lambda: self.scan_progress_label.config(
+                        text=f"Scanning... {current}/{total} - {symbol}"))
                 
                 results = self.scanner.scan_all_symbols(callback=update_progress)
                 self.root.after(0, lambda: self.display_scan_results(results))
@@ -1814,6 +6962,11 @@ to see frequent auto-closes and learn the system!
             messagebox.showinfo("Info", f"{symbol} already exists!")
             return
         
+        valid, message = self.validate_symbol(symbol)
+        if not valid:
+            messagebox.showerror("Error", message)
+            return
+        
         symbol_tab = ttk.Frame(self.main_notebook)
         tab_index = self.main_notebook.index("end")
         self.main_notebook.add(symbol_tab, text=f"📊 {symbol}")
@@ -1821,6 +6974,40 @@ to see frequent auto-closes and learn the system!
         self.create_symbol_interface(symbol_tab, symbol, tab_index)
         self.new_symbol_entry.delete(0, 'end')
     
+    def load_exchange_info(self, use_testnet):
+        """Fill the shared exchange info cache in the background (never on the Tk thread)"""
+        if ExchangeInfoCache.shared(use_testnet).symbols or use_testnet in self.exchange_info_loading:
+            return
+        self.exchange_info_loading.add(use_testnet)
+        
+        def fetch():
+            try:
+                # Exchange info is public - no API key needed
+                ExchangeInfoCache.shared(use_testnet).refresh(Client(testnet=use_testnet))
+            except Exception as e:
+                print(f"⚠️ Cannot load exchange info: {e}")
+            finally:
+                self.exchange_info_loading.discard(use_testnet)
+        
+        threading.Thread(target=fetch, daemon=True).start()
+    
+    def validate_symbol(self, symbol):
+        """Check symbol against the shared exchange info cache"""
+        use_testnet = self.use_testnet.get()
+        cache = ExchangeInfoCache.shared(use_testnet)
+        
+        if not cache.symbols:
+            # Not loaded yet: accept it (initialize will catch a bad symbol) and load for next time
+            self.load_exchange_info(use_testnet)
+            return True, ""
+        
+        info = cache.symbols.get(symbol)
+        if info is None:
+            return False, f"{symbol} is not a Binance Futures symbol!"
+        if info['status'] != 'TRADING':
+            return False, f"{symbol} is not trading (status: {info['status']})"
+        return True, ""
+    
     def create_symbol_interface(self, parent, symbol, tab_index):
         # Header
         header_frame = ttk.Frame(parent)
@@ -1938,6 +7125,8 @@ to see frequent auto-closes and learn the system!
         pos_tree.heading('amount', text='Amount')
         pos_tree.heading('entry', text='Entry')
         pos_tree.heading('pnl', text='PnL')
+        pos_tree.tag_configure('green', foreground='green')
+        pos_tree.tag_configure('red', foreground='red')
         pos_tree.pack(fill="both", expand=True, padx=5, pady=5)
         
         # Orders tab
@@ -1976,13 +7165,31 @@ to see frequent auto-closes and learn the system!
         filled_tree.heading('qty', text='Qty')
         filled_tree.heading('pnl', text='PnL')
         filled_tree.heading('time', text='Time')
+        filled_tree.tag_configure('green', foreground='green')
+        filled_tree.tag_configure('red', foreground='red')
         filled_tree.pack(fill="both", expand=True, padx=5, pady=5)
         
+        # Pager over the stored fill history (page 0 = live)
+        filled_nav = ttk.Frame(filled_frame)
+        filled_nav.pack(fill="x", padx=5, pady=(0, 5))
+        ttk.Button(filled_nav, text="◀ Newer", width=10,
+                  command=lambda: self.change_filled_page(symbol, -1)).pack(side="left")
+        filled_page_label = ttk.Label(filled_nav, text="Live")
+        filled_page_label.pack(side="left", padx=10)
+        ttk.Button(filled_nav, text="Older ▶", width=10,
+                  command=lambda: self.change_filled_page(symbol, 1)).pack(side="left")
+        
+        # Only the visible data tab is refreshed; switching tabs refreshes at once
+        data_notebook.bind('<<NotebookTabChanged>>', lambda e: self.update_tables(symbol))
+        
         # Store widgets
         if symbol not in self.bots:
             self.bots[symbol] = {
                 'bot': None,
+                'tab': parent,
                 'tab_index': tab_index,
+                'filled_page': 0,
+                'tree_rows': {},  # last rows shown per tree, for diff updates
                 'widgets': {
                     'status': status_label,
                     'market': market_label,
@@ -1994,6 +7201,11 @@ to see frequent auto-closes and learn the system!
                     'buy_tree': buy_tree,
                     'sell_tree': sell_tree,
                     'filled_tree': filled_tree,
+                    'filled_page_label': filled_page_label,
+                    'data_notebook': data_notebook,
+                    'pos_frame': pos_frame,
+                    'orders_frame': orders_frame,
+                    'filled_frame': filled_frame,
                     'capital_entry': capital_entry,
                     'leverage_entry': leverage_entry,
                     'stop_loss_entry': stop_loss_entry,
@@ -2006,7 +7218,7 @@ to see frequent auto-closes and learn the system!
                 }
             }
         
-        self.update_symbol_display(symbol)
+        self.refresh_symbol_display(symbol)
     
     def close_symbol_tab(self, symbol, tab_index):
         """Close a symbol tab"""
@@ -2026,27 +7238,96 @@ to see frequent auto-closes and learn the system!
             self.main_notebook.forget(tab_index)
             messagebox.showinfo("Success", f"Closed {symbol}")
     
-    def update_symbol_display(self, symbol):
-        if symbol not in self.bots:
-            return
+    def symbol_tab_visible(self, symbol):
+        tab = self.bots[symbol].get('tab')
+        return tab is not None and self.main_notebook.select() == str(tab)
+    
+    def on_tab_changed(self, event=None):
+        """Bring a symbol tab up to date as soon as it is shown"""
+        for symbol in self.bots:
+            if self.symbol_tab_visible(symbol):
+                self.refresh_symbol_display(symbol)
+    
+    def refresh_tick(self):
+        """The one GUI refresh loop: redraw tabs whose bot state changed, at most once per cadence
+        
+        The shown tab redraws at most every VISIBLE_TAB_INTERVAL seconds, background tabs
+        (header labels only) every BACKGROUND_TAB_INTERVAL; unchanged tabs are not touched.
+        """
+        now = time.time()
+        try:
+            for symbol, data in list(self.bots.items()):
+                state = data['bot'].snapshot if data.get('bot') else None
+                if not state or state.version == data.get('drawn_version'):
+                    continue
+                
+                visible = self.symbol_tab_visible(symbol)
+                interval = self.VISIBLE_TAB_INTERVAL if visible else self.BACKGROUND_TAB_INTERVAL
+                if now - data.get('drawn_at', 0) >= interval:
+                    self.refresh_symbol_display(symbol, tables=visible)
+            
+            if now - self.summary_drawn_at >= self.SUMMARY_INTERVAL:
+                self.update_summary()
+        except Exception as e:
+            print(f"Error refreshing GUI: {e}")
         
+        self.root.after(self.REFRESH_TICK_MS, self.refresh_tick)
+    
+    def refresh_symbol_display(self, symbol, tables=True):
         bot_data = self.bots[symbol]
         bot = bot_data.get('bot')
         widgets = bot_data['widgets']
         
-        if bot:
-            widgets['price'].config(text=f"${bot.current_price:.2f}")
-            widgets['balance'].config(text=f"Balance: ${bot.balance:.2f}")
+        state = bot.snapshot if bot else None
+        if state:
+            bot_data['drawn_version'] = state.version
+            bot_data['drawn_at'] = time.time()
             
-            pnl_color = "green" if bot.pnl >= 0 else "red"
-            pnl_sign = "+" if bot.pnl >= 0 else ""
-            widgets['pnl'].config(text=f"PnL: {pnl_sign}${bot.pnl:.2f}", foreground=pnl_color)
+            widgets['price'].config(text=f"${state.current_price:.2f}")
+            widgets['balance'].config(text=f"Balance: ${state.balance:.2f}")
             
-            widgets['market'].config(text=f"Market: {bot.market_state}")
+            pnl_color = "green" if state.pnl >= 0 else "red"
+            pnl_sign = "+" if state.pnl >= 0 else ""
+            widgets['pnl'].config(text=f"PnL: {pnl_sign}${state.pnl:.2f}", foreground=pnl_color)
             
-            self.update_tables(symbol)
+            widgets['market'].config(text=f"Market: {state.market_state}")
+            
+            if tables:
+                self.update_tables(symbol)
+    
+    def build_bot(self, symbol, api_key, api_secret):
+        """A bot configured from its tab's settings (not yet initialized)"""
+        widgets = self.bots[symbol]['widgets']
+        
+        bot = BinanceFuturesBot(api_key, api_secret, self.use_testnet.get(), bot_id=symbol)
+        bot.symbol = symbol
+        bot.leverage = int(widgets['leverage_entry'].get())
+        bot.capital = float(widgets['capital_entry'].get())
+        bot.grid_count = int(widgets['grid_count_entry'].get())
+        bot.grid_range_percent = float(widgets['grid_range_entry'].get())
+        bot.auto_grid = widgets['auto_grid_var'].get()
+        bot.stop_loss_percent = float(widgets['stop_loss_entry'].get())
+        bot.max_open_orders_per_side = int(widgets['max_orders_entry'].get())
+        bot.enable_dynamic_grid = widgets['dynamic_grid_var'].get()
+        bot.enable_auto_pause_resume = widgets['auto_pause_var'].get()
+        if self.use_profile.get():
+            bot.parameter_profile = load_parameter_profile()
+        if self.use_async_runtime.get():
+            bot.runtime = AsyncBotEngine.shared()
+        return bot
+    
+    def show_initialized(self, symbol, bot):
+        self.bots[symbol]['bot'] = bot
+        widgets = self.bots[symbol]['widgets']
+        mode = "Testnet 🧪" if bot.use_testnet else "Real 💰"
         
-        self.root.after(2000, lambda: self.update_symbol_display(symbol))
+        if bot.is_small_capital:
+            widgets['status'].config(
+                text=f"Status: Ready ✅ ({mode}) 💡 Small Capital + Per-Position TP/SL", 
+                foreground="green"
+            )
+        else:
+            widgets['status'].config(text=f"Status: Ready ✅ ({mode}) 🎯 Per-Position TP/SL Active", foreground="green")
     
     def initialize_bot(self, symbol):
         api_key = self.api_key_entry.get().strip()
@@ -2057,34 +7338,11 @@ to see frequent auto-closes and learn the system!
             return
         
         try:
-            widgets = self.bots[symbol]['widgets']
-            use_testnet = self.use_testnet.get()
-            
-            bot = BinanceFuturesBot(api_key, api_secret, use_testnet, bot_id=symbol)
-            bot.symbol = symbol
-            bot.leverage = int(widgets['leverage_entry'].get())
-            bot.capital = float(widgets['capital_entry'].get())
-            bot.grid_count = int(widgets['grid_count_entry'].get())
-            bot.grid_range_percent = float(widgets['grid_range_entry'].get())
-            bot.auto_grid = widgets['auto_grid_var'].get()
-            bot.stop_loss_percent = float(widgets['stop_loss_entry'].get())
-            bot.max_open_orders_per_side = int(widgets['max_orders_entry'].get())
-            bot.enable_dynamic_grid = widgets['dynamic_grid_var'].get()
-            bot.enable_auto_pause_resume = widgets['auto_pause_var'].get()
-            
-            success, message = bot.initialize()
+            bot = self.build_bot(symbol, api_key, api_secret)
+            success, message = bot.initialize(warm_start=self.warm_start.get())
             
             if success:
-                self.bots[symbol]['bot'] = bot
-                mode = "Testnet 🧪" if use_testnet else "Real 💰"
-                
-                if bot.is_small_capital:
-                    widgets['status'].config(
-                        text=f"Status: Ready ✅ ({mode}) 💡 Small Capital + Per-Position TP/SL", 
-                        foreground="green"
-                    )
-                else:
-                    widgets['status'].config(text=f"Status: Ready ✅ ({mode}) 🎯 Per-Position TP/SL Active", foreground="green")
+                self.show_initialized(symbol, bot)
                 
                 messagebox.showinfo("Success", 
                     f"{message}\n\n"
@@ -2101,6 +7359,57 @@ to see frequent auto-closes and learn the system!
         except Exception as e:
             messagebox.showerror("Error", f"Cannot initialize: {str(e)}")
     
+    def initialize_all(self):
+        """Initialize every tab without a running bot in one BulkInitializer pass (background)"""
+        api_key = self.api_key_entry.get().strip()
+        api_secret = self.api_secret_entry.get().strip()
+        
+        if not api_key or not api_secret:
+            messagebox.showerror("Error", "Enter API Key & Secret!")
+            return
+        
+        bots = []
+        for symbol, data in self.bots.items():
+            if data.get('bot') and data['bot'].is_running:
+                continue
+            try:
+                bots.append(self.build_bot(symbol, api_key, api_secret))
+                data['widgets']['status'].config(text="Status: Initializing... ⏳", foreground="orange")
+            except Exception as e:
+                data['widgets']['status'].config(text=f"Status: Invalid settings ❌ ({e})", foreground="red")
+        
+        if not bots:
+            messagebox.showinfo("Info", "No stopped symbol tabs to initialize")
+            return
+        
+        warm_start = self.warm_start.get()
+        
+        def report(bot, success, message):
+            self.root.after(0, lambda: self.show_bulk_result(bot, success, message))
+        
+        def run():
+            try:
+                results = BulkInitializer(bots, warm_start=warm_start, on_result=report).run()
+            except Exception as e:
+                error = f"Cannot initialize: {str(e)}"
+                self.root.after(0, lambda: messagebox.showerror("Error", error))
+                return
+            
+            failed = [f"❌ {symbol}: {message}" for symbol, (success, message) in results.items() if not success]
+            summary = f"✅ {len(results) - len(failed)}/{len(bots)} bots initialized"
+            self.root.after(0, lambda: messagebox.showinfo("Initialize All", "\n".join([summary] + failed)))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def show_bulk_result(self, bot, success, message):
+        if bot.symbol not in self.bots:
+            return  # tab closed while initializing
+        
+        if success:
+            self.show_initialized(bot.symbol, bot)
+        else:
+            self.bots[bot.symbol]['widgets']['status'].config(text=f"Status: Init failed ❌ {message}", foreground="red")
+    
     def start_bot(self, symbol):
         if symbol not in self.bots or not self.bots[symbol]['bot']:
             messagebox.showwarning("Warning", "Initialize bot first!")
@@ -2134,6 +7443,25 @@ to see frequent auto-closes and learn the system!
                 self.bots[symbol]['widgets']['status'].config(text=f"Status: Stopped ⏹️ [{symbol}]", foreground="red")
                 messagebox.showinfo("Info", f"✅ Stopped {symbol}!\n🗑️ Cache cleaned")
     
+    def change_filled_page(self, symbol, delta):
+        """Page through stored fill history (page 0 = live view)"""
+        data = self.bots.get(symbol)
+        if not data or not data.get('bot'):
+            return
+        
+        bot = data['bot']
+        total = bot.store.trade_count(bot.network, bot.symbol)
+        last_page = math.ceil(total / self.FILLED_PAGE_SIZE)
+        
+        # Past the stored history: fetch an older page in the background
+        if delta > 0 and data.get('filled_page', 0) >= last_page and not bot.history().history_complete:
+            data['widgets']['filled_page_label'].config(text="⏳ Loading older fills...")
+            threading.Thread(target=bot.backfill_trade_history, daemon=True).start()
+            return
+        
+        data['filled_page'] = max(0, min(data.get('filled_page', 0) + delta, last_page))
+        self.update_tables(symbol)
+    
     def manual_update(self, symbol):
         if symbol in self.bots and self.bots[symbol]['bot']:
             bot = self.bots[symbol]['bot']
@@ -2142,127 +7470,193 @@ to see frequent auto-closes and learn the system!
             bot.get_positions()
             bot.get_open_orders()
             bot.get_filled_orders()
+            bot.publish_snapshot()
             self.update_tables(symbol)
     
+    def sync_tree(self, tree, rows, shown):
+        """Diff-update a Treeview to rows = [(iid, values, tags)] in display order
+        
+        shown holds what the tree displays now ({'order': [...], 'rows': {iid: (values, tags)}}).
+        Only changed cells are rewritten; rows are inserted or deleted only when they
+        appear or disappear, so selection and scroll position survive a refresh.
+        """
+        wanted = {}
+        for iid, values, tags in rows:
+            wanted.setdefault(str(iid), (tuple(values), tuple(tags)))
+        
+        stale = [iid for iid in shown['order'] if iid not in wanted]
+        if stale:
+            tree.delete(*stale)
+            for iid in stale:
+                del shown['rows'][iid]
+        
+        columns = tree['columns']
+        added = []
+        for iid, (values, tags) in wanted.items():
+            old = shown['rows'].get(iid)
+            if old is None:
+                tree.insert('', 'end', iid=iid, values=values, tags=tags)
+                added.append(iid)
+            elif old != (values, tags):
+                for column, old_value, value in zip(columns, old[0], values):
+                    if old_value != value:
+                        tree.set(iid, column, value)
+                if old[1] != tags:
+                    tree.item(iid, tags=tags)
+            shown['rows'][iid] = (values, tags)
+        
+        # New rows went in at the end; reorder only if that isn't where they belong
+        order = list(wanted)
+        if [iid for iid in shown['order'] if iid in wanted] + added != order:
+            for index, iid in enumerate(order):
+                tree.move(iid, '', index)
+        shown['order'] = order
+    
     def update_tables(self, symbol):
         if symbol not in self.bots or not self.bots[symbol]['bot']:
             return
         
         bot = self.bots[symbol]['bot']
+        state = bot.snapshot
         widgets = self.bots[symbol]['widgets']
+        tree_rows = self.bots[symbol]['tree_rows']
+        if state is None:
+            return
         
-        # Positions
-        pos_tree = widgets['pos_tree']
-        for item in pos_tree.get_children():
-            pos_tree.delete(item)
-        
-        for pos in bot.positions:
-            pnl_color = 'green' if pos['unrealized_pnl'] >= 0 else 'red'
-            pos_tree.insert('', 'end', values=(
-                pos['symbol'],
-                pos['side'],
-                pos.get('position_side', 'BOTH'),
-                f"{pos['amount']:.3f}",
-                f"${pos['entry_price']:.2f}",
-                f"${pos['unrealized_pnl']:.2f}"
-            ), tags=(pnl_color,))
-        
-        pos_tree.tag_configure('green', foreground='green')
-        pos_tree.tag_configure('red', foreground='red')
+        def shown(name):
+            return tree_rows.setdefault(name, {'order': [], 'rows': {}})
         
-        # Open orders
-        buy_tree = widgets['buy_tree']
-        sell_tree = widgets['sell_tree']
+        # Only the data tab on screen is refreshed
+        data_tab = widgets['data_notebook'].select()
         
-        for item in buy_tree.get_children():
-            buy_tree.delete(item)
-        for item in sell_tree.get_children():
-            sell_tree.delete(item)
+        # Positions
+        if data_tab == str(widgets['pos_frame']):
+            self.sync_tree(widgets['pos_tree'], [(
+                pos['position_key'],
+                (
+                    pos['symbol'],
+                    pos['side'],
+                    pos.get('position_side', 'BOTH'),
+                    f"{pos['amount']:.3f}",
+                    f"${pos['entry_price']:.2f}",
+                    f"${pos['unrealized_pnl']:.2f}"
+                ),
+                ('green' if pos['unrealized_pnl'] >= 0 else 'red',)
+            ) for pos in state.positions], shown('pos_tree'))
         
-        for order in bot.open_orders:
-            if order['position_side'] == 'LONG':
-                tree = buy_tree
+        # Open orders
+        elif data_tab == str(widgets['orders_frame']):
+            for tree_name, is_long in (('buy_tree', True), ('sell_tree', False)):
+                self.sync_tree(widgets[tree_name], [(
+                    order['order_id'],
+                    (f"${order['price']:.2f}", f"{order['quantity']:.3f}", order['time']),
+                    ()
+                ) for order in state.open_orders if (order['position_side'] == 'LONG') == is_long], shown(tree_name))
+        
+        # Filled orders (live view, or a page of stored history)
+        elif data_tab == str(widgets['filled_frame']):
+            page = self.bots[symbol].get('filled_page', 0)
+            if page:
+                trades = bot.get_filled_orders(limit=self.FILLED_PAGE_SIZE, page=page - 1)
+                total = bot.store.trade_count(bot.network, bot.symbol)
+                total_pages = max(1, math.ceil(total / self.FILLED_PAGE_SIZE))
+                widgets['filled_page_label'].config(text=f"History {page}/{total_pages} ({total} fills)")
             else:
-                tree = sell_tree
-                
-            tree.insert('', 'end', values=(
-                f"${order['price']:.2f}",
-                f"{order['quantity']:.3f}",
-                order['time']
-            ))
-        
-        # Filled orders
-        filled_tree = widgets['filled_tree']
-        for item in filled_tree.get_children():
-            filled_tree.delete(item)
-        
-        for trade in bot.filled_orders[-20:]:
-            pnl_color = 'green' if trade['realized_pnl'] >= 0 else 'red'
-            filled_tree.insert('', 'end', values=(
-                trade['side'],
-                f"${trade['price']:.2f}",
-                f"{trade['quantity']:.3f}",
-                f"${trade['realized_pnl']:.2f}",
-                trade['time']
-            ), tags=(pnl_color,))
-        
-        filled_tree.tag_configure('green', foreground='green')
-        filled_tree.tag_configure('red', foreground='red')
+                trades = state.filled_orders[-self.FILLED_PAGE_SIZE:]
+                widgets['filled_page_label'].config(text="Live")
+            
+            self.sync_tree(widgets['filled_tree'], [(
+                trade['id'],
+                (
+                    trade['side'],
+                    f"${trade['price']:.2f}",
+                    f"{trade['quantity']:.3f}",
+                    f"${trade['realized_pnl']:.2f}",
+                    trade['time']
+                ),
+                ('green' if trade['realized_pnl'] >= 0 else 'red',)
+            ) for trade in trades], shown('filled_tree'))
     
     def update_summary(self):
-        """Update summary"""
-        total_balance = 0
-        total_available = 0
-        total_pnl = 0
-        active_count = 0
-        
-        try:
-            first_bot = None
-            for symbol, data in self.bots.items():
-                bot = data.get('bot')
-                if bot:
-                    first_bot = bot
-                    break
-            
-            if first_bot:
-                account = first_bot.client.futures_account()
-                
-                for asset in account['assets']:
-                    if asset['asset'] == 'USDT':
-                        total_balance = float(asset['walletBalance'])
-                        total_available = float(asset['availableBalance'])
-                        break
-                
-                total_pnl = float(account['totalUnrealizedProfit'])
-                
-                for symbol, data in self.bots.items():
-                    bot = data.get('bot')
-                    if bot and bot.is_running:
-                        active_count += 1
-        except Exception as e:
-            print(f"Error update summary: {e}")
+        """Update summary from the worker's latest snapshot (never waits on the network)"""
+        summary = self.summary_worker.snapshot
         
-        if total_balance > 0:
-            self.total_balance_label.config(text=f"${total_balance:.2f}")
-            self.available_balance_label.config(text=f"${total_available:.2f}")
+        if summary and summary.accounts:
+            self.total_balance_label.config(text=f"${summary.balance:.2f}")
+            self.available_balance_label.config(text=f"${summary.available_balance:.2f}")
             
+            total_pnl = summary.unrealized_pnl
             pnl_color = "green" if total_pnl >= 0 else "red"
             pnl_sign = "+" if total_pnl >= 0 else ""
             self.unrealized_pnl_label.config(text=f"{pnl_sign}${total_pnl:.2f}", foreground=pnl_color)
             self.total_pnl_label.config(text=f"{pnl_sign}${total_pnl:.2f}", foreground=pnl_color)
         
-        total_bots = len([b for b in self.bots.values() if b.get('bot')])
-        if total_bots > 0:
-            self.active_bots_label.config(text=f"{active_count}/{total_bots} running")
+        if summary and summary.total_bots > 0:
+            self.active_bots_label.config(text=f"{summary.active_bots}/{summary.total_bots} running")
         else:
             self.active_bots_label.config(text="No bots")
         
-        self.root.after(2000, self.update_summary)
+        age = self.summary_worker.age()
+        if age is None:
+            self.summary_age_label.config(text="")
+        elif self.summary_worker.is_stale():
+            self.summary_age_label.config(text=f"⚠️ Stale: updated {age:.0f}s ago", foreground="red")
+        else:
+            self.summary_age_label.config(text=f"Updated {age:.0f}s ago", foreground="gray")
+        self.summary_drawn_at = time.time()
     
     def run(self):
         self.root.mainloop()
 
 
 if __name__ == "__main__":
-    app = BotGUI()
-    app.run()
\ No newline at end of file
+    multiprocessing.freeze_support()
+    
+    parser = argparse.ArgumentParser(description="Binance Futures Grid Bot")
+    parser.add_argument('--benchmark-indicators', action='store_true',
+                        help="time the NumPy indicator core against the old pandas code and exit")
+    parser.add_argument('--backtest', metavar='CSV_OR_SYMBOL',
+                        help="replay historical klines (CSV file or symbol to download) and exit")
+    parser.add_argument('--interval', default='1m', help="kline interval when downloading (default 1m)")
+    parser.add_argument('--days', type=int, default=30, help="days of klines when downloading (default 30)")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="backtest setting override, e.g. --set grid_count=12 (repeatable)")
+    parser.add_argument('--output', metavar='PREFIX', help="write PREFIX_equity.csv and PREFIX_trades.csv")
+    parser.add_argument('--sweep', metavar='CSV_OR_SYMBOL',
+                        help="backtest a parameter grid in parallel, write a parameter profile and exit")
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=V1,V2,...',
+                        help="swept setting values, e.g. --param grid_count=6,8,10 (repeatable)")
+    parser.add_argument('--walk-forward', type=int, default=0, metavar='N',
+                        help="split into N+1 windows and test each window's winner on the next")
+    parser.add_argument('--workers', type=int, help="sweep processes (default: CPU count)")
+    parser.add_argument('--profile', metavar='PATH', help=f"profile output (default {PARAMETER_PROFILE_PATH})")
+    parser.add_argument('--load-test', nargs='?', const=','.join(map(str, LOAD_TEST_BOT_COUNTS)), metavar='N,N,...',
+                        help="run N bots against the mock exchange per round and report loop latency, "
+                             "API weight, refill/TP-SL timing, threads and memory")
+    parser.add_argument('--duration', type=int, default=60, help="load test seconds per round (default 60)")
+    parser.add_argument('--latency-ms', type=float, default=20, help="mock exchange delay per REST call (default 20)")
+    parser.add_argument('--fill-rate', type=float, default=1.0,
+                        help="chance a touched resting order fills on the mock exchange (default 1.0)")
+    parser.add_argument('--report', metavar='PATH', help=f"load test JSON output (default {LOAD_TEST_REPORT_PATH})")
+    parser.add_argument('--verbose', action='store_true', help="show bot output during the load test")
+    parser.add_argument('--headless', action='store_true', help="run the bots of --config without the GUI")
+    parser.add_argument('--config', metavar='PATH', help="headless bot config (.json, or .yaml with PyYAML)")
+    args = parser.parse_args()
+    
+    if args.benchmark_indicators:
+        benchmark_indicators()
+    elif args.backtest:
+        run_backtest(args.backtest, args.interval, args.days, args.set, args.output)
+    elif args.sweep:
+        run_sweep(args.sweep, args.interval, args.days, args.param, args.set, args.walk_forward,
+                  args.workers, args.profile)
+    elif args.headless:
+        if not args.config:
+            parser.error("--headless needs --config PATH")
+        run_headless(args.config)
+    elif args.load_test:
+        run_load_test([int(n) for n in args.load_test.split(',')], args.duration, args.latency_ms,
+                      args.fill_rate, args.report, args.verbose)
+    else:
+        app = BotGUI()
+        app.run()
\ No newline at end of file